@@ -204,6 +204,49 @@ if DEBUG and not _R2_KEYS_LOOK_REAL:
         'R2 credentials look like placeholders — falling back to local filesystem media storage (DEBUG only).'
     )
 
+# Cache
+# الخلفية قابلة للتبديل من البيئة: locmem (افتراضي، ذاكرة العامل الواحد)، file (مشتركة بين
+# عمّال gunicorn على نفس الجهاز، CACHE_LOCATION = مجلد)، redis (أي خادم متوافق مع Redis،
+# CACHE_LOCATION = redis://...، ويتطلب حزمة redis). مع locmem وأكثر من عامل، الإبطال
+# عند الحفظ يصل للعامل الذي حفظ فقط — والباقون ينتظرون CATALOG_CACHE_TIMEOUT.
+# في الإنتاج لا افتراضي: الأوامر الخلفية (rollup_product_views، refresh_trending، run_sale_scheduler)
+# ترفض locmem، فغياب المتغير يُفشل الإقلاع بصوت عالٍ بدل عمليات تنهار وتُعاد بلا نهاية.
+_CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+}
+CACHE_BACKEND = config('CACHE_BACKEND', default='locmem') if DEBUG else config('CACHE_BACKEND')
+CACHES = {
+    'default': {
+        'BACKEND': _CACHE_BACKENDS[CACHE_BACKEND],
+        'LOCATION': config('CACHE_LOCATION', default=str(BASE_DIR / 'cache') if CACHE_BACKEND == 'file' else ''),
+        'KEY_PREFIX': 'voro',
+    }
+}
+
+# مدة بقاء ردود الكتالوج المخزَّنة (products/cache.py) بالثواني. الإبطال الفعلي بالإصدار عند
+# الحفظ؛ والردود التي تعرض الأسعار لا تعيش بعد حد التخفيض التالي (products/sale_schedule.py) أياً
+# كانت الخلفية، ويرفع run_sale_scheduler إصدار sales عند الحد نفسه حين تكون الذاكرة مشتركة.
+CATALOG_CACHE_TIMEOUT = config('CATALOG_CACHE_TIMEOUT', default=300, cast=int)
+
+# مدة الاحتفاظ بسجل الحذف لموجز التغييرات (products/sync.py)؛ مؤشر أقدم منها يتطلب مزامنة كاملة
+CATALOG_DELETION_RETENTION_DAYS = config('CATALOG_DELETION_RETENTION_DAYS', default=30, cast=int)
+
+# أقصى عدد معرّفات في طلب ‎/api/products/batch/‎ الواحد
+PRODUCT_BATCH_MAX_SIZE = config('PRODUCT_BATCH_MAX_SIZE', default=100, cast=int)
+
+# نسخ الصور المتجاوبة (products/images.py) تُولَّد في خيط خلفي بعد الرفع؛ False = داخل الطلب
+IMAGE_VARIANTS_ASYNC = config('IMAGE_VARIANTS_ASYNC', default=True, cast=bool)
+
+# أقصى عرض/ارتفاع لصورة مرفوعة (upload-image/ والرفع المباشر products/uploads.py)
+IMAGE_UPLOAD_MAX_DIMENSION = config('IMAGE_UPLOAD_MAX_DIMENSION', default=6000, cast=int)
+
+# مشاهدات المنتجات تُجمع في ذاكرة العامل وتُكتب دفعة واحدة (products/tracking.py). المهلة تُفحص
+# عند المشاهدة التالية لا بمؤقّت: عامل بلا زيارات يُبقي مخزنه حتى الزيارة التالية أو إغلاقه.
+PRODUCT_VIEW_BUFFER_SIZE = config('PRODUCT_VIEW_BUFFER_SIZE', default=200, cast=int)
+PRODUCT_VIEW_FLUSH_SECONDS = config('PRODUCT_VIEW_FLUSH_SECONDS', default=30, cast=int)
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
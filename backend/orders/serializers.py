@@ -61,7 +61,10 @@ class OrderSerializer(serializers.ModelSerializer):
 
     def get_items(self, obj):
         """Return items with context"""
-        items = obj.items.all()
+        # OrderViewSet يجلبها مسبقاً مع منتجاتها (to_attr يصمد بعد مسح DRF لذاكرة prefetch عند التحديث)
+        items = getattr(obj, 'prefetched_items', None)
+        if items is None:
+            items = obj.items.select_related('product')
         return OrderItemSerializer(items, many=True, context=self.context).data
 
 class CreateOrderSerializer(serializers.ModelSerializer):
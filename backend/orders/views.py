@@ -1,3 +1,4 @@
+from django.db.models import Prefetch
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
@@ -11,7 +12,10 @@ from utils.telegram_service import send_telegram_order_notification
 
 
 class OrderViewSet(viewsets.ModelViewSet):
-    queryset = Order.objects.all()
+    # عناصر الطلب ومنتجاتها تُجلب مسبقاً — OrderSerializer يعرضها لكل طلب
+    queryset = Order.objects.prefetch_related(
+        Prefetch('items', queryset=OrderItem.objects.select_related('product'), to_attr='prefetched_items')
+    )
     serializer_class = OrderSerializer
     http_method_names = ['get', 'post', 'put', 'patch', 'delete', 'head', 'options']
 
@@ -69,6 +69,10 @@ class ProductAdmin(admin.ModelAdmin):
     save_on_top = True
     filter_horizontal = ('similar_products',)
 
+    def get_queryset(self, request):
+        # price_after_discount يقرأ السعر بعد الخصم المحسوب في SQL (with_pricing)
+        return super().get_queryset(request).with_pricing()
+
     def formfield_for_manytomym(self, db_field, request, **kwargs):
         if db_field.name == 'similar_products':
             qs = Product.objects.filter(is_active=True).order_by('name')
@@ -146,10 +150,28 @@ class ProductAdmin(admin.ModelAdmin):
     )
 
 class ProductReviewAdmin(admin.ModelAdmin):
-    list_display = ('product', 'user', 'rating', 'created_at')
-    list_filter = ('rating', 'created_at')
+    list_display = ('product', 'user', 'rating', 'is_approved', 'created_at')
+    list_filter = ('rating', 'is_approved', 'created_at')
     search_fields = ('product__name', 'user__username', 'comment')
     readonly_fields = ('created_at',)
+    actions = ['approve_reviews', 'disapprove_reviews']
+
+    def _set_approved(self, request, queryset, approved):
+        # حفظ كل تقييم (لا queryset.update) حتى تتحدّث تجميعات تقييم المنتج (products/ratings.py)
+        changed = 0
+        for review in queryset.filter(is_approved=not approved):
+            review.is_approved = approved
+            review.save(update_fields=['is_approved'])
+            changed += 1
+        self.message_user(request, f'تم تحديث {changed} تقييم')
+
+    def approve_reviews(self, request, queryset):
+        self._set_approved(request, queryset, True)
+    approve_reviews.short_description = '✅ اعتماد التقييمات المحددة'
+
+    def disapprove_reviews(self, request, queryset):
+        self._set_approved(request, queryset, False)
+    disapprove_reviews.short_description = '🚫 إلغاء اعتماد التقييمات المحددة'
 
 
 class ProductViewAdmin(admin.ModelAdmin):
@@ -6,3 +6,6 @@ class ProductsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'products'
     verbose_name = 'المنتجات'
+
+    def ready(self):
+        import products.signals
@@ -0,0 +1,214 @@
+"""
+مخزن الصور بعنوان المحتوى: كل صورة تُحفظ باسم بصمتها images/<sha256>.<ext>.
+
+رفع الصورة نفسها مرة ثانية (لمنتج آخر، لبنر، لقسم) لا يكتب شيئاً ويُرجع الرابط الموجود —
+نفس الرابط يعني أن الـCDN يخدمه من ذاكرته بدل جلبه من جديد. الأداة في لوحة الإدارة
+(widgets.ImgBBUploadWidget) تحسب البصمة في المتصفح وتسأل أولاً (GET upload-image/?sha256=)،
+فلا تُرسل البايتات أصلاً إن كانت الصورة مخزَّنة.
+
+ImageBlobReference يسجّل من يستعمل كل صورة (من إشارات الحفظ/الحذف)، فتُحذف الصور التي
+لم يعد يستعملها أحد على دفعات، بعد مهلة سماح تغطي ما رُفع ولم يُحفظ في نموذجه بعد:
+    python manage.py gc_image_blobs [--grace-hours 24] [--rebuild-references]
+
+تهجير ImgBB (products/image_migration.py) يكتب إلى المخزن نفسه.
+"""
+import hashlib
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from . import images
+
+BLOB_PREFIX = 'images'
+GC_GRACE = timedelta(hours=24)
+GC_BATCH_SIZE = 200
+
+
+def _owners():
+    """{النموذج: (النوع، حقول الصور)} — كل ما يحفظ روابط صور المخزن."""
+    from .models import Banner, CatalogDeletion, Category, Product
+    from .serializers import ProductCardSerializer
+
+    return {
+        Product: (CatalogDeletion.KIND_PRODUCT, ProductCardSerializer.IMAGE_FIELDS),
+        Banner: (CatalogDeletion.KIND_BANNER, ('image_url',)),
+        Category: (CatalogDeletion.KIND_CATEGORY, ('image_url',)),
+    }
+
+
+def sha256_of(file):
+    """بصمة الملف قطعةً قطعة، ثم يُعاد المؤشر إلى أوله."""
+    digest = hashlib.sha256()
+    for chunk in file.chunks() if hasattr(file, 'chunks') else iter(lambda: file.read(64 * 1024), b''):
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def blob_path(sha, ext):
+    return f'{BLOB_PREFIX}/{sha}{ext}'
+
+
+def write(content, sha, ext, storage=None):
+    """
+    يكتب المحتوى إن لم يكن موجوداً ويُرجع (المسار، هل كُتب). لا يلمس قاعدة البيانات،
+    فيصلح لخيوط العمّال في التهجير.
+    """
+    storage = storage or default_storage
+    name = blob_path(sha, ext)
+    if storage.exists(name):
+        return name, False
+    saved = storage.save(name, content)
+    if saved != name:
+        # كتابة متزامنة للمحتوى نفسه: أخذت نسختنا اسماً بديلاً، والأصل موجود
+        storage.delete(saved)
+        return name, False
+    return name, True
+
+
+def register(sha, path, url, size, image_format):
+    from .models import ImageBlob
+
+    blob, created = ImageBlob.objects.get_or_create(
+        sha256=sha, defaults={'path': path, 'url': url, 'size': size, 'format': image_format},
+    )
+    if not created:
+        _touch(sha)
+    return blob
+
+
+def existing(sha, storage=None):
+    """الصورة المسجَّلة بهذه البصمة إن كان ملفها ما زال في التخزين، وإلا None."""
+    from .models import ImageBlob
+
+    if not _touch(sha):
+        return None
+    blob = ImageBlob.objects.filter(sha256=sha).first()
+    if blob is not None and (storage or default_storage).exists(blob.path):
+        return blob
+    return None
+
+
+def _touch(sha):
+    """
+    يجدّد last_referenced_at قبل أن يُعاد رابط الصورة لمستدعٍ سيحفظه. UPDATE ينتظر قفل جمع
+    مهملات جارٍ على السطر: إن حذفها لا يُلمس شيء (فيُرجع 0)، وإلا صارت حديثة فيتخطّاها.
+    """
+    from .models import ImageBlob
+
+    return ImageBlob.objects.filter(sha256=sha).update(last_referenced_at=timezone.now())
+
+
+# ---- المراجع -------------------------------------------------------------
+
+def sync_references(instance, created=False, update_fields=None):
+    """يطابق مراجع الكائن مع حقول صوره الحالية. حفظ جزئي لا يلمسها لا يكلّف شيئاً."""
+    from .models import ImageBlob, ImageBlobReference
+
+    kind, fields = _owners()[type(instance)]
+    if update_fields is not None:
+        fields = [field for field in fields if field in update_fields]
+        if not fields:
+            return
+    urls = {field: getattr(instance, field) for field in fields}
+    blob_by_url = dict(ImageBlob.objects.filter(url__in=[url for url in urls.values() if url])
+                       .values_list('url', 'id'))
+    wanted = {(blob_by_url[url], field) for field, url in urls.items() if url in blob_by_url}
+    if created:
+        current = set()
+    else:
+        references = ImageBlobReference.objects.filter(kind=kind, object_id=instance.pk, field__in=fields)
+        current = set(references.values_list('blob_id', 'field'))
+        stale = current - wanted
+        if stale:
+            for blob_id, field in stale:
+                references.filter(blob_id=blob_id, field=field).delete()
+    if wanted - current:
+        ImageBlobReference.objects.bulk_create([
+            ImageBlobReference(blob_id=blob_id, kind=kind, object_id=instance.pk, field=field)
+            for blob_id, field in wanted - current
+        ], ignore_conflicts=True)
+
+
+def drop_references(instance):
+    from .models import ImageBlobReference
+
+    kind, _ = _owners()[type(instance)]
+    ImageBlobReference.objects.filter(kind=kind, object_id=instance.pk).delete()
+
+
+def add_references(blob, model, object_ids, field):
+    """للتعديلات الجماعية بـ update() (التهجير) التي لا تمر بالإشارات."""
+    from .models import ImageBlobReference
+
+    kind, _ = _owners()[model]
+    ImageBlobReference.objects.bulk_create([
+        ImageBlobReference(blob=blob, kind=kind, object_id=object_id, field=field) for object_id in object_ids
+    ], ignore_conflicts=True)
+
+
+def rebuild_references():
+    """يعيد بناء جدول المراجع كله من حقول الصور (بعد تعديلات تجاوزت الإشارات). يُرجع عدد المراجع."""
+    from .models import ImageBlob, ImageBlobReference
+
+    blob_by_url = dict(ImageBlob.objects.values_list('url', 'id'))
+    references = []
+    for model, (kind, fields) in _owners().items():
+        for pk, *urls in model.objects.values_list('pk', *fields).iterator():
+            references.extend(
+                ImageBlobReference(blob_id=blob_by_url[url], kind=kind, object_id=pk, field=field)
+                for field, url in zip(fields, urls) if url in blob_by_url
+            )
+    with transaction.atomic():
+        ImageBlobReference.objects.all().delete()
+        ImageBlobReference.objects.bulk_create(references, batch_size=1000)
+    return len(references)
+
+
+# ---- جمع المهملات ---------------------------------------------------------
+
+def collect_garbage(grace=GC_GRACE, batch_size=GC_BATCH_SIZE, dry_run=False, storage=None):
+    """
+    يحذف الصور التي لا مراجع لها وأقدم من مهلة السماح، مع نسخها المتجاوبة، دفعةً دفعة.
+    يُرجع عدد الصور المحذوفة (أو التي كانت ستُحذف مع dry_run).
+    """
+    from .models import ImageBlob, ImageBlobReference, ImageVariantSet
+
+    storage = storage or default_storage
+    cutoff = timezone.now() - grace
+    unreferenced = ImageBlob.objects.filter(
+        ~Exists(ImageBlobReference.objects.filter(blob=OuterRef('pk'))),
+        last_referenced_at__lt=cutoff,
+    ).order_by('id')
+    if dry_run:
+        return unreferenced.count()
+
+    removed, last_id = 0, 0
+    while True:
+        with transaction.atomic():
+            batch = list(unreferenced.filter(id__gt=last_id).select_for_update(of=('self',))[:batch_size])
+            if not batch:
+                return removed
+            last_id = batch[-1].id
+            # فحص ثانٍ بعد أخذ القفل: مرجع أُضيف أو لمسة (_touch) ثبتت بين القراءة والقفل تُبقي الصورة
+            referenced = set(ImageBlobReference.objects.filter(blob__in=batch).values_list('blob_id', flat=True))
+            batch = [blob for blob in batch if blob.id not in referenced and blob.last_referenced_at < cutoff]
+            variants = dict(ImageVariantSet.objects.filter(original_url__in=[blob.url for blob in batch])
+                            .values_list('original_url', 'variants'))
+            paths = []
+            for blob in batch:
+                paths.append(blob.path)
+                for name, urls in variants.get(blob.url, {}).items():
+                    paths.extend(images.variant_path(blob.path, width, name) for width in urls)
+            ImageVariantSet.objects.filter(original_url__in=variants).delete()
+            ImageBlob.objects.filter(id__in=[blob.id for blob in batch]).delete()
+            transaction.on_commit(lambda paths=paths: _delete_files(storage, paths))
+        removed += len(batch)
+
+
+def _delete_files(storage, paths):
+    for path in paths:
+        storage.delete(path)
@@ -0,0 +1,154 @@
+"""
+ذاكرة مؤقّتة لردود الكتالوج العامة (المنتجات، الأقسام، البنرات).
+
+لكل نطاق (namespace) عدّاد إصدار في الذاكرة المؤقّتة نفسها. مفتاح الرد المخزَّن يحوي
+إصدارات النطاقات التي يعتمد عليها العرض، فرفع الإصدار (من إشارات الحفظ/الحذف في
+signals.py أو من أمر clear_cache) يجعل كل الردود القديمة غير قابلة للوصول فوراً —
+لا حاجة لتتبّع المفاتيح أو حذفها واحداً واحداً، وتنتهي صلاحيتها وحدها بعد المهلة.
+
+الردود تُخزَّن بايتات JSON جاهزة: الإصابة لا تلمس قاعدة البيانات ولا المسلسِل ولا المُصيِّر.
+"""
+import gzip
+import hashlib
+import math
+import re
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+from rest_framework.renderers import JSONRenderer
+
+PRODUCTS = 'products'
+CATEGORIES = 'categories'
+BANNERS = 'banners'
+# لا يرتبط بنموذج: يرفعه مجدول التخفيضات (sale_schedule.py) عند بدء أو انتهاء أي تخفيض
+SALES = 'sales'
+# يرفعه تجميع المشاهدات (tracking.py) بعد تحديث العدّادات
+VIEWS = 'views'
+# يرفعه حساب الرائج (trending.py) بعد تحديث الدرجات
+TRENDING = 'trending'
+# إصدار فهرس الاقتراحات (suggest.py): يُرفع فقط حين تتغير حقول يُبنى منها الفهرس
+SUGGEST = 'suggest'
+NAMESPACES = (PRODUCTS, CATEGORIES, BANNERS, SALES, VIEWS, TRENDING, SUGGEST)
+
+
+_DUMMY_BACKEND = 'django.core.cache.backends.dummy.DummyCache'
+# ذواكر لا تراها عملية أخرى: إصدار يرفعه أمر خلفي فيها لا يصل أبداً إلى عمّال الويب
+_PROCESS_LOCAL_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    _DUMMY_BACKEND,
+)
+
+
+def is_shared():
+    """هل يصل رفع الإصدار من هذه العملية إلى العمليات الأخرى (redis/file...)؟"""
+    return settings.CACHES['default']['BACKEND'] not in _PROCESS_LOCAL_BACKENDS
+
+
+def _version_key(namespace):
+    return f'catalog:{namespace}:version'
+
+
+def get_version(namespace):
+    """الإصدار الحالي للنطاق. يُنشأ عند أول طلب إن لم يكن موجوداً (أو طُرد من الذاكرة)."""
+    key = _version_key(namespace)
+    version = cache.get(key)
+    if version is None:
+        # نبدأ من الوقت الحالي لا من 1: لو طُرد العدّاد وأُعيد من 1 لعادت مفاتيح قديمة صالحة
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key, time.time_ns())
+    return version
+
+
+def bump_version(namespace):
+    """إبطال كل الردود المخزَّنة التي تعتمد على هذا النطاق."""
+    key = _version_key(namespace)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
+
+
+def catalog_cache(*namespaces, compress=False):
+    """
+    يخزّن رد GET الناجح لعرض دالّي (function view) بـ DRF كبايتات JSON.
+
+    يوضع تحت @api_view و @permission_classes حتى تجري المصادقة والتفاوض أولاً.
+    المفتاح = اسم العرض + إصدارات النطاقات المعطاة + المسار الكامل مع الاستعلام
+    (cursor/page_size/placement...)، ومعها ETag الطلب إن كان العرض ملفوفاً بـ conditional_get
+    (products/conditional.py) — فالجسم المخزَّن يُبنى دائماً من الحالة التي حُسب منها الـETag. طلبات غير GET، أو من يطلب واجهة DRF المتصفِّحة،
+    تمرّ بلا تخزين.
+
+    compress=True يخزّن البايتات مضغوطة بـ gzip ويرسلها كما هي لمن يقبل gzip — للردود
+    الكبيرة (home/) حيث يوفّر الضغط مرة واحدة لكل إصدار ضغطها عند كل طلب.
+    """
+    for namespace in namespaces:
+        if namespace not in NAMESPACES:
+            raise ValueError(f'Unknown catalog cache namespace: {namespace}')
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            renderer = getattr(request, 'accepted_renderer', None)
+            if request.method != 'GET' or getattr(renderer, 'format', None) != 'json':
+                return view(request, *args, **kwargs)
+
+            versions = '.'.join(str(get_version(namespace)) for namespace in namespaces)
+            path = hashlib.md5(request.get_full_path().encode('utf-8')).hexdigest()
+            etag = getattr(request, 'catalog_etag', '')
+            key = f'catalog:{view.__name__}:{versions}:{etag}:{path}'
+
+            body = cache.get(key)
+            if body is not None:
+                return _json_response(request, body, 'HIT', compress)
+
+            response = view(request, *args, **kwargs)
+            if response.status_code != 200 or not hasattr(response, 'data'):
+                return response
+            body = JSONRenderer().render(response.data)
+            if compress:
+                body = compress_string(body)
+            if settings.CACHES['default']['BACKEND'] != _DUMMY_BACKEND:
+                cache.set(key, body, timeout=_timeout(namespaces))
+            return _json_response(request, body, 'MISS', compress)
+
+        return wrapper
+
+    return decorator
+
+
+def _timeout(namespaces):
+    """
+    مهلة الرد المخزَّن (لا تُحسب مع DummyCache: لا شيء يُخزَّن). ما يعتمد على SALES لا يعيش بعد حد التخفيض التالي: حالة التخفيض تتغير
+    بالوقت وحده، ورفع sales من run_sale_scheduler لا يصل إن لم تكن الذاكرة مشتركة أو توقف الأمر.
+    """
+    timeout = settings.CATALOG_CACHE_TIMEOUT
+    if SALES in namespaces:
+        from .sale_schedule import boundaries
+
+        now = timezone.now()
+        _, upcoming = boundaries(now)
+        if upcoming is not None:
+            timeout = min(timeout, max(math.ceil((upcoming - now).total_seconds()), 1))
+    return timeout
+
+
+_ACCEPTS_GZIP = re.compile(r'\bgzip\b')
+
+
+def _json_response(request, body, status, compressed=False):
+    gzipped = compressed and _ACCEPTS_GZIP.search(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    if compressed and not gzipped:
+        body = gzip.decompress(body)
+    response = HttpResponse(body, content_type='application/json')
+    if compressed:
+        if gzipped:
+            response['Content-Encoding'] = 'gzip'
+        patch_vary_headers(response, ('Accept-Encoding',))
+    response['X-Catalog-Cache'] = status
+    return response
@@ -0,0 +1,132 @@
+"""
+طلبات GET الشرطية (ETag / Last-Modified) لنقاط الكتالوج العامة.
+
+الـETag لا يُحسب من جسم الرد، بل من "بصمة" تجميعية رخيصة للبيانات التي يُبنى منها
+الرد (عدد الصفوف، أحدث updated_at، وآخر حدّ تخفيض/صلاحية مرّ). هكذا يُرجَع 304
+باستعلام تجميعي واحد، دون تسلسل أو تصيير أو حتى قراءة من الذاكرة المؤقّتة.
+
+البصمة تتغير عند: إضافة/حذف صف (العدد)، تعديل صف (updated_at)، ومرور بداية أو نهاية
+تخفيض/كوبون (لأن is_on_sale و is_valid_display تتغير بالوقت وحده). time_left وحده
+يُستثنى: هو نسبي للحظة الرد، والعميل يحسبه من discount_end.
+
+ملاحظة: Last-Modified لا يلتقط الحذف (أحدث updated_at لا يتغير)؛ العملاء الذين
+يرسلون If-None-Match — وهم المتصفحات عادةً — يعتمدون الـETag ويلتقطونه.
+
+الـETag نفسه يدخل مفتاح catalog_cache (products/cache.py) للعروض الملفوفة بالاثنين: ETag
+جديد يعني دائماً جسماً أُعيد بناؤه، فلا يُربط ETag جديد بجسم مخزَّن قديم (مثلاً بعد بدء
+تخفيض وقبل أن يرفع أحد إصدار sales) ثم تُرجَع به 304 إلى أن ينتهي التخفيض.
+"""
+import hashlib
+from datetime import datetime
+from functools import wraps
+
+from django.db.models import Count, Max, Q, Sum
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from .models import MAX_PRODUCT_ID, Product, Category, Banner
+from .models_coupons import Coupon
+
+
+def conditional_get(fingerprint):
+    """
+    يُلفّ حول العرض كاملاً (فوق @api_view) ليُرجِع 304 قبل الوصول إلى DRF.
+
+    fingerprint(request, *args, **kwargs) تُرجِع dict من التجميعات. تُحسب مرة واحدة لكل
+    طلب حتى لو طلبها كلٌّ من etag_func و last_modified_func.
+    """
+    def state(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        if not hasattr(request, '_catalog_fingerprint'):
+            request._catalog_fingerprint = fingerprint(request, *args, **kwargs)
+        return request._catalog_fingerprint
+
+    def etag(request, *args, **kwargs):
+        values = state(request, *args, **kwargs)
+        if values is None:
+            return None
+        if not hasattr(request, 'catalog_etag'):
+            raw = repr(sorted(values.items())).encode('utf-8')
+            request.catalog_etag = hashlib.sha1(raw).hexdigest()
+        return request.catalog_etag
+
+    def last_modified(request, *args, **kwargs):
+        values = state(request, *args, **kwargs)
+        if not values:
+            return None
+        stamps = [v for v in values.values() if isinstance(v, datetime)]
+        return max(stamps) if stamps else None
+
+    def decorator(view):
+        conditional_view = condition(etag_func=etag, last_modified_func=last_modified)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            if request.method in ('GET', 'HEAD'):
+                # no-cache = "خزّن لكن تحقّق قبل الاستخدام": المتصفح يعيد الطلب بـ If-None-Match
+                # تلقائياً، فتستفيد الواجهة من 304 دون أي تعديل في كودها
+                patch_cache_control(response, no_cache=True)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def _products_fingerprint(queryset, **extra):
+    now = timezone.now()
+    return queryset.aggregate(
+        count=Count('id', distinct=True),
+        updated=Max('updated_at'),
+        category_updated=Max('category__updated_at'),
+        sale_started=Max('discount_start', filter=Q(discount_start__lte=now)),
+        sale_ended=Max('discount_end', filter=Q(discount_end__lte=now)),
+        **extra,
+    )
+
+
+def product_list_fingerprint(request):
+    return _products_fingerprint(Product.objects.filter(is_active=True))
+
+
+def product_detail_fingerprint(request, pk):
+    if pk > MAX_PRODUCT_ID:
+        # لا بصمة لمعرّف خارج المدى (ربطه في الاستعلام يفيض)؛ العرض يرد 404 بلا ETag
+        return None
+    # المنتج نفسه + منتجاته المشابهة النشطة (تظهر في رد التفاصيل)
+    # views_count يتغير بالتجميع (products/tracking.py) لا بحفظ المنتج، فتدخل لحظة تحديثه في البصمة
+    return _products_fingerprint(
+        Product.objects.filter(Q(pk=pk) | Q(similar_to=pk, is_active=True)),
+        views_updated=Max('view_stats__updated_at', filter=Q(pk=pk)),
+    )
+
+
+def category_list_fingerprint(request):
+    fingerprint = Category.objects.aggregate(count=Count('id'), updated=Max('updated_at'))
+    # products_count لكل قسم يعتمد على المنتجات النشطة
+    fingerprint.update(Product.objects.filter(is_active=True).aggregate(
+        products=Count('id'), products_updated=Max('updated_at'),
+    ))
+    return fingerprint
+
+
+def banner_list_fingerprint(request):
+    placement = request.GET.get('placement', Banner.PLACEMENT_HOME)
+    return Banner.objects.filter(is_active=True, placement=placement).aggregate(
+        count=Count('id'), updated=Max('updated_at'),
+    )
+
+
+def coupon_list_fingerprint(request):
+    now = timezone.now()
+    # use_coupon() يحفظ used_count وحده (update_fields) فلا يلمس updated_at — نجمعه صراحة
+    return Coupon.objects.filter(is_active=True).aggregate(
+        count=Count('id'),
+        updated=Max('updated_at'),
+        used=Sum('used_count'),
+        validity_started=Max('start_date', filter=Q(start_date__lte=now)),
+        validity_ended=Max('end_date', filter=Q(end_date__lte=now)),
+    )
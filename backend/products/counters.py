@@ -0,0 +1,202 @@
+"""
+عدّادات الأقسام المخزَّنة: products_count (منتجات القسم النشطة مباشرة)، total_products_count
+(مع كل فروعه بأي عمق) و children_count (فروعه المباشرة النشطة).
+
+تُحدَّث تدريجياً من إشارات الحفظ/الحذف بتحديثات F() ذرّية، فلا يحتاج عرض الشجرة أي
+COUNT. أسلاف القسم تُقرأ من مساره المادي (Category.path)، فرفع العدّاد عبر كل الأسلاف
+تحديث واحد. الحالة السابقة للصف (القسم/النشاط/الأب/المسار) تُحفظ عند قراءته من قاعدة
+البيانات (from_db في models.py)، فحفظ لا يغيّرها — كـ reduce_stock — لا يكلّف شيئاً.
+
+الإصلاح بعد تعديلات تتجاوز الإشارات (update()/bulk_create/SQL يدوي):
+    python manage.py rebuild_category_counters
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import (
+    Case, Count, ExpressionWrapper, F, IntegerField, PositiveIntegerField, Subquery, Value, When,
+)
+from django.db.models.functions import Greatest
+
+PRODUCT_FIELDS = ('category_id', 'is_active')
+CATEGORY_FIELDS = ('parent_id', 'is_active', 'path')
+
+
+def ancestor_ids(path):
+    """معرّفات القسم وأسلافه من مساره: "3/17/42/" → [3, 17, 42]."""
+    return [int(part) for part in path.split('/') if part]
+
+
+def complete_state(instance, fields):
+    """
+    pre_save/pre_delete: إن لم تُعرف الحالة السابقة كاملة من from_db (صف جديد، أو حقول
+    مؤجَّلة) تُقرأ الآن قبل أن تتغير.
+    """
+    if instance._state.adding:
+        instance._counted_state = {}
+        return
+    state = getattr(instance, '_counted_state', None)
+    if state is not None and all(field in state for field in fields):
+        return
+    row = type(instance)._base_manager.filter(pk=instance.pk).values(*fields).first()
+    instance._counted_state = row or {}
+
+
+def saved_state(instance, fields, update_fields):
+    """القيم كما صارت في قاعدة البيانات بعد الحفظ (الحفظ الجزئي لا يكتب ما ليس في update_fields)."""
+    old = instance._counted_state
+    state = {}
+    for field in fields:
+        name = field[:-3] if field.endswith('_id') else field
+        if update_fields is None or field in update_fields or name in update_fields:
+            state[field] = getattr(instance, field)
+        else:
+            state[field] = old.get(field)
+    return state
+
+
+def touches(fields, update_fields):
+    """هل قد يغيّر حفظٌ بهذه update_fields حالةً تُحسب عليها العدّادات؟ (None = حفظ كامل)"""
+    if update_fields is None:
+        return True
+    return any(field in update_fields or field.removesuffix('_id') in update_fields for field in fields)
+
+
+def shifted(field, delta):
+    """field + delta دون النزول تحت الصفر (الأعمدة PositiveIntegerField)."""
+    value = ExpressionWrapper(F(field) + delta, output_field=IntegerField())
+    return Greatest(value, Value(0), output_field=PositiveIntegerField())
+
+
+def _counted_under(state, key):
+    """القسم/الأب الذي يُحسب عليه الصف، أو None إن كان غير نشط."""
+    return state.get(key) if state.get('is_active') else None
+
+
+# ---- المنتجات -------------------------------------------------------------
+
+def product_saved(product, update_fields=None):
+    state = saved_state(product, PRODUCT_FIELDS, update_fields)
+    before = _counted_under(product._counted_state, 'category_id')
+    after = _counted_under(state, 'category_id')
+    if before != after:
+        with transaction.atomic():
+            if before is not None:
+                _add_products(before, -1)
+            if after is not None:
+                _add_products(after, 1)
+    product._counted_state = state
+
+
+def product_deleted(product):
+    category_id = _counted_under(product._counted_state, 'category_id')
+    if category_id is not None:
+        _add_products(category_id, -1)
+
+
+def _add_products(category_id, delta):
+    from .models import Category
+
+    path = Category.objects.filter(pk=category_id).values_list('path', flat=True).first()
+    if not path:
+        return
+    Category.objects.filter(pk__in=ancestor_ids(path)).update(
+        total_products_count=shifted('total_products_count', delta),
+        products_count=Case(
+            When(pk=category_id, then=shifted('products_count', delta)),
+            default=F('products_count'),
+        ),
+    )
+
+
+# ---- الأقسام --------------------------------------------------------------
+
+def category_saved(category, update_fields=None):
+    from .models import Category
+
+    old = category._counted_state
+    state = saved_state(category, CATEGORY_FIELDS, update_fields)
+    before = _counted_under(old, 'parent_id')
+    after = _counted_under(state, 'parent_id')
+
+    with transaction.atomic():
+        if before != after:
+            if before is not None:
+                _add_children(before, -1)
+            if after is not None:
+                _add_children(after, 1)
+
+        # نُقل القسم: منتجات شجرته الفرعية تنتقل من أسلافه القدامى إلى الجدد
+        old_path = old.get('path')
+        if old_path and old_path != category.path:
+            old_ancestors = set(ancestor_ids(old_path)[:-1])
+            new_ancestors = set(ancestor_ids(category.path)[:-1])
+            subtree_total = Subquery(Category.objects.filter(pk=category.pk).values('total_products_count')[:1])
+            if old_ancestors - new_ancestors:
+                Category.objects.filter(pk__in=old_ancestors - new_ancestors).update(
+                    total_products_count=shifted('total_products_count', -1 * subtree_total),
+                )
+            if new_ancestors - old_ancestors:
+                Category.objects.filter(pk__in=new_ancestors - old_ancestors).update(
+                    total_products_count=shifted('total_products_count', subtree_total),
+                )
+    category._counted_state = state
+
+
+def category_deleted(category):
+    parent_id = _counted_under(category._counted_state, 'parent_id')
+    if parent_id is not None:
+        _add_children(parent_id, -1)
+
+
+def _add_children(category_id, delta):
+    from .models import Category
+
+    Category.objects.filter(pk=category_id).update(
+        children_count=shifted('children_count', delta),
+    )
+
+
+# ---- إعادة البناء -----------------------------------------------------------
+
+def rebuild_category_counters(category_model=None, product_model=None, chunk_size=500):
+    """
+    يعيد حساب العدّادات كلها من الصفر، على دفعات من chunk_size قسماً (كل دفعة معاملة
+    مستقلة). يُرجع عدد الأقسام التي تغيّرت. الترحيل 0015 يحمل نسخته المجمّدة من هذه الدالة.
+    """
+    if category_model is None or product_model is None:
+        from .models import Category, Product
+        category_model, product_model = category_model or Category, product_model or Product
+
+    direct = dict(
+        product_model.objects.filter(is_active=True).order_by()
+        .values_list('category').annotate(count=Count('id'))
+    )
+    children = dict(
+        category_model.objects.filter(is_active=True, parent__isnull=False).order_by()
+        .values_list('parent').annotate(count=Count('id'))
+    )
+    totals = defaultdict(int)
+    for pk, path in category_model.objects.values_list('id', 'path'):
+        if direct.get(pk):
+            for ancestor in ancestor_ids(path) or [pk]:
+                totals[ancestor] += direct[pk]
+
+    changed, last_pk = 0, 0
+    fields = ['products_count', 'total_products_count', 'children_count']
+    while True:
+        chunk = list(
+            category_model.objects.filter(pk__gt=last_pk).order_by('pk').only('id', *fields)[:chunk_size]
+        )
+        if not chunk:
+            return changed
+        stale = []
+        for category in chunk:
+            counts = (direct.get(category.pk, 0), totals.get(category.pk, 0), children.get(category.pk, 0))
+            if (category.products_count, category.total_products_count, category.children_count) != counts:
+                category.products_count, category.total_products_count, category.children_count = counts
+                stale.append(category)
+        with transaction.atomic():
+            category_model.objects.bulk_update(stale, fields)
+        changed += len(stale)
+        last_pk = chunk[-1].pk
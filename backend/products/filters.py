@@ -0,0 +1,146 @@
+"""
+فلترة المنتجات بالخصائص (facets) مع عدّاداتها.
+
+الفلاتر: brand / color / size (قيمة أو أكثر مفصولة بفواصل)، min_price / max_price (على
+السعر الفعلي بعد الخصم)، on_sale و in_stock (true/false)، و category (القسم وكل فروعه).
+
+العدّادات استعلام GROUP BY صغير لكل خاصية على عمودها وحده (العلامة، اللون، المقاس، حالة
+التخفيض، التوفر، شريحة السعر)، مفلتراً بكل الفلاتر المختارة عدا فلترها هي — فاختيار "Nike"
+لا يُصفّر عدّادات بقية العلامات، بل يُظهر كم منتجاً ستضيفه كل علامة (disjunctive facets).
+عدد صفوف كل استعلام بعدد قيم خاصيته، لا بحاصل ضرب قيم الخصائص كلها.
+"""
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import (
+    BooleanField, Case, Count, ExpressionWrapper, IntegerField, Q, Value, When,
+)
+from rest_framework.exceptions import ValidationError
+
+VALUE_FACETS = ('brand', 'color', 'size')
+# حدود شرائح السعر بالدينار العراقي (بداية كل شريحة)
+PRICE_BUCKETS = (0, 10000, 25000, 50000, 100000)
+_TRUE = ('1', 'true', 'yes')
+_FALSE = ('0', 'false', 'no')
+
+
+def parse_filters(params):
+    """يحوّل بارامترات الطلب إلى dict فلاتر؛ القيم غير الصالحة تُرجع 400."""
+    filters = {}
+    for facet in VALUE_FACETS:
+        values = [v.strip() for raw in params.getlist(facet) for v in raw.split(',') if v.strip()]
+        filters[facet] = set(values)
+    for bound in ('min_price', 'max_price'):
+        filters[bound] = _decimal(params, bound)
+    for flag in ('on_sale', 'in_stock'):
+        filters[flag] = _boolean(params, flag)
+    category = params.get('category')
+    if category:
+        try:
+            filters['category'] = int(category)
+        except ValueError:
+            raise ValidationError({'category': 'معرّف القسم غير صالح'})
+    else:
+        filters['category'] = None
+    return filters
+
+
+def _decimal(params, name):
+    raw = params.get(name)
+    if raw in (None, ''):
+        return None
+    try:
+        value = Decimal(raw)
+    except InvalidOperation:
+        raise ValidationError({name: 'قيمة السعر غير صالحة'})
+    if not value.is_finite() or value < 0:
+        raise ValidationError({name: 'قيمة السعر غير صالحة'})
+    return value
+
+
+def _boolean(params, name):
+    raw = params.get(name, '').lower()
+    if raw in _TRUE:
+        return True
+    if raw in _FALSE:
+        return False
+    return None
+
+
+def apply_filters(queryset, filters, skip=None):
+    """
+    فلاتر الخصائص (كل شيء عدا القسم)، عدا الخاصية skip إن أُعطيت (لعدّاداتها).
+    queryset يجب أن يكون من Product.objects.with_pricing().
+    """
+    for facet in VALUE_FACETS:
+        if facet != skip and filters[facet]:
+            queryset = queryset.filter(**{f'{facet}__in': filters[facet]})
+    if skip != 'price':
+        queryset = queryset.filter(_price_range_q(filters))
+    if skip != 'on_sale':
+        if filters['on_sale']:
+            queryset = queryset.on_sale()
+        elif filters['on_sale'] is not None:
+            queryset = queryset.filter(sale_active=False)
+    if skip != 'in_stock' and filters['in_stock'] is not None:
+        queryset = queryset.filter(stock_quantity__gt=0) if filters['in_stock'] else queryset.filter(stock_quantity=0)
+    return queryset
+
+
+def _price_range_q(filters):
+    q = Q()
+    if filters['min_price'] is not None:
+        q &= Q(effective_price__gte=filters['min_price'])
+    if filters['max_price'] is not None:
+        q &= Q(effective_price__lte=filters['max_price'])
+    return q
+
+
+def facet_counts(queryset, filters):
+    """
+    عدّادات كل خاصية، باستعلام GROUP BY لكل منها. queryset = المنتجات قبل فلاتر الخصائص
+    (من with_pricing() ومفلتر بالقسم إن وُجد).
+    """
+    facets = {}
+    for facet in VALUE_FACETS:
+        counts = _grouped(queryset, filters, facet, facet)
+        facets[facet] = [
+            {'value': value, 'count': count}
+            for value, count in sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+            if value
+        ]
+    for flag, column in (('on_sale', 'sale_active'), ('in_stock', 'in_stock')):
+        counts = _grouped(queryset, filters, flag, column)
+        facets[flag] = [{'value': value, 'count': counts.get(value, 0)} for value in (True, False)]
+    counts = _grouped(queryset, filters, 'price', 'price_bucket')
+    facets['price'] = [
+        {
+            'min': low,
+            'max': PRICE_BUCKETS[index + 1] if index + 1 < len(PRICE_BUCKETS) else None,
+            'count': counts.get(index, 0),
+        }
+        for index, low in enumerate(PRICE_BUCKETS)
+    ]
+    return facets
+
+
+def _grouped(queryset, filters, facet, column):
+    """{قيمة column: عدد المنتجات} بعد كل الفلاتر عدا فلتر facet."""
+    queryset = apply_filters(queryset, filters, skip=facet)
+    if column == 'in_stock':
+        queryset = queryset.annotate(
+            in_stock=ExpressionWrapper(Q(stock_quantity__gt=0), output_field=BooleanField()),
+        )
+    elif column == 'price_bucket':
+        queryset = queryset.annotate(price_bucket=Case(
+            *[When(effective_price__gte=low, then=Value(index))
+              for index, low in reversed(list(enumerate(PRICE_BUCKETS)))],
+            default=Value(0),
+            output_field=IntegerField(),
+        ))
+    rows = queryset.order_by().values_list(column).annotate(count=Count('id'))
+    counts = {}
+    for value, count in rows:
+        # sale_active قد يأتي 0/1 من SQLite
+        value = bool(value) if column in ('sale_active', 'in_stock') else value
+        counts[value] = counts.get(value, 0) + count
+    return counts
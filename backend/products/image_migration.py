@@ -0,0 +1,239 @@
+"""
+تهجير الصور الخارجية (ImgBB/imgpp) إلى R2 — متوازٍ، قابل للاستئناف، وبلا نسخ مكررة.
+
+- الروابط تُجمع فريدة من المنتجات والبنرات: صورة مشتركة بين منتجات وبنرات تُنزَّل مرة واحدة.
+- التنزيل في ThreadPoolExecutor بعدد عمّال محدود، وكل عامل يعيد استعمال requests.Session
+  خاص به (اتصالات keep-alive بدل مصافحة TLS لكل صورة).
+- الجسم يُبَثّ قطعة قطعة إلى ملف مؤقت (في الذاكرة حتى SPOOL_MAX_BYTES ثم على القرص) مع
+  حساب SHA-256 أثناء البثّ، ثم يُكتب في مخزن الصور بعنوان المحتوى (products/blobs.py):
+  المحتوى نفسه من روابط مختلفة — أو المرفوع من لوحة الإدارة — يُخزَّن مرة واحدة، والامتداد
+  من البايتات (products/uploads.py) لا من الرابط.
+- العمّال لا يلمسون قاعدة البيانات؛ الخيط الرئيسي يسجّل نتيجة كل رابط في ImageMigration
+  ويستبدل الرابط في المنتجات والبنرات فوراً، فالتشغيل المنقطع يُكمل من حيث توقف.
+
+    python manage.py migrate_images_to_r2 [--workers 8]
+
+أو في الخلفية من ‎/api/products/run-migration-secret-123/‎ (POST يبدأ، GET يعرض التقدم).
+"""
+import hashlib
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from django.core.cache import cache
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import close_old_connections
+from django.db.models import Count, F, Q
+from django.utils import timezone
+from PIL import Image
+from requests.adapters import HTTPAdapter
+
+from . import blobs
+from .cache import bump_version, BANNERS, PRODUCTS
+from .uploads import ALLOWED_IMAGE_FORMATS, MAX_UPLOAD_BYTES
+
+logger = logging.getLogger(__name__)
+
+SOURCE_MARKERS = ('imgbb', 'imgpp', 'i.ibb.co')
+DEFAULT_WORKERS = 8
+CHUNK_BYTES = 64 * 1024
+SPOOL_MAX_BYTES = 1024 * 1024
+# الصور القديمة رُفعت قبل حد الـ5 ميغابايت؛ نقبل أكبر منه قليلاً ولا نقبل ما لا حد له
+MAX_SOURCE_BYTES = 4 * MAX_UPLOAD_BYTES
+REQUEST_TIMEOUT = 30
+
+_RUNNING_KEY = 'images:migration:running'
+_LAST_RUN_KEY = 'images:migration:last'
+_sessions = threading.local()
+
+
+def is_external(url):
+    return bool(url) and any(marker in url.lower() for marker in SOURCE_MARKERS)
+
+
+def _image_fields():
+    from .serializers import ProductCardSerializer
+    return ProductCardSerializer.IMAGE_FIELDS
+
+
+def collect_sources():
+    """الروابط الخارجية الفريدة التي ما زالت مستعملة في المنتجات أو البنرات."""
+    from .models import Banner, Product
+
+    urls = set()
+    for row in Product.objects.values_list(*_image_fields()):
+        urls.update(row)
+    urls.update(Banner.objects.values_list('image_url', flat=True))
+    return sorted(url for url in urls if is_external(url))
+
+
+def _session(workers):
+    session = getattr(_sessions, 'session', None)
+    if session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=workers, max_retries=2)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        _sessions.session = session
+    return session
+
+
+def fetch(url, workers=DEFAULT_WORKERS):
+    """
+    (يعمل في خيط عامل) ينزّل الصورة بثّاً ويكتبها في مخزن الصور (products/blobs.py) إن لم
+    تكن فيه. يُرجع وصف الصورة المخزَّنة؛ تسجيلها في قاعدة البيانات على الخيط الرئيسي.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES) as spool:
+        with _session(workers).get(url, stream=True, timeout=REQUEST_TIMEOUT) as response:
+            response.raise_for_status()
+            for chunk in response.iter_content(CHUNK_BYTES):
+                size += len(chunk)
+                if size > MAX_SOURCE_BYTES:
+                    raise ValueError(f'image larger than {MAX_SOURCE_BYTES} bytes')
+                digest.update(chunk)
+                spool.write(chunk)
+
+        spool.seek(0)
+        try:
+            with Image.open(spool) as image:
+                image_format = image.format
+        except Exception:
+            raise ValueError('not an image')
+        ext = ALLOWED_IMAGE_FORMATS.get(image_format)
+        if ext is None:
+            raise ValueError(f'unsupported format {image_format}')
+
+        sha = digest.hexdigest()
+        spool.seek(0)
+        path, _ = blobs.write(File(spool, name=f'{sha}{ext}'), sha, ext)
+    return {'sha256': sha, 'path': path, 'url': default_storage.url(path), 'size': size, 'format': image_format}
+
+
+def _rewrite(source, blob, now):
+    """
+    يستبدل الرابط في كل منتج/بنر يستعمله ويسجّل مراجع الصورة. update() لا يمر بالإشارات:
+    المراجع تُضاف هنا، والإصدارات يرفعها migrate().
+    """
+    from .models import Banner, Product
+
+    changed = banners = 0
+    for model, field in [(Product, field) for field in _image_fields()] + [(Banner, 'image_url')]:
+        rows = model.objects.filter(**{field: source})
+        ids = list(rows.values_list('id', flat=True))
+        if not ids:
+            continue
+        rows.update(**{field: blob.url, 'updated_at': now})
+        blobs.add_references(blob, model, ids, field)
+        if model is Product:
+            changed += len(ids)
+        else:
+            banners += len(ids)
+    return changed, banners
+
+
+def migrate(workers=DEFAULT_WORKERS, log=None):
+    """يهجّر كل ما لم يكتمل بعد ويُرجع ملخّص التقدم (progress())."""
+    from .models import ImageMigration
+
+    log = log or logger.info
+    sources = collect_sources()
+    existing = dict(
+        ImageMigration.objects.filter(source_url__in=sources).values_list('source_url', 'status')
+    )
+    ImageMigration.objects.bulk_create(
+        [ImageMigration(source_url=url) for url in sources if url not in existing], ignore_conflicts=True,
+    )
+    now = timezone.now()
+    products_changed = banners_changed = 0
+    try:
+        # اكتملت في تشغيل سابق لكن انقطع قبل الاستبدال
+        blob_by_sha, refetch = {}, []
+        for source, sha in ImageMigration.objects.filter(
+            source_url__in=sources, status=ImageMigration.STATUS_DONE,
+        ).values_list('source_url', 'sha256'):
+            if sha not in blob_by_sha:
+                blob_by_sha[sha] = blobs.existing(sha)
+            if blob_by_sha[sha] is None:
+                # حذفها جمع المهملات منذ ذلك التشغيل (لم يكن لها مرجع بعد): تُجلب من جديد
+                refetch.append(source)
+                continue
+            changed, banners = _rewrite(source, blob_by_sha[sha], now)
+            products_changed, banners_changed = products_changed + changed, banners_changed + banners
+        if refetch:
+            ImageMigration.objects.filter(source_url__in=refetch).update(
+                status=ImageMigration.STATUS_PENDING, error='stored copy was garbage-collected', updated_at=now,
+            )
+            log(f'{len(refetch)} migrated images were garbage-collected before use, fetching them again')
+
+        pending = [url for url in sources if existing.get(url) != ImageMigration.STATUS_DONE or url in refetch]
+        log(f'{len(sources)} external images referenced, {len(pending)} to migrate with {workers} workers')
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image-migration') as pool:
+            futures = {pool.submit(fetch, url, workers): url for url in pending}
+            for future in as_completed(futures):
+                url = futures[future]
+                row = ImageMigration.objects.filter(source_url=url)
+                try:
+                    stored = future.result()
+                except Exception as exc:
+                    row.update(status=ImageMigration.STATUS_FAILED, error=str(exc)[:1000],
+                               attempts=F('attempts') + 1, updated_at=timezone.now())
+                    log(f'failed {url}: {exc}')
+                    continue
+                blob = blobs.register(stored['sha256'], stored['path'], stored['url'], stored['size'],
+                                      stored['format'])
+                row.update(status=ImageMigration.STATUS_DONE, sha256=blob.sha256, target_url=blob.url, error='',
+                           attempts=F('attempts') + 1, updated_at=timezone.now())
+                changed, banners = _rewrite(url, blob, timezone.now())
+                products_changed, banners_changed = products_changed + changed, banners_changed + banners
+                log(f'migrated {url} -> {blob.url}')
+    finally:
+        if products_changed:
+            bump_version(PRODUCTS)
+        if banners_changed:
+            bump_version(BANNERS)
+    return progress()
+
+
+def progress():
+    """عدد الروابط حسب الحالة، وعدد الصور الفريدة المخزَّنة، وحالة آخر تشغيل في الخلفية."""
+    from .models import ImageMigration
+
+    counts = dict(ImageMigration.objects.values_list('status').annotate(count=Count('id')).order_by())
+    return {
+        'running': cache.get(_RUNNING_KEY) is not None,
+        'total': sum(counts.values()),
+        **{status: counts.get(status, 0) for status, _ in ImageMigration.STATUS_CHOICES},
+        'unique_images': ImageMigration.objects.filter(~Q(sha256='')).values('sha256').distinct().count(),
+        'remaining_references': len(collect_sources()),
+        'last_run': cache.get(_LAST_RUN_KEY),
+    }
+
+
+def start_background_run(workers=DEFAULT_WORKERS):
+    """يبدأ التهجير في خيط خلفي؛ False إن كان تشغيل آخر جارياً."""
+    if not cache.add(_RUNNING_KEY, timezone.now().isoformat(), timeout=6 * 60 * 60):
+        return False
+    threading.Thread(target=_run_in_background, args=(workers,), name='image-migration', daemon=True).start()
+    return True
+
+
+def _run_in_background(workers):
+    last_run = {'started_at': timezone.now().isoformat()}
+    try:
+        migrate(workers)
+        call_command('fix_image_paths')
+        last_run['result'] = 'finished'
+    except Exception:
+        logger.exception('background image migration failed')
+        last_run['result'] = 'failed'
+    finally:
+        last_run['finished_at'] = timezone.now().isoformat()
+        cache.set(_LAST_RUN_KEY, last_run, timeout=None)
+        cache.delete(_RUNNING_KEY)
+        close_old_connections()
@@ -0,0 +1,148 @@
+"""
+نسخ الصور المتجاوبة: عند رفع صورة تُولَّد منها نسخ WebP (و AVIF إن دعمها Pillow المثبّت)
+بعروض ثابتة (VARIANT_WIDTHS)، وتُحفظ بجانب الأصل في default_storage تحت
+variants/<اسم الأصل>/<العرض>.<الصيغة>، ويُسجَّل ما وُلِّد في ImageVariantSet.
+
+التوليد يجري خارج خيط الطلب (ThreadPoolExecutor صغير داخل العملية)، فيعود الرفع فوراً.
+الصور القديمة، أو ما فاته التوليد لإعادة تشغيل العملية، يُكملها الأمر:
+    python manage.py generate_image_variants
+
+ProductSerializer و BannerSerializer يعرضان النسخ كـ srcset جاهز لكل صورة لها نسخ؛ بقية
+الصور (روابط خارجية، أو لم تُولَّد بعد) تبقى بالرابط الأصلي وحده.
+"""
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlparse
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections
+from django.db.models import Q
+from django.utils import timezone
+from PIL import Image, ImageOps, features
+
+from .cache import bump_version, BANNERS, PRODUCTS
+
+logger = logging.getLogger(__name__)
+
+VARIANT_WIDTHS = (160, 320, 640, 1024)
+# الصيغة -> (صيغة Pillow، إعدادات الحفظ)
+FORMATS = {'webp': ('WEBP', {'quality': 80, 'method': 6})}
+if 'avif' in features.modules and features.check_module('avif'):  # Pillow ≥ 11.3 المبني مع libavif
+    FORMATS['avif'] = ('AVIF', {'quality': 60})
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='image-variants')
+
+
+def schedule_variants(path, url, data=None):
+    """
+    يولّد النسخ في الخلفية (أو فوراً إن كان IMAGE_VARIANTS_ASYNC=False، كما في الاختبارات).
+    بدون data يقرأ الخيط الأصل من التخزين (الرفع المباشر إلى R2 — products/uploads.py).
+    """
+    if not getattr(settings, 'IMAGE_VARIANTS_ASYNC', True):
+        return generate_variants(path, url, data)
+    _executor.submit(_generate_in_background, path, url, data)
+
+
+def _generate_in_background(path, url, data=None):
+    try:
+        generate_variants(path, url, data)
+    except Exception:
+        logger.exception('image variants failed for %s', path)
+    finally:
+        # خيط خارج دورة الطلب: لا أحد غيره يغلق اتصال قاعدة البيانات الذي فتحه
+        close_old_connections()
+
+
+def generate_variants(path, url, data=None):
+    """يولّد النسخ من بايتات الأصل ويحفظها ويسجّلها. يُرجع ImageVariantSet."""
+    from .models import ImageVariantSet
+
+    if data is None:
+        with default_storage.open(path) as handle:
+            data = handle.read()
+
+    with Image.open(io.BytesIO(data)) as source:
+        source = ImageOps.exif_transpose(source)
+        image = source.convert('RGBA' if _has_alpha(source) else 'RGB')
+    width, height = image.size
+    # لا تكبير: العروض الأصغر من الأصل فقط، وإن كان الأصل أصغرها كلها فنسخة بعرضه هو
+    widths = [w for w in VARIANT_WIDTHS if w < width] or [width]
+
+    variants = {}
+    for name, (pillow_format, options) in FORMATS.items():
+        variants[name] = {}
+        for target in widths:
+            resized = image.resize((target, max(1, round(height * target / width))), Image.LANCZOS)
+            buffer = io.BytesIO()
+            resized.save(buffer, pillow_format, **options)
+            saved = default_storage.save(variant_path(path, target, name), ContentFile(buffer.getvalue()))
+            # التخزين المحلي يُرجع /media/...: نأخذ النطاق من رابط الأصل (المطلق دائماً)
+            variants[name][str(target)] = urljoin(url, default_storage.url(saved))
+
+    variant_set, _ = ImageVariantSet.objects.update_or_create(
+        original_url=url, defaults={'width': width, 'height': height, 'variants': variants},
+    )
+    _touch_users(url)
+    return variant_set
+
+
+def _touch_users(url):
+    """
+    المنتج/البنر حُفظ عادةً برابط الصورة قبل أن تجهز نسخها: نلمس updated_at لمن يستعملها
+    حتى تتغير بصمات ETag وتلتقطه المزامنة، ونرفع إصدارَي الذاكرة المؤقّتة (update() بلا إشارات).
+    """
+    from .models import Banner, Product
+    from .serializers import ProductCardSerializer
+
+    now = timezone.now()
+    uses_url = Q()
+    for field in ProductCardSerializer.IMAGE_FIELDS:
+        uses_url |= Q(**{field: url})
+    if Product.objects.filter(uses_url).update(updated_at=now):
+        bump_version(PRODUCTS)
+    if Banner.objects.filter(image_url=url).update(updated_at=now):
+        bump_version(BANNERS)
+
+
+def variant_path(path, width, name):
+    """variants/<مسار الأصل بلا امتداد>/<العرض>.<الصيغة>"""
+    return f'variants/{path.rsplit(".", 1)[0]}/{width}.{name}'
+
+
+def storage_path(url):
+    """
+    مسار الملف في default_storage لرابط صادر عنه، أو None لرابط خارجي (ImgBB وغيره).
+    التخزين المحلي يُرجع /media/... والرفع يجعله مطلقاً، فالمقارنة على المسار وحده عندها.
+    """
+    base = default_storage.url('x')[:-1]
+    if not base.startswith('http'):
+        url = urlparse(url).path
+    if not url.startswith(base) or url.startswith(base + 'variants/'):
+        return None
+    return url[len(base):] or None
+
+
+def _has_alpha(image):
+    return image.mode in ('RGBA', 'LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info)
+
+
+def srcset(variant_set):
+    """{"webp": "u1 160w, u2 320w", ...} لوسم <source srcset> مباشرة."""
+    return {
+        name: ', '.join(f'{url} {width}w' for width, url in sorted(urls.items(), key=lambda item: int(item[0])))
+        for name, urls in variant_set.variants.items()
+    }
+
+
+def srcsets_for(urls):
+    """{رابط أصلي: srcset} للروابط التي لها نسخ — استعلام واحد لأي عدد من الروابط."""
+    from .models import ImageVariantSet
+
+    urls = {url for url in urls if url}
+    if not urls:
+        return {}
+    return {variant_set.original_url: srcset(variant_set)
+            for variant_set in ImageVariantSet.objects.filter(original_url__in=urls)}
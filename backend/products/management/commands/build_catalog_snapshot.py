@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from products import snapshots
+
+
+class Command(BaseCommand):
+    help = ('Writes content-hashed, pre-compressed JSON snapshots of the catalog to default storage '
+            'and points catalog/manifest.json at them. Skips the build when nothing changed')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Rebuild even if the catalog did not change')
+        parser.add_argument('--watch', action='store_true', help='Keep running and rebuild whenever the catalog changes')
+        parser.add_argument('--interval', type=float, default=15, help='Seconds between change checks with --watch')
+
+    def handle(self, *args, **options):
+        force = options['force']
+        while True:
+            if force or snapshots.is_stale():
+                manifest = snapshots.build_snapshot()
+                self.stdout.write(self.style.SUCCESS(f'Catalog snapshot {manifest["version"]} written'))
+            elif not options['watch']:
+                self.stdout.write('Catalog snapshot is up to date')
+            if not options['watch']:
+                return
+            force = False
+            try:
+                time.sleep(options['interval'])
+            except KeyboardInterrupt:
+                return
@@ -1,10 +1,29 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.core.cache import cache
 
+from products import cache as catalog_cache
+
 
 class Command(BaseCommand):
-    help = 'Clears all cache data'
+    help = 'Clears all cache data, or only the given catalog namespaces (products, categories, banners, sales)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'namespaces', nargs='*',
+            help=f'Catalog namespaces to invalidate: {", ".join(catalog_cache.NAMESPACES)}. '
+                 'Without arguments the whole cache is cleared.',
+        )
 
     def handle(self, *args, **options):
-        cache.clear()
-        self.stdout.write(self.style.SUCCESS('Successfully cleared cache'))
+        namespaces = options['namespaces']
+        if not namespaces:
+            cache.clear()
+            self.stdout.write(self.style.SUCCESS('Successfully cleared cache'))
+            return
+
+        unknown = [ns for ns in namespaces if ns not in catalog_cache.NAMESPACES]
+        if unknown:
+            raise CommandError(f'Unknown namespace(s): {", ".join(unknown)}')
+        for namespace in namespaces:
+            catalog_cache.bump_version(namespace)
+            self.stdout.write(self.style.SUCCESS(f'Invalidated catalog namespace: {namespace}'))
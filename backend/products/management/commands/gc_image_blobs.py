@@ -0,0 +1,30 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from products import blobs
+
+
+class Command(BaseCommand):
+    help = ('Deletes content-addressed images (and their responsive variants) that no product, banner or '
+            'category references anymore, in batches, after a grace period for fresh uploads')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-hours', type=float, default=blobs.GC_GRACE.total_seconds() / 3600,
+                            help='Keep unreferenced images younger than this (uploaded but not saved yet)')
+        parser.add_argument('--batch-size', type=int, default=blobs.GC_BATCH_SIZE)
+        parser.add_argument('--rebuild-references', action='store_true',
+                            help='Recompute the reference table from the image fields first '
+                                 '(after bulk edits that bypassed signals)')
+        parser.add_argument('--dry-run', action='store_true', help='Only count what would be deleted')
+
+    def handle(self, *args, **options):
+        if options['rebuild_references']:
+            self.stdout.write(f'Rebuilt {blobs.rebuild_references()} image references')
+        removed = blobs.collect_garbage(
+            grace=timedelta(hours=options['grace_hours']),
+            batch_size=max(1, options['batch_size']),
+            dry_run=options['dry_run'],
+        )
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {removed} unreferenced images'))
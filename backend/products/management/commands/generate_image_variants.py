@@ -0,0 +1,41 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from products import images
+from products.models import Banner, ImageVariantSet, Product
+from products.serializers import ProductCardSerializer
+
+
+class Command(BaseCommand):
+    help = ('Generates the WebP/AVIF width variants for product and banner images stored in default storage '
+            'that do not have them yet (images uploaded before the pipeline, or whose background job was lost)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Regenerate variants that already exist')
+
+    def handle(self, *args, **options):
+        urls = set()
+        for row in Product.objects.values_list(*ProductCardSerializer.IMAGE_FIELDS):
+            urls.update(row)
+        urls.update(Banner.objects.values_list('image_url', flat=True))
+        urls.discard(None)
+        urls.discard('')
+        if not options['force']:
+            urls -= set(ImageVariantSet.objects.filter(original_url__in=urls).values_list('original_url', flat=True))
+
+        generated = skipped = failed = 0
+        for url in sorted(urls):
+            path = images.storage_path(url)
+            if path is None or not default_storage.exists(path):
+                skipped += 1
+                continue
+            try:
+                with default_storage.open(path) as handle:
+                    images.generate_variants(path, url, handle.read())
+                generated += 1
+            except Exception as exc:
+                failed += 1
+                self.stderr.write(f'{url}: {exc}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated variants for {generated} images ({skipped} external or missing, {failed} failed)'
+        ))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from products import sync
+
+
+class Command(BaseCommand):
+    help = ('Deletes catalog tombstones older than CATALOG_DELETION_RETENTION_DAYS. '
+            'Sync cursors older than that window get 410 resync_required and must start a full sync')
+
+    def handle(self, *args, **options):
+        pruned = sync.prune_deletions()
+        self.stdout.write(self.style.SUCCESS(f'Pruned {pruned} catalog deletions'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from products.counters import rebuild_category_counters
+from products.tree import rebuild_category_paths
+
+
+class Command(BaseCommand):
+    help = 'Recomputes category paths and the stored product/child counters (repair after bulk updates)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help='Categories updated per transaction')
+
+    def handle(self, *args, **options):
+        # العدّادات المجمَّعة عبر الأسلاف تعتمد على path، فيُصلَح أولاً
+        paths = rebuild_category_paths()
+        counters = rebuild_category_counters(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Fixed {paths} category paths and {counters} category counters'
+        ))
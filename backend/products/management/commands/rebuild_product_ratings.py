@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from products.cache import bump_version, PRODUCTS
+from products.ratings import rebuild_product_ratings
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the stored rating average, count and star histogram of every product (repair after bulk updates)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help='Products updated per transaction')
+
+    def handle(self, *args, **options):
+        changed = rebuild_product_ratings(chunk_size=options['chunk_size'])
+        if changed:
+            bump_version(PRODUCTS)
+        self.stdout.write(self.style.SUCCESS(f'Fixed rating aggregates of {changed} products'))
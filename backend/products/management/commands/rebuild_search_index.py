@@ -0,0 +1,25 @@
+from django.db import connection, transaction
+from django.core.management.base import BaseCommand
+
+from products.models import Product, ProductSearchDocument
+from products.search import create_search_index, document_fields
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the product search documents and the full-text index (after bulk updates or imports)'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            ProductSearchDocument.objects.all().delete()
+            ProductSearchDocument.objects.bulk_create(
+                [
+                    ProductSearchDocument(product=product, **document_fields(product))
+                    for product in Product.objects.filter(is_active=True).iterator()
+                ],
+                batch_size=500,
+            )
+            # ينشئ الفهرس إن لم يكن موجوداً (مثلاً SQLite بُني بلا FTS5 ثم حُدِّث) ويعيد بناء FTS5
+            create_search_index(connection)
+
+        count = ProductSearchDocument.objects.count()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} active products for search'))
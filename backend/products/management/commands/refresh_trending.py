@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from products import trending
+from products.cache import is_shared
+
+
+class Command(BaseCommand):
+    help = ('Adds newly rolled-up product views and newly ordered units to the time-decayed trending scores '
+            '(only products with new activity are touched)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--watch', action='store_true', help='Keep running, refreshing every --interval seconds')
+        parser.add_argument('--interval', type=float, default=300, help='Seconds between refreshes with --watch')
+
+    def handle(self, *args, **options):
+        if not is_shared():
+            raise CommandError('refresh_trending needs a cache shared with the web workers '
+                               '(CACHE_BACKEND=redis or file): with locmem its invalidations never reach them')
+        while True:
+            touched = trending.refresh()
+            self.stdout.write(self.style.SUCCESS(f'Updated trending scores of {touched} products'))
+            if not options['watch']:
+                return
+            try:
+                time.sleep(options['interval'])
+            except KeyboardInterrupt:
+                return
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from products import tracking
+from products.cache import is_shared
+
+
+class Command(BaseCommand):
+    help = ('Rolls raw product views up into daily and per-product counters, then prunes raw views '
+            'older than the retention window')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention-days', type=int, default=tracking.RETENTION_DAYS,
+                            help='Keep raw (already rolled up) views this many days')
+        parser.add_argument('--watch', action='store_true', help='Keep running, rolling up every --interval seconds')
+        parser.add_argument('--interval', type=float, default=300, help='Seconds between rollups with --watch')
+
+    def handle(self, *args, **options):
+        if not is_shared():
+            raise CommandError('rollup_product_views needs a cache shared with the web workers '
+                               '(CACHE_BACKEND=redis or file): with locmem its invalidations never reach them')
+        while True:
+            rolled = tracking.rollup()
+            pruned = tracking.prune(retention_days=options['retention_days'])
+            self.stdout.write(self.style.SUCCESS(f'Rolled up {rolled} product views, pruned {pruned} raw views'))
+            if not options['watch']:
+                return
+            try:
+                time.sleep(options['interval'])
+            except KeyboardInterrupt:
+                return
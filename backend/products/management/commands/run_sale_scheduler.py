@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from products.cache import is_shared
+from products.sale_schedule import advance
+
+
+class Command(BaseCommand):
+    help = ('Invalidates cached price listings exactly when a scheduled discount starts or ends. '
+            'Runs as a loop, or once per invocation with --once (cron / periodic task)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Check once and exit')
+        parser.add_argument(
+            '--max-sleep', type=float, default=60,
+            help='Upper bound in seconds between checks, so newly scheduled discounts are picked up',
+        )
+
+    def handle(self, *args, **options):
+        if not is_shared():
+            raise CommandError('run_sale_scheduler needs a cache shared with the web workers '
+                               '(CACHE_BACKEND=redis or file): with locmem its invalidations never reach them')
+        while True:
+            flipped, upcoming = advance()
+            if flipped:
+                self.stdout.write(f'{timezone.now():%Y-%m-%d %H:%M:%S} sale boundary passed, price listings invalidated')
+            if options['once']:
+                return
+
+            # ننام حتى الحد التالي بالضبط (بحد أقصى max_sleep)، فيبدأ التخفيض في ثانيته
+            delay = options['max_sleep']
+            if upcoming is not None:
+                delay = min(delay, (upcoming - timezone.now()).total_seconds())
+            try:
+                time.sleep(max(delay, 0.01))
+            except KeyboardInterrupt:
+                return
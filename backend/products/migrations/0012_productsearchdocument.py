@@ -0,0 +1,132 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:49
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# نسخة مجمّدة من products/search.py كما كان عند هذا الترحيل: الترحيل لا يستورد كود التطبيق
+# الحي، فتعديله لاحقاً لا يغيّر ما ينفّذه migrate على قاعدة جديدة.
+# التشكيل (فتحة، ضمة، كسرة، تنوين، شدة، سكون...) والألف الخنجرية والتطويل
+_DIACRITICS = re.compile('[ؐ-ًؚ-ٰٟۖ-ۭـ]')
+_LETTERS = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ة': 'ه',
+    'ى': 'ي',
+    'ؤ': 'و',
+    'ئ': 'ي',
+})
+_TOKEN = re.compile(r'\w+')
+# أداة التعريف وما يسبقها من حروف العطف والجر: "الأحذية" و"بالأحذية" تطابقان "أحذية"
+_ARTICLES = ('وال', 'بال', 'كال', 'فال', 'ال', 'لل')
+
+SEARCH_TABLE = 'products_productsearchdocument'
+FTS_TABLE = 'products_search_fts'
+PG_VECTOR = (
+    "setweight(to_tsvector('simple'::regconfig, name), 'A') || "
+    "setweight(to_tsvector('simple'::regconfig, keywords), 'B') || "
+    "setweight(to_tsvector('simple'::regconfig, description), 'C')"
+)
+
+
+def _tokenize(text):
+    if not text:
+        return []
+    text = ' '.join(_DIACRITICS.sub('', text).translate(_LETTERS).lower().split())
+    tokens = []
+    for token in _TOKEN.findall(text):
+        for article in _ARTICLES:
+            if token.startswith(article) and len(token) - len(article) >= 2:
+                token = token[len(article):]
+                break
+        tokens.append(token)
+    return tokens
+
+
+def populate_search_documents(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    ProductSearchDocument = apps.get_model('products', 'ProductSearchDocument')
+    ProductSearchDocument.objects.bulk_create(
+        [
+            ProductSearchDocument(
+                product_id=product.pk,
+                name=' '.join(_tokenize(product.name)),
+                keywords=' '.join(_tokenize(f'{product.brand} {product.tags}')),
+                description=' '.join(_tokenize(product.description)),
+            )
+            for product in Product.objects.filter(is_active=True).iterator()
+        ],
+        batch_size=500,
+    )
+
+
+def _sqlite_has_fts5(schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        return any(row[0] == 'ENABLE_FTS5' for row in cursor.fetchall())
+
+
+def create_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    execute = schema_editor.execute
+    if vendor == 'postgresql':
+        execute(f'CREATE INDEX IF NOT EXISTS products_search_document_gin ON {SEARCH_TABLE} USING gin (({PG_VECTOR}))')
+    elif vendor == 'sqlite' and _sqlite_has_fts5(schema_editor):
+        columns = 'name, keywords, description'
+        execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5({columns}, "
+            f"content='{SEARCH_TABLE}', content_rowid='product_id', tokenize='unicode61')"
+        )
+        execute(
+            f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {SEARCH_TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}(rowid, {columns}) "
+            f"VALUES (new.product_id, new.name, new.keywords, new.description); END"
+        )
+        execute(
+            f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {SEARCH_TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) "
+            f"VALUES ('delete', old.product_id, old.name, old.keywords, old.description); END"
+        )
+        execute(
+            f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE ON {SEARCH_TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) "
+            f"VALUES ('delete', old.product_id, old.name, old.keywords, old.description); "
+            f"INSERT INTO {FTS_TABLE}(rowid, {columns}) "
+            f"VALUES (new.product_id, new.name, new.keywords, new.description); END"
+        )
+        execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def drop_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS products_search_document_gin')
+    elif vendor == 'sqlite':
+        for suffix in ('ai', 'ad', 'au'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}')
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0011_product_catalog_order_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSearchDocument',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='products.product', verbose_name='المنتج')),
+                ('name', models.TextField(blank=True, verbose_name='الاسم المُطبَّع')),
+                ('keywords', models.TextField(blank=True, verbose_name='العلامة والكلمات المفتاحية')),
+                ('description', models.TextField(blank=True, verbose_name='الوصف المُطبَّع')),
+            ],
+            options={
+                'verbose_name': 'مستند بحث',
+                'verbose_name_plural': 'مستندات البحث',
+            },
+        ),
+        migrations.RunPython(populate_search_documents, migrations.RunPython.noop),
+        migrations.RunPython(create_index, drop_index),
+    ]
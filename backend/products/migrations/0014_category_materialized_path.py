@@ -0,0 +1,43 @@
+# Generated by Django 5.2.6 on 2026-10-18 17:01
+
+from django.db import migrations, models
+
+
+
+def populate_paths(apps, schema_editor):
+    # نسخة مجمّدة من products.tree.rebuild_category_paths: الترحيل لا يستورد كود التطبيق الحي
+    Category = apps.get_model('products', 'Category')
+    children = {}
+    for category in Category.objects.only('id', 'parent_id', 'path', 'depth'):
+        children.setdefault(category.parent_id, []).append(category)
+
+    changed = []
+    stack = [(category, '', -1) for category in children.get(None, [])]
+    while stack:
+        category, parent_path, parent_depth = stack.pop()
+        category.path, category.depth = f'{parent_path}{category.pk}/', parent_depth + 1
+        changed.append(category)
+        stack.extend((child, category.path, category.depth) for child in children.get(category.pk, []))
+
+    Category.objects.bulk_update(changed, ['path', 'depth'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0013_product_facet_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='العمق'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=255, verbose_name='المسار في الشجرة'),
+        ),
+        migrations.RunPython(populate_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.6 on 2026-10-18 17:09
+
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_counters(apps, schema_editor):
+    # نسخة مجمّدة من products.counters.rebuild_category_counters: الترحيل لا يستورد كود التطبيق الحي
+    Category = apps.get_model('products', 'Category')
+    Product = apps.get_model('products', 'Product')
+
+    direct = dict(
+        Product.objects.filter(is_active=True).order_by()
+        .values_list('category').annotate(count=Count('id'))
+    )
+    children = dict(
+        Category.objects.filter(is_active=True, parent__isnull=False).order_by()
+        .values_list('parent').annotate(count=Count('id'))
+    )
+    totals = defaultdict(int)
+    for pk, path in Category.objects.values_list('id', 'path'):
+        if direct.get(pk):
+            for ancestor in [int(part) for part in path.split('/') if part] or [pk]:
+                totals[ancestor] += direct[pk]
+
+    fields = ['products_count', 'total_products_count', 'children_count']
+    stale = []
+    for category in Category.objects.only('id', *fields):
+        counts = (direct.get(category.pk, 0), totals.get(category.pk, 0), children.get(category.pk, 0))
+        if (category.products_count, category.total_products_count, category.children_count) != counts:
+            category.products_count, category.total_products_count, category.children_count = counts
+            stale.append(category)
+    Category.objects.bulk_update(stale, fields, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0014_category_materialized_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='children_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='عدد الفروع النشطة'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='products_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='عدد المنتجات النشطة'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='total_products_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='عدد المنتجات مع الفروع'),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
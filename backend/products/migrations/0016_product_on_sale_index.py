@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-18 17:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0015_category_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_active', True), models.Q(('discount_price__isnull', False), ('discount_amount__gt', 0), _connector='OR')), fields=['discount_end', 'discount_start'], name='products_on_sale_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.6 on 2026-10-18 17:37
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0016_product_on_sale_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogDeletion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('product', 'منتج'), ('category', 'قسم'), ('banner', 'إعلان')], max_length=20, verbose_name='النوع')),
+                ('object_id', models.BigIntegerField(verbose_name='المعرّف المحذوف')),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='تاريخ الحذف')),
+            ],
+            options={
+                'verbose_name': 'عنصر محذوف',
+                'verbose_name_plural': 'سجل الحذف',
+                'ordering': ['deleted_at', 'id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='banner',
+            index=models.Index(fields=['updated_at', 'id'], name='banners_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['updated_at', 'id'], name='categories_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['updated_at', 'id'], name='products_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='catalogdeletion',
+            index=models.Index(fields=['deleted_at', 'id'], name='catalog_deletions_sync_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-18 17:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0017_catalog_sync'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageVariantSet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_url', models.URLField(max_length=500, unique=True, verbose_name='رابط الصورة الأصلية')),
+                ('width', models.PositiveIntegerField(verbose_name='العرض الأصلي')),
+                ('height', models.PositiveIntegerField(verbose_name='الارتفاع الأصلي')),
+                ('variants', models.JSONField(default=dict, verbose_name='النسخ')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='تاريخ الإنشاء')),
+            ],
+            options={
+                'verbose_name': 'نسخ صورة',
+                'verbose_name_plural': 'نسخ الصور',
+            },
+        ),
+    ]
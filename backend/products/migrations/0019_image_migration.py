@@ -0,0 +1,30 @@
+# Generated by Django 5.2.6 on 2026-10-18 17:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0018_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageMigration',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_url', models.URLField(max_length=500, unique=True, verbose_name='الرابط الأصلي')),
+                ('status', models.CharField(choices=[('pending', 'بالانتظار'), ('done', 'اكتمل'), ('failed', 'فشل')], default='pending', max_length=10, verbose_name='الحالة')),
+                ('sha256', models.CharField(blank=True, max_length=64, verbose_name='بصمة المحتوى')),
+                ('target_url', models.URLField(blank=True, max_length=500, verbose_name='الرابط الجديد')),
+                ('error', models.TextField(blank=True, verbose_name='آخر خطأ')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='المحاولات')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='آخر تحديث')),
+            ],
+            options={
+                'verbose_name': 'تهجير صورة',
+                'verbose_name_plural': 'تهجير الصور',
+            },
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0019_image_migration'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True, verbose_name='بصمة المحتوى')),
+                ('path', models.CharField(max_length=255, verbose_name='المسار في التخزين')),
+                ('url', models.URLField(db_index=True, max_length=500, verbose_name='الرابط')),
+                ('size', models.PositiveIntegerField(verbose_name='الحجم (بايت)')),
+                ('format', models.CharField(max_length=10, verbose_name='الصيغة')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='تاريخ الرفع')),
+            ],
+            options={
+                'verbose_name': 'صورة مخزَّنة',
+                'verbose_name_plural': 'الصور المخزَّنة',
+            },
+        ),
+        migrations.CreateModel(
+            name='ImageBlobReference',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('product', 'منتج'), ('category', 'قسم'), ('banner', 'إعلان')], max_length=20, verbose_name='النوع')),
+                ('object_id', models.BigIntegerField(verbose_name='المعرّف')),
+                ('field', models.CharField(max_length=30, verbose_name='الحقل')),
+                ('blob', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='references', to='products.imageblob')),
+            ],
+            options={
+                'verbose_name': 'مرجع صورة',
+                'verbose_name_plural': 'مراجع الصور',
+                'indexes': [models.Index(fields=['kind', 'object_id'], name='image_blob_ref_owner_idx')],
+                'constraints': [models.UniqueConstraint(fields=('blob', 'kind', 'object_id', 'field'), name='image_blob_reference_unique')],
+            },
+        ),
+    ]
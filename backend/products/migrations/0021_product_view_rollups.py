@@ -0,0 +1,71 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0020_image_blobs'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductViewDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='اليوم')),
+                ('views', models.PositiveIntegerField(default=0, verbose_name='المشاهدات')),
+            ],
+            options={
+                'verbose_name': 'مشاهدات يومية',
+                'verbose_name_plural': 'المشاهدات اليومية',
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductViewStats',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='view_stats', serialize=False, to='products.product', verbose_name='المنتج')),
+                ('total_views', models.PositiveIntegerField(default=0, verbose_name='إجمالي المشاهدات')),
+                ('recent_views', models.PositiveIntegerField(default=0, verbose_name='المشاهدات الأخيرة')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='آخر تجميع')),
+            ],
+            options={
+                'verbose_name': 'إحصاءات مشاهدة',
+                'verbose_name_plural': 'إحصاءات المشاهدة',
+            },
+        ),
+        migrations.AddField(
+            model_name='productview',
+            name='rolled_up',
+            field=models.BooleanField(default=False, verbose_name='مُجمَّعة'),
+        ),
+        migrations.AddIndex(
+            model_name='productview',
+            index=models.Index(condition=models.Q(('rolled_up', False)), fields=['id'], name='product_views_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productview',
+            index=models.Index(fields=['viewed_at'], name='product_views_viewed_at_idx'),
+        ),
+        migrations.AddField(
+            model_name='productviewdaily',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_views', to='products.product', verbose_name='المنتج'),
+        ),
+        migrations.AddIndex(
+            model_name='productviewstats',
+            index=models.Index(fields=['-recent_views', 'product'], name='product_view_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productviewdaily',
+            index=models.Index(fields=['date'], name='product_view_daily_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='productviewdaily',
+            constraint=models.UniqueConstraint(fields=('product', 'date'), name='product_view_daily_unique'),
+        ),
+    ]
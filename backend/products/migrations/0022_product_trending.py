@@ -0,0 +1,49 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0021_product_view_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductTrend',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trend', serialize=False, to='products.product', verbose_name='المنتج')),
+                ('log_score', models.FloatField(verbose_name='لوغاريتم الدرجة')),
+                ('views_seen', models.PositiveIntegerField(default=0, verbose_name='المشاهدات المحسوبة')),
+                ('units_sold', models.PositiveIntegerField(default=0, verbose_name='الوحدات المباعة المحسوبة')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='آخر تحديث')),
+            ],
+            options={
+                'verbose_name': 'درجة رواج',
+                'verbose_name_plural': 'درجات الرواج',
+            },
+        ),
+        migrations.CreateModel(
+            name='TrendingCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('views_checked_at', models.DateTimeField(blank=True, null=True, verbose_name='آخر تجميع مشاهدات محسوب')),
+                ('last_order_item_id', models.PositiveBigIntegerField(default=0, verbose_name='آخر عنصر طلب محسوب')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='آخر تشغيل')),
+            ],
+            options={
+                'verbose_name': 'نقطة حساب الرائج',
+                'verbose_name_plural': 'نقطة حساب الرائج',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='productviewstats',
+            index=models.Index(fields=['updated_at'], name='product_view_stats_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producttrend',
+            index=models.Index(fields=['-log_score', 'product'], name='product_trend_score_idx'),
+        ),
+    ]
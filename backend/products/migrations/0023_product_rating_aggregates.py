@@ -0,0 +1,87 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:22
+
+from collections import defaultdict
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.utils import timezone
+
+
+def populate_ratings(apps, schema_editor):
+    # نسخة مجمّدة من products.ratings.rebuild_product_ratings: الترحيل لا يستورد كود التطبيق الحي
+    Product = apps.get_model('products', 'Product')
+    ProductReview = apps.get_model('products', 'ProductReview')
+
+    votes = defaultdict(dict)
+    for product_id, stars, count in (
+        ProductReview.objects.filter(is_approved=True).order_by()
+        .values_list('product_id', 'rating').annotate(count=Count('id'))
+    ):
+        votes[product_id][stars] = count
+
+    fields = ['rating_avg', 'rating_count'] + [f'rating_{stars}_count' for stars in range(1, 6)]
+    now, stale = timezone.now(), []
+    for product in Product.objects.filter(pk__in=list(votes)).only('id', *fields):
+        histogram = {stars: votes[product.pk].get(stars, 0) for stars in range(1, 6)}
+        rating_count = sum(histogram.values())
+        if not rating_count:
+            continue
+        total = sum(stars * count for stars, count in histogram.items())
+        product.rating_count = rating_count
+        product.rating_avg = (Decimal(total) / rating_count).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        for stars in range(1, 6):
+            setattr(product, f'rating_{stars}_count', histogram[stars])
+        product.updated_at = now
+        stale.append(product)
+    Product.objects.bulk_update(stale, fields + ['updated_at'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0022_product_trending'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='rating_1_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='تقييمات ★1'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_2_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='تقييمات ★2'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_3_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='تقييمات ★3'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_4_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='تقييمات ★4'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_5_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='تقييمات ★5'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_avg',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=3, verbose_name='متوسط التقييم'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='عدد التقييمات'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['-rating_avg', '-rating_count', 'id'], name='products_rating_order_idx'),
+        ),
+        migrations.RunPython(populate_ratings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:41
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0023_product_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imageblob',
+            name='last_referenced_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='آخر استعمال'),
+        ),
+    ]
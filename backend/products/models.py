@@ -1,9 +1,66 @@
-from django.db import models
+from contextlib import nullcontext
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import DatabaseError, models, transaction
+from django.db.models.functions import Cast, Floor, Greatest
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
 
 # استيراد نماذج الكوبونات
 from .models_coupons import Coupon, CouponUsage
+from . import counters
+
+# أكبر معرّف يسعه BigAutoField (DEFAULT_AUTO_FIELD)؛ ما فوقه يرفع OverflowError من قاعدة البيانات (500)
+MAX_PRODUCT_ID = 2 ** 63 - 1
+
+
+def _remember_counted_state(instance, fields):
+    """
+    قيم الحقول التي تؤثر على العدّادات المخزَّنة (الأقسام، تقييمات المنتج) كما قُرئت من
+    قاعدة البيانات، لتقارن بها إشارة post_save بلا استعلام إضافي. الحقول المؤجَّلة (only/defer) تبقى غير معروفة.
+    """
+    instance._counted_state = {field: instance.__dict__[field] for field in fields if field in instance.__dict__}
+
+
+def _counted_save(fields, kwargs):
+    """
+    معاملة تضم كتابة الصف وتحديث عدّادات الأقسام في إشارة post_save (products/counters.py)،
+    فلا يُثبَّت أحدهما دون الآخر. الحفظ الجزئي الذي لا يمسّ fields (كـ reduce_stock) بلا معاملة.
+    """
+    if counters.touches(fields, kwargs.get('update_fields')):
+        return transaction.atomic(using=kwargs.get('using'))
+    return nullcontext()
+
+
+def _is_full_save_of_stored_row(instance, args, kwargs):
+    return not (args or kwargs.get('update_fields') is not None or kwargs.get('force_insert')
+                or instance._state.adding or instance.pk is None)
+
+
+def _save_without(instance, fields, kwargs):
+    """
+    حفظ كامل لصف موجود بـ update_fields لكل الأعمدة المحمّلة إلا fields: أعمدة تُحدَّث بـ F()
+    فقط (العدّادات، تجميعات التقييم) وقيمها في النسخة المحمّلة قد تكون قديمة. update_fields
+    واجهة save() الموثّقة، فلا اعتماد على داخل Django. من يريد كتابة هذه الأعمدة (rebuild_*)
+    يسمّيها في update_fields أو يستعمل QuerySet.update()/bulk_update.
+
+    إن حُذف الصف منذ قراءته لا يمسّ UPDATE شيئاً فيرفع Django ‏DatabaseError؛ نتحقق أنه غائب
+    فعلاً ثم ندرجه كما يفعل الحفظ الكامل العادي.
+    """
+    deferred = instance.get_deferred_fields()
+    update_fields = [
+        field.name for field in instance._meta.concrete_fields
+        if not field.primary_key and field.attname not in deferred and field.name not in fields
+    ]
+    try:
+        # نقطة حفظ: save() يعلّم المعاملة المحيطة للتراجع عند DatabaseError
+        with transaction.atomic(using=kwargs.get('using')):
+            return instance.save(**kwargs, update_fields=update_fields)
+    except DatabaseError:
+        if type(instance)._base_manager.using(kwargs.get('using')).filter(pk=instance.pk).exists():
+            raise
+    return instance.save(**kwargs, force_insert=True)
 
 
 class Category(models.Model):
@@ -19,6 +76,14 @@ class Category(models.Model):
     is_active = models.BooleanField('نشط', default=True)
     featured_on_homepage = models.BooleanField('تمييز في الواجهة الرئيسية', default=False)
     display_order = models.PositiveIntegerField('ترتيب العرض', default=0, help_text='الأقسام ذات الترتيب الأقل تظهر أولاً')
+    # المسار المادي (materialized path): معرّفات الأسلاف ثم القسم نفسه، مثل "3/17/42/".
+    # الشجرة الفرعية لقسم = path__startswith=category.path باستعلام واحد (انظر products/tree.py)
+    path = models.CharField('المسار في الشجرة', max_length=255, blank=True, default='', db_index=True, editable=False)
+    depth = models.PositiveSmallIntegerField('العمق', default=0, editable=False)
+    # عدّادات مخزَّنة تُحدّثها إشارات المنتج والقسم بـ F() (انظر products/counters.py)
+    products_count = models.PositiveIntegerField('عدد المنتجات النشطة', default=0, editable=False)
+    total_products_count = models.PositiveIntegerField('عدد المنتجات مع الفروع', default=0, editable=False)
+    children_count = models.PositiveIntegerField('عدد الفروع النشطة', default=0, editable=False)
     created_at = models.DateTimeField('تاريخ الإنشاء', auto_now_add=True)
     updated_at = models.DateTimeField('تاريخ التحديث', auto_now=True)
     
@@ -26,19 +91,128 @@ class Category(models.Model):
         verbose_name = 'قسم'
         verbose_name_plural = 'الأقسام'
         ordering = ['display_order', 'name']
+        indexes = [
+            # مفتاح الترقيم في موجز التغييرات (products/sync.py)
+            models.Index(fields=['updated_at', 'id'], name='categories_sync_idx'),
+        ]
     
     def __str__(self):
         return self.name
-    
-    @property
-    def products_count(self):
-        """Get number of active products in this category (direct products only)"""
-        return self.products.filter(is_active=True).count()
 
-    @property
-    def children_count(self):
-        """Get number of active direct subcategories"""
-        return self.children.filter(is_active=True).count()
+    COUNTER_FIELDS = ('products_count', 'total_products_count', 'children_count')
+
+    def save(self, *args, **kwargs):
+        """يحفظ القسم ويحدّث path/depth له ولكل فروعه إن تغيّر الأب. لا يكتب COUNTER_FIELDS."""
+        with _counted_save(counters.CATEGORY_FIELDS, kwargs):
+            if _is_full_save_of_stored_row(self, args, kwargs):
+                return _save_without(self, self.COUNTER_FIELDS, kwargs)
+            old_path = self.path
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                if 'parent' not in update_fields:
+                    return super().save(*args, **kwargs)
+                kwargs['update_fields'] = {*update_fields, 'path', 'depth'}
+
+            if self.pk is not None:
+                self.path, self.depth = self._tree_position()
+                super().save(*args, **kwargs)
+            else:
+                # القسم الجديد لا يعرف معرّفه (وهو آخر جزء من مساره) إلا بعد الإدراج
+                super().save(*args, **kwargs)
+                self.path, self.depth = self._tree_position()
+                Category.objects.filter(pk=self.pk).update(path=self.path, depth=self.depth)
+                _remember_counted_state(self, ('parent_id', 'is_active', 'path'))
+
+            if old_path and old_path != self.path:
+                from django.db.models import F, Value
+                from django.db.models.functions import Concat, Substr
+                Category.objects.filter(path__startswith=old_path).exclude(pk=self.pk).update(
+                    path=Concat(Value(self.path), Substr('path', len(old_path) + 1)),
+                    depth=F('depth') + (self.depth - old_path.count('/') + 1),
+                )
+
+    def _tree_position(self):
+        if self.parent_id is None:
+            return f'{self.pk}/', 0
+        parent_path, parent_depth = Category.objects.filter(pk=self.parent_id).values_list('path', 'depth').get()
+        if self.pk is not None and f'/{self.pk}/' in f'/{parent_path}':
+            raise ValueError('لا يمكن نقل القسم تحت نفسه أو تحت أحد فروعه')
+        return f'{parent_path}{self.pk}/', parent_depth + 1
+
+    def get_descendants(self, include_self=False):
+        """كل فروع القسم (بأي عمق) باستعلام واحد على path."""
+        descendants = Category.objects.filter(path__startswith=self.path)
+        return descendants if include_self else descendants.exclude(pk=self.pk)
+
+    # تُملأ من products/tree.py عند تحميل الشجرة، فلا يُستعلَم لكل قسم
+    _tree_children = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        _remember_counted_state(instance, ('parent_id', 'is_active', 'path'))
+        return instance
+
+
+class ProductQuerySet(models.QuerySet):
+    """
+    حالة التخفيض وأسعاره كتعابير SQL بدل خصائص بايثون تستدعي timezone.now() لكل صف.
+    خصائص Product (is_on_sale، discounted_price...) تقرأ هذه التعليقات إن وُجدت.
+    """
+    PRICING_FIELDS = ('sale_active', 'effective_price', 'sale_percentage', 'sale_time_left')
+
+    @staticmethod
+    def _sale_window(now):
+        # شروط أعمدة مباشرة (بلا CASE) ليستعملها الفهرس الجزئي products_on_sale_idx
+        return (
+            (models.Q(discount_start__isnull=True) | models.Q(discount_start__lte=now))
+            & (models.Q(discount_end__isnull=True) | models.Q(discount_end__gte=now))
+            & (models.Q(discount_price__isnull=False, discount_price__lt=models.F('price'))
+               | models.Q(discount_amount__gt=0))
+        )
+
+    def on_sale(self, now=None):
+        """المنتجات المخفّضة الآن — مثل is_on_sale لكن كـ WHERE."""
+        return self.filter(self._sale_window(now or timezone.now()))
+
+    def with_pricing(self, now=None):
+        """
+        يضيف sale_active و effective_price و sale_percentage و sale_time_left (مدة)،
+        كلها محسوبة بـ now واحد للاستعلام كله.
+        """
+        if 'sale_active' in self.query.annotations:
+            return self
+        now = now or timezone.now()
+        sale_active = self._sale_window(now)
+        money = models.DecimalField(max_digits=10, decimal_places=2)
+        effective_price = models.Case(
+            models.When(sale_active & models.Q(discount_price__gt=0), then=models.F('discount_price')),
+            models.When(sale_active & models.Q(discount_amount__gt=0),
+                        then=Greatest(models.F('price') - models.F('discount_amount'),
+                                      models.Value(Decimal('0'), output_field=money))),
+            default=models.F('price'),
+            output_field=money,
+        )
+        return self.annotate(
+            sale_active=models.ExpressionWrapper(sale_active, output_field=models.BooleanField()),
+            effective_price=effective_price,
+        ).annotate(
+            sale_percentage=models.Case(
+                models.When(models.Q(sale_active=True, price__gt=0, effective_price__lt=models.F('price')),
+                            then=Cast(Floor((models.F('price') - models.F('effective_price')) * 100 / models.F('price')),
+                                      models.IntegerField())),
+                default=models.Value(0),
+                output_field=models.IntegerField(),
+            ),
+            sale_time_left=models.Case(
+                models.When(models.Q(sale_active=True, discount_end__gt=now),
+                            then=models.ExpressionWrapper(
+                                models.F('discount_end') - models.Value(now, output_field=models.DateTimeField()),
+                                output_field=models.DurationField())),
+                default=models.Value(timedelta(0)),
+                output_field=models.DurationField(),
+            ),
+        )
 
 
 class Product(models.Model):
@@ -125,9 +299,23 @@ class Product(models.Model):
         help_text='المنتجات التي تظهر في أسفل صفحة هذا المنتج للزبون'
     )
     
+    # تجميعات التقييمات المعتمدة (products/ratings.py): تُحدَّث مع كل تقييم ولا تُحسب عند القراءة
+    rating_avg = models.DecimalField('متوسط التقييم', max_digits=3, decimal_places=2, default=0, editable=False)
+    rating_count = models.PositiveIntegerField('عدد التقييمات', default=0, editable=False)
+    rating_1_count = models.PositiveIntegerField('تقييمات ★1', default=0, editable=False)
+    rating_2_count = models.PositiveIntegerField('تقييمات ★2', default=0, editable=False)
+    rating_3_count = models.PositiveIntegerField('تقييمات ★3', default=0, editable=False)
+    rating_4_count = models.PositiveIntegerField('تقييمات ★4', default=0, editable=False)
+    rating_5_count = models.PositiveIntegerField('تقييمات ★5', default=0, editable=False)
+
     # Timestamps
     created_at = models.DateTimeField('تاريخ الإنشاء', auto_now_add=True)
     updated_at = models.DateTimeField('تاريخ التحديث', auto_now=True)
+
+    objects = ProductQuerySet.as_manager()
+
+    RATING_FIELDS = ('rating_avg', 'rating_count', 'rating_1_count', 'rating_2_count', 'rating_3_count',
+                     'rating_4_count', 'rating_5_count')
     
     class Meta:
         verbose_name = 'منتج'
@@ -137,30 +325,68 @@ class Product(models.Model):
             models.Index(fields=['category', 'is_active']),
             models.Index(fields=['is_featured', 'is_active']),
             models.Index(fields=['price']),
+            # يخدم ترقيم المؤشر في ProductKeysetPagination
+            models.Index(fields=['display_order', '-created_at', 'id'], name='products_catalog_order_idx'),
+            # فلاتر الخصائص في products/filters.py
+            models.Index(fields=['is_active', 'brand'], name='products_active_brand_idx'),
+            models.Index(fields=['is_active', 'color'], name='products_active_color_idx'),
+            models.Index(fields=['is_active', 'size'], name='products_active_size_idx'),
+            models.Index(fields=['updated_at', 'id'], name='products_sync_idx'),
+            # ?sort=rating (RatingKeysetPagination)
+            models.Index(fields=['-rating_avg', '-rating_count', 'id'], name='products_rating_order_idx'),
+            # المنتجات التي لها خصم أصلاً قليلة؛ on_sale() يفحص نافذتها الزمنية على هذا الفهرس
+            models.Index(
+                fields=['discount_end', 'discount_start'], name='products_on_sale_idx',
+                condition=models.Q(is_active=True) & (
+                    models.Q(discount_price__isnull=False) | models.Q(discount_amount__gt=0)
+                ),
+            ),
         ]
     
     def __str__(self):
         return self.name
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        _remember_counted_state(instance, ('category_id', 'is_active'))
+        return instance
     
     def save(self, *args, **kwargs):
         """Override save to generate slug and sync discount price from discount amount."""
-        if not self.slug:
-            from django.utils.text import slugify
-            import uuid
-            base_slug = slugify(self.name)
-            self.slug = f"{base_slug}-{uuid.uuid4().hex[:8]}"
-
-        if self.discount_amount and self.discount_amount > 0:
-            self.discount_price = max(self.price - self.discount_amount, 0)
-        elif not self.discount_amount or self.discount_amount == 0:
-            if self.discount_price is None or self.discount_price >= self.price:
-                self.discount_price = None
-
-        super().save(*args, **kwargs)
+        with _counted_save(counters.PRODUCT_FIELDS, kwargs):
+            # تجميعات التقييم تُكتب بـ F() من products/ratings.py فقط
+            if _is_full_save_of_stored_row(self, args, kwargs):
+                return _save_without(self, self.RATING_FIELDS, kwargs)
+
+            if not self.slug:
+                from django.utils.text import slugify
+                import uuid
+                base_slug = slugify(self.name)
+                self.slug = f"{base_slug}-{uuid.uuid4().hex[:8]}"
+
+            if self.discount_amount and self.discount_amount > 0:
+                self.discount_price = max(self.price - self.discount_amount, 0)
+            elif not self.discount_amount or self.discount_amount == 0:
+                if self.discount_price is None or self.discount_price >= self.price:
+                    self.discount_price = None
+
+            # تعليقات with_pricing() صارت قديمة بعد تعديل الأسعار؛ الخصائص تعود للحساب في بايثون
+            for name in ProductQuerySet.PRICING_FIELDS:
+                self.__dict__.pop(name, None)
+
+            super().save(*args, **kwargs)
+
+    @property
+    def rating_histogram(self):
+        """عدد التقييمات المعتمدة لكل نجمة: {1: …, 5: …}."""
+        return {stars: getattr(self, f'rating_{stars}_count') for stars in range(1, 6)}
     
     @property
     def discounted_price(self):
         """Calculate discounted price based on new fields or old discount_amount"""
+        if 'effective_price' in self.__dict__:
+            return self.effective_price
         if self.is_on_sale:
             if self.discount_price:
                 return self.discount_price
@@ -171,6 +397,8 @@ class Product(models.Model):
     @property
     def discount_percentage(self):
         """Calculate discount percentage for display"""
+        if 'sale_percentage' in self.__dict__:
+            return self.sale_percentage
         if self.is_on_sale:
             final_price = self.discounted_price
             if self.price > 0 and final_price < self.price:
@@ -180,6 +408,8 @@ class Product(models.Model):
     @property
     def is_on_sale(self):
         """Check if product is on sale based on time and price"""
+        if 'sale_active' in self.__dict__:
+            return bool(self.sale_active)
         now = timezone.now()
         
         # Check if within time period (if set)
@@ -194,6 +424,8 @@ class Product(models.Model):
     @property
     def time_left(self):
         """Calculate time left for discount in seconds"""
+        if 'sale_time_left' in self.__dict__:
+            return int(self.sale_time_left.total_seconds())
         if self.is_on_sale and self.discount_end:
             now = timezone.now()
             if self.discount_end > now:
@@ -255,6 +487,30 @@ class Product(models.Model):
         self.save(update_fields=['stock_quantity'])
 
 
+class ProductSearchDocument(models.Model):
+    """
+    نصوص المنتج مُطبَّعة للبحث (انظر products/search.py). صف لكل منتج نشط، تُحدّثه
+    إشارة post_save. الفهرس النصّي فوقه (GIN أو FTS5) يُنشأ في الترحيل حسب قاعدة البيانات.
+    """
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='search_document',
+        verbose_name='المنتج'
+    )
+    name = models.TextField('الاسم المُطبَّع', blank=True)
+    keywords = models.TextField('العلامة والكلمات المفتاحية', blank=True)
+    description = models.TextField('الوصف المُطبَّع', blank=True)
+
+    class Meta:
+        verbose_name = 'مستند بحث'
+        verbose_name_plural = 'مستندات البحث'
+
+    def __str__(self):
+        return self.name
+
+
 class ProductReview(models.Model):
     """Product review model"""
     product = models.ForeignKey(
@@ -286,6 +542,17 @@ class ProductReview(models.Model):
     def __str__(self):
         return f'{self.user.get_full_name()} - {self.product.name} ({self.rating}/5)'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        _remember_counted_state(instance, ('product_id', 'rating', 'is_approved'))
+        return instance
+
+    def save(self, *args, **kwargs):
+        # إشارة post_save تحدّث تجميعات المنتج (products/ratings.py) داخل معاملة الحفظ نفسها
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
 
 class ProductView(models.Model):
     """Product view tracking"""
@@ -305,17 +572,107 @@ class ProductView(models.Model):
     ip_address = models.GenericIPAddressField('عنوان IP', blank=True, null=True)
     user_agent = models.TextField('معلومات المتصفح', blank=True)
     viewed_at = models.DateTimeField('تاريخ المشاهدة', default=timezone.now)
+    # جُمعت في ProductViewDaily (products/tracking.py)؛ تُحذف بعد مهلة الاحتفاظ
+    rolled_up = models.BooleanField('مُجمَّعة', default=False)
     
     class Meta:
         verbose_name = 'مشاهدة المنتج'
         verbose_name_plural = 'مشاهدات المنتجات'
         ordering = ['-viewed_at']
+        indexes = [
+            # التجميع يقرأ غير المجمَّع فقط — فهرس جزئي صغير مهما كبر الجدول
+            models.Index(fields=['id'], condition=models.Q(rolled_up=False), name='product_views_pending_idx'),
+            models.Index(fields=['viewed_at'], name='product_views_viewed_at_idx'),
+        ]
     
     def __str__(self):
         user_info = self.user.get_full_name() if self.user else self.ip_address
         return f'{user_info} - {self.product.name}'
 
 
+class ProductViewDaily(models.Model):
+    """عدد مشاهدات المنتج في يوم — تجميع ProductView (products/tracking.py)."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='daily_views', verbose_name='المنتج')
+    date = models.DateField('اليوم')
+    views = models.PositiveIntegerField('المشاهدات', default=0)
+
+    class Meta:
+        verbose_name = 'مشاهدات يومية'
+        verbose_name_plural = 'المشاهدات اليومية'
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'date'], name='product_view_daily_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['date'], name='product_view_daily_date_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.product_id} @ {self.date}: {self.views}'
+
+
+class ProductViewStats(models.Model):
+    """
+    عدّادات المشاهدة لكل منتج (سطر واحد): الإجمالي، ومشاهدات آخر RECENT_DAYS يوماً للأكثر
+    مشاهدة. يكتبها أمر rollup_product_views وحده.
+    """
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True,
+                                   related_name='view_stats', verbose_name='المنتج')
+    total_views = models.PositiveIntegerField('إجمالي المشاهدات', default=0)
+    recent_views = models.PositiveIntegerField('المشاهدات الأخيرة', default=0)
+    updated_at = models.DateTimeField('آخر تجميع', auto_now=True)
+
+    class Meta:
+        verbose_name = 'إحصاءات مشاهدة'
+        verbose_name_plural = 'إحصاءات المشاهدة'
+        indexes = [
+            models.Index(fields=['-recent_views', 'product'], name='product_view_recent_idx'),
+            # حساب الرائج (products/trending.py) يقرأ ما تغيّر منذ آخر تشغيل فقط
+            models.Index(fields=['updated_at'], name='product_view_stats_updated_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.product_id}: {self.total_views}'
+
+
+class ProductTrend(models.Model):
+    """
+    درجة "الرائج الآن" للمنتج: مشاهدات ووحدات مباعة تتلاشى أهميتها بنصف عمر ثابت.
+    تُخزَّن لوغاريتمياً منسوبةً إلى لحظة ثابتة (انظر products/trending.py) فلا تتغير
+    إلا أسطر المنتجات التي جدّ عليها شيء. يكتبها أمر refresh_trending وحده.
+    """
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True,
+                                   related_name='trend', verbose_name='المنتج')
+    log_score = models.FloatField('لوغاريتم الدرجة')
+    # آخر total_views من ProductViewStats أُضيف إلى الدرجة — الفرق عنه هو المشاهدات الجديدة
+    views_seen = models.PositiveIntegerField('المشاهدات المحسوبة', default=0)
+    units_sold = models.PositiveIntegerField('الوحدات المباعة المحسوبة', default=0)
+    updated_at = models.DateTimeField('آخر تحديث', auto_now=True)
+
+    class Meta:
+        verbose_name = 'درجة رواج'
+        verbose_name_plural = 'درجات الرواج'
+        indexes = [
+            models.Index(fields=['-log_score', 'product'], name='product_trend_score_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.product_id}: {self.log_score:.3f}'
+
+
+class TrendingCheckpoint(models.Model):
+    """سطر واحد: إلى أين وصل refresh_trending في المشاهدات المجمَّعة وعناصر الطلبات."""
+    views_checked_at = models.DateTimeField('آخر تجميع مشاهدات محسوب', blank=True, null=True)
+    last_order_item_id = models.PositiveBigIntegerField('آخر عنصر طلب محسوب', default=0)
+    updated_at = models.DateTimeField('آخر تشغيل', auto_now=True)
+
+    class Meta:
+        verbose_name = 'نقطة حساب الرائج'
+        verbose_name_plural = 'نقطة حساب الرائج'
+
+    def __str__(self):
+        return f'views≤{self.views_checked_at}, items≤{self.last_order_item_id}'
+
+
 class Banner(models.Model):
     """Banner/Advertisement model for homepage & offers-page sliders"""
     PLACEMENT_HOME = 'home'
@@ -358,6 +715,9 @@ class Banner(models.Model):
         verbose_name = 'إعلان'
         verbose_name_plural = 'الإعلانات'
         ordering = ['display_order', '-created_at']
+        indexes = [
+            models.Index(fields=['updated_at', 'id'], name='banners_sync_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -379,4 +739,130 @@ class Banner(models.Model):
             print(f"Banner image field: {self.image}")
             print(f"Banner image URL: {self.image.url}")
             return self.image.url
-        return "#"
\ No newline at end of file
+        return "#"
+
+
+class CatalogDeletion(models.Model):
+    """
+    سجل حذف المنتجات والأقسام والبنرات (tombstones) لموجز التغييرات في products/sync.py:
+    الصف المحذوف لا يبقى ليظهر في updated_at، فتُكتب هنا من إشارة post_delete.
+    """
+    KIND_PRODUCT = 'product'
+    KIND_CATEGORY = 'category'
+    KIND_BANNER = 'banner'
+    KIND_CHOICES = [
+        (KIND_PRODUCT, 'منتج'),
+        (KIND_CATEGORY, 'قسم'),
+        (KIND_BANNER, 'إعلان'),
+    ]
+
+    kind = models.CharField('النوع', max_length=20, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField('المعرّف المحذوف')
+    deleted_at = models.DateTimeField('تاريخ الحذف', default=timezone.now)
+
+    class Meta:
+        verbose_name = 'عنصر محذوف'
+        verbose_name_plural = 'سجل الحذف'
+        ordering = ['deleted_at', 'id']
+        indexes = [
+            models.Index(fields=['deleted_at', 'id'], name='catalog_deletions_sync_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.kind} #{self.object_id}'
+
+
+class ImageVariantSet(models.Model):
+    """
+    النسخ المصغّرة (WebP/AVIF بعروض ثابتة) لصورة رُفعت إلى التخزين — انظر products/images.py.
+    original_url هو الرابط نفسه المحفوظ في حقول الصور، فيُربط به التمثيل بلا أي تحويل.
+    """
+    original_url = models.URLField('رابط الصورة الأصلية', max_length=500, unique=True)
+    width = models.PositiveIntegerField('العرض الأصلي')
+    height = models.PositiveIntegerField('الارتفاع الأصلي')
+    # {"webp": {"320": "<url>", ...}, "avif": {...}}
+    variants = models.JSONField('النسخ', default=dict)
+    created_at = models.DateTimeField('تاريخ الإنشاء', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'نسخ صورة'
+        verbose_name_plural = 'نسخ الصور'
+
+    def __str__(self):
+        return self.original_url
+
+
+class ImageMigration(models.Model):
+    """
+    نقطة استئناف تهجير الصور الخارجية (ImgBB) إلى R2 — سطر لكل رابط مصدر فريد.
+    التشغيل التالي يتخطى ما اكتمل ويعيد المحاولة لما فشل. انظر products/image_migration.py.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'بالانتظار'),
+        (STATUS_DONE, 'اكتمل'),
+        (STATUS_FAILED, 'فشل'),
+    ]
+
+    source_url = models.URLField('الرابط الأصلي', max_length=500, unique=True)
+    status = models.CharField('الحالة', max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    sha256 = models.CharField('بصمة المحتوى', max_length=64, blank=True)
+    target_url = models.URLField('الرابط الجديد', max_length=500, blank=True)
+    error = models.TextField('آخر خطأ', blank=True)
+    attempts = models.PositiveIntegerField('المحاولات', default=0)
+    updated_at = models.DateTimeField('آخر تحديث', auto_now=True)
+
+    class Meta:
+        verbose_name = 'تهجير صورة'
+        verbose_name_plural = 'تهجير الصور'
+
+    def __str__(self):
+        return f'{self.source_url} ({self.status})'
+
+
+class ImageBlob(models.Model):
+    """
+    صورة مخزَّنة باسم بصمة محتواها (images/<sha256>.<ext>) — انظر products/blobs.py.
+    الصورة نفسها تُخزَّن مرة واحدة مهما رُفعت، ويعود رابطها نفسه (ساخناً في الـCDN).
+    """
+    sha256 = models.CharField('بصمة المحتوى', max_length=64, unique=True)
+    path = models.CharField('المسار في التخزين', max_length=255)
+    url = models.URLField('الرابط', max_length=500, db_index=True)
+    size = models.PositiveIntegerField('الحجم (بايت)')
+    format = models.CharField('الصيغة', max_length=10)
+    created_at = models.DateTimeField('تاريخ الرفع', auto_now_add=True)
+    # يُلمس كلما أُعيد استعمال الصورة برفع أو سؤال بالبصمة؛ جمع المهملات يحسب مهلة السماح منه
+    last_referenced_at = models.DateTimeField('آخر استعمال', default=timezone.now)
+
+    class Meta:
+        verbose_name = 'صورة مخزَّنة'
+        verbose_name_plural = 'الصور المخزَّنة'
+
+    def __str__(self):
+        return self.path
+
+
+class ImageBlobReference(models.Model):
+    """
+    من يستعمل الصورة: (نوع، معرّف، حقل). صورة بلا مراجع بعد مهلة السماح تُحذف
+    (manage.py gc_image_blobs). تُحدَّث من إشارات الحفظ/الحذف.
+    """
+    blob = models.ForeignKey(ImageBlob, on_delete=models.CASCADE, related_name='references')
+    kind = models.CharField('النوع', max_length=20, choices=CatalogDeletion.KIND_CHOICES)
+    object_id = models.BigIntegerField('المعرّف')
+    field = models.CharField('الحقل', max_length=30)
+
+    class Meta:
+        verbose_name = 'مرجع صورة'
+        verbose_name_plural = 'مراجع الصور'
+        constraints = [
+            models.UniqueConstraint(fields=['blob', 'kind', 'object_id', 'field'], name='image_blob_reference_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['kind', 'object_id'], name='image_blob_ref_owner_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.kind} #{self.object_id}.{self.field}'
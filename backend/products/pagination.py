@@ -0,0 +1,182 @@
+import base64
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class ProductKeysetPagination(BasePagination):
+    """
+    ترقيم بالمؤشر (keyset) لقوائم المنتجات على المفتاح (display_order, -created_at, id).
+
+    بخلاف ترقيم الصفحات بـ OFFSET، لا تمرّ قاعدة البيانات على الصفوف السابقة:
+    الصفحة الأولى والصفحة الألف كلاهما "أعطني أول N بعد هذا المفتاح" على فهرس
+    products_catalog_order_idx. الـ id في آخر المفتاح يجعل الترتيب كلّياً، فلا
+    يتكرر منتج ولا يسقط بين صفحتين حتى لو تشاركت منتجات كثيرة نفس display_order
+    (وهو الحال الشائع: الترتيب الافتراضي 0).
+    """
+    ordering = ('display_order', '-created_at', 'id')
+    page_size = api_settings.PAGE_SIZE or 20
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'مؤشر الصفحة غير صالح'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request)
+        if position is not None:
+            queryset = queryset.filter(self.after(position))
+
+        # نجلب عنصراً زائداً واحداً لنعرف إن كانت هناك صفحة تالية، بلا COUNT
+        results = list(queryset[:self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        cursor = self.encode_cursor(self.position(self.page[-1]))
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def position(self, product):
+        """مفتاح الترتيب لآخر منتج في الصفحة، كما يُكتب في المؤشر (قيم JSON)."""
+        return product.display_order, product.created_at.isoformat(), product.id
+
+    def parse_position(self, values):
+        display_order, created_at, pk = values
+        created_at = parse_datetime(created_at)
+        if created_at is None:
+            raise ValueError(created_at)
+        return int(display_order), created_at, int(pk)
+
+    def after(self, position):
+        """شرط "بعد هذا المفتاح" بترتيب ordering."""
+        display_order, created_at, pk = position
+        return (
+            Q(display_order__gt=display_order)
+            | Q(display_order=display_order, created_at__lt=created_at)
+            | Q(display_order=display_order, created_at=created_at, id__gt=pk)
+        )
+
+    def encode_cursor(self, position):
+        raw = json.dumps(position, separators=(',', ':')).encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            return self.parse_position(json.loads(base64.urlsafe_b64decode(encoded.encode('ascii'))))
+        except (TypeError, ValueError, UnicodeError, InvalidOperation):
+            raise NotFound(self.invalid_cursor_message)
+
+
+class RatingKeysetPagination(ProductKeysetPagination):
+    """
+    ?sort=rating: الأعلى تقييماً أولاً على (‎-rating_avg, -rating_count, id‎) — أعمدة مخزَّنة
+    في المنتج (products/ratings.py) وفهرس products_rating_order_idx، بلا JOIN على التقييمات.
+    """
+    ordering = ('-rating_avg', '-rating_count', 'id')
+
+    def position(self, product):
+        return str(product.rating_avg), product.rating_count, product.id
+
+    def parse_position(self, values):
+        rating_avg, rating_count, pk = values
+        rating_avg = Decimal(rating_avg)
+        # Decimal يقبل "NaN" و"Infinity"، والمقارنة بها في after() ترفع ValidationError (500)
+        if not rating_avg.is_finite():
+            raise NotFound(self.invalid_cursor_message)
+        return rating_avg, int(rating_count), int(pk)
+
+    def after(self, position):
+        rating_avg, rating_count, pk = position
+        return (
+            Q(rating_avg__lt=rating_avg)
+            | Q(rating_avg=rating_avg, rating_count__lt=rating_count)
+            | Q(rating_avg=rating_avg, rating_count=rating_count, id__gt=pk)
+        )
+
+
+class SearchResultsPagination(ProductKeysetPagination):
+    """
+    ترقيم نتائج البحث. النتائج مرتبة بالصلة (rank) لا بمفتاح ثابت فلا يصلح keyset عليها؛
+    المؤشر هنا إزاحة داخل قائمة مرتبة محدودة بـ max_results، فكلفة أي صفحة محدودة
+    مهما كبر الكتالوج. شكل الرد نفسه ({next, results}) فلا يتغير شيء عند العميل.
+    """
+    max_results = 500
+
+    def paginate_search(self, search, queryset, request):
+        """
+        search(limit) تُرجِع معرّفات مرتبة بالصلة. تُجلب منتجات الصفحة فقط من queryset
+        ويُحفظ ترتيب البحث.
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.offset = self.decode_cursor(request) or 0
+
+        end = self.offset + self.page_size
+        ids = search(min(end + 1, self.max_results))
+        self.has_next = len(ids) > end
+        page_ids = ids[self.offset:end]
+
+        products = queryset.in_bulk(page_ids)
+        self.page = [products[pk] for pk in page_ids if pk in products]
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        cursor = self.encode_cursor(self.offset + self.page_size)
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            offset = int(json.loads(base64.urlsafe_b64decode(encoded.encode('ascii'))))
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not 0 <= offset < self.max_results:
+            raise NotFound(self.invalid_cursor_message)
+        return offset
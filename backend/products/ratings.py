@@ -0,0 +1,127 @@
+"""
+تجميعات تقييمات المنتج المخزَّنة في صفه: rating_count و rating_avg ومدرّج النجوم
+rating_1_count..rating_5_count — من التقييمات المعتمدة (is_approved) فقط.
+
+تُحدَّث تدريجياً من إشارات حفظ/حذف ProductReview بتحديثات F() ذرّية، داخل معاملة الحفظ
+نفسها (ProductReview.save) أو الحذف (معاملة Collector). الحالة السابقة للتقييم (المنتج،
+النجوم، الاعتماد) تُحفظ عند قراءته (from_db) كما في عدّادات الأقسام (products/counters.py)،
+فالإنشاء والتعديل والاعتماد وإلغاؤه والحذف كلها "طرح القديم + إضافة الجديد".
+
+بطاقة المنتج تعرض التقييم وتُرتَّب به (‎?sort=rating‎) من أعمدة المنتج، بلا JOIN ولا AVG.
+
+الإصلاح بعد تعديلات تتجاوز الإشارات (update()/bulk_create/SQL يدوي):
+    python manage.py rebuild_product_ratings
+"""
+from collections import defaultdict
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, F, FloatField, Value, When
+from django.db.models.functions import Cast, Round
+from django.utils import timezone
+
+from .cache import bump_version, PRODUCTS
+from .counters import saved_state, shifted
+
+REVIEW_FIELDS = ('product_id', 'rating', 'is_approved')
+STARS = range(1, 6)
+_CENT = Decimal('0.01')
+
+
+def _counted(state):
+    """(المنتج، النجوم) التي يُحسب عليها التقييم، أو None إن لم يكن معتمداً."""
+    if state.get('is_approved') and state.get('product_id') and state.get('rating') in STARS:
+        return state['product_id'], state['rating']
+    return None
+
+
+def review_saved(review, update_fields=None):
+    state = saved_state(review, REVIEW_FIELDS, update_fields)
+    before, after = _counted(review._counted_state), _counted(state)
+    if before != after:
+        if before is not None:
+            _add(*before, -1)
+        if after is not None:
+            _add(*after, 1)
+    review._counted_state = state
+
+
+def review_deleted(review):
+    before = _counted(review._counted_state)
+    if before is not None:
+        _add(*before, -1)
+
+
+def _average():
+    """المتوسط من أعمدة المدرّج نفسها (بعد تحديثها)، مقرّباً لمنزلتين."""
+    weighted = sum((F(f'rating_{stars}_count') * stars for stars in STARS), Value(0))
+    average = Round(Cast(weighted, FloatField()) / F('rating_count'), 2)
+    return Case(
+        When(rating_count=0, then=Value(Decimal('0'))),
+        default=Cast(average, DecimalField(max_digits=3, decimal_places=2)),
+        output_field=DecimalField(max_digits=3, decimal_places=2),
+    )
+
+
+def _add(product_id, stars, delta):
+    from .models import Product
+
+    histogram = f'rating_{stars}_count'
+    product = Product.objects.filter(pk=product_id)
+    # updated_at يتغير لتلتقط التقييمَ البصمةُ (conditional.py) وموجزُ التغييرات (sync.py)
+    product.update(rating_count=shifted('rating_count', delta), updated_at=timezone.now(),
+                   **{histogram: shifted(histogram, delta)})
+    product.update(rating_avg=_average())
+    # بعد التثبيت كما في signals.py: رفعٌ قبله يترك قارئاً متزامناً يخزّن التقييم القديم تحت الإصدار الجديد
+    transaction.on_commit(lambda: bump_version(PRODUCTS))
+
+
+def summarize(histogram):
+    """(العدد، المتوسط) من {نجوم: عدد} — المرجع الذي تطابقه تحديثات _add."""
+    count = sum(histogram.values())
+    if not count:
+        return 0, Decimal('0.00')
+    total = sum(stars * votes for stars, votes in histogram.items())
+    return count, (Decimal(total) / count).quantize(_CENT, rounding=ROUND_HALF_UP)
+
+
+def rebuild_product_ratings(product_model=None, review_model=None, chunk_size=500):
+    """
+    يعيد حساب تجميعات التقييم من الصفر، على دفعات من chunk_size منتجاً (كل دفعة معاملة
+    تقفل منتجاتها). يُرجع عدد المنتجات التي تغيّرت. الترحيل 0023 يحمل نسخته المجمّدة منها.
+    """
+    if product_model is None or review_model is None:
+        from .models import Product, ProductReview
+        product_model, review_model = product_model or Product, review_model or ProductReview
+
+    fields = ['rating_avg', 'rating_count'] + [f'rating_{stars}_count' for stars in STARS]
+    changed, last_pk = 0, 0
+    while True:
+        with transaction.atomic():
+            chunk = list(
+                product_model.objects.select_for_update().filter(pk__gt=last_pk).order_by('pk')
+                .only('id', *fields)[:chunk_size]
+            )
+            if not chunk:
+                return changed
+            votes = defaultdict(dict)
+            for product_id, stars, count in (
+                review_model.objects.filter(product_id__in=[product.pk for product in chunk], is_approved=True)
+                .order_by().values_list('product_id', 'rating').annotate(count=Count('id'))
+            ):
+                votes[product_id][stars] = count
+
+            now, stale = timezone.now(), []
+            for product in chunk:
+                histogram = {stars: votes[product.pk].get(stars, 0) for stars in STARS}
+                rating_count, rating_avg = summarize(histogram)
+                current = [getattr(product, field) for field in fields]
+                wanted = [rating_avg, rating_count] + [histogram[stars] for stars in STARS]
+                if current != wanted:
+                    for field, value in zip(fields, wanted):
+                        setattr(product, field, value)
+                    product.updated_at = now
+                    stale.append(product)
+            product_model.objects.bulk_update(stale, fields + ['updated_at'])
+        changed += len(stale)
+        last_pk = chunk[-1].pk
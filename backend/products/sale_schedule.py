@@ -0,0 +1,60 @@
+"""
+حدود التخفيضات المجدولة (discount_start / discount_end).
+
+حالة التخفيض تتغير بمرور الوقت وحده، بلا أي حفظ يرفع إصدار الذاكرة المؤقّتة. لذلك
+تعتمد الردود التي تعرض الأسعار (قوائم المنتجات) على نطاق مستقل SALES، وهذا المجدول
+يرفعه لحظة مرور أي حد — فتبقى بقية الردود (شجرة الأقسام، البنرات، الاقتراحات) مخزَّنة.
+
+الحدود القادمة تُقرأ بتجميع واحد على الفهرس الجزئي products_on_sale_idx (المنتجات
+النشطة التي لها خصم أصلاً). آخر لحظة فُحصت تُحفظ في الذاكرة المؤقّتة، فيعمل المجدول
+كحلقة مستمرة أو كمهمة دورية (cron) على حدّ سواء:
+
+    python manage.py run_sale_scheduler          # حلقة تنام حتى الحد التالي
+    python manage.py run_sale_scheduler --once   # فحص واحد (لـ cron)
+
+الرفع يجب أن يصل إلى عمّال الويب، فالأمر يرفض العمل بذاكرة خاصة بالعملية (locmem).
+"""
+from django.core.cache import cache
+from django.db.models import Max, Min, Q
+from django.utils import timezone
+
+from .cache import bump_version, SALES
+
+_CHECKED_KEY = 'catalog:sales:checked'
+
+
+def _discounted_products():
+    from .models import Product
+    # نفس شرط الفهرس الجزئي products_on_sale_idx حتى يُستعمل
+    return Product.objects.filter(
+        Q(is_active=True) & (Q(discount_price__isnull=False) | Q(discount_amount__gt=0))
+    )
+
+
+def boundaries(now):
+    """(آخر حد مرّ، أول حد قادم) باستعلام واحد؛ أيٌّ منهما None إن لم يوجد."""
+    row = _discounted_products().aggregate(
+        started=Max('discount_start', filter=Q(discount_start__lte=now)),
+        # is_on_sale يبقى صحيحاً حتى discount_end نفسها، فالنهاية تُحسب بعد تجاوزها
+        ended=Max('discount_end', filter=Q(discount_end__lt=now)),
+        next_start=Min('discount_start', filter=Q(discount_start__gt=now)),
+        next_end=Min('discount_end', filter=Q(discount_end__gte=now)),
+    )
+    passed = [value for value in (row['started'], row['ended']) if value]
+    upcoming = [value for value in (row['next_start'], row['next_end']) if value]
+    return max(passed, default=None), min(upcoming, default=None)
+
+
+def advance(now=None):
+    """
+    يرفع إصدار SALES إن مرّ حد منذ الفحص السابق (أو لم يُعرف فحص سابق)، ويُرجع
+    (هل رُفع، موعد الحد التالي).
+    """
+    now = now or timezone.now()
+    last_checked = cache.get(_CHECKED_KEY)
+    passed, upcoming = boundaries(now)
+    flipped = last_checked is None or (passed is not None and passed > last_checked)
+    if flipped:
+        bump_version(SALES)
+    cache.set(_CHECKED_KEY, now, timeout=None)
+    return flipped, upcoming
@@ -0,0 +1,194 @@
+"""
+البحث النصّي في المنتجات مع تطبيع العربية.
+
+لكل منتج نشط صفّ في ProductSearchDocument يحوي نصوصه مُطبَّعة (الاسم، الكلمات المفتاحية =
+العلامة التجارية + tags، والوصف). التطبيع يجري في بايثون عند الحفظ وعلى نص الاستعلام
+بنفس الدالة، فتتطابق "أحذية" و"احذيه" و"أَحْذِيَة".
+
+الفهرس نفسه خاص بقاعدة البيانات (يُنشأ في الترحيل 0012):
+- PostgreSQL: فهرس GIN على تعبير tsvector بأوزان (الاسم A، الكلمات B، الوصف C)،
+  والترتيب بـ ts_rank.
+- SQLite: جدول FTS5 خارجي المحتوى تُحدّثه triggers، والترتيب بـ bm25.
+- غيرهما (أو SQLite بلا FTS5): icontains على المستند المطبَّع، بلا ترتيب بالصلة.
+"""
+import re
+
+from django.db import connection
+
+# التشكيل (فتحة، ضمة، كسرة، تنوين، شدة، سكون...) والألف الخنجرية والتطويل
+_DIACRITICS = re.compile('[ؐ-ًؚ-ٰٟۖ-ۭـ]')
+_LETTERS = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ة': 'ه',
+    'ى': 'ي',
+    'ؤ': 'و',
+    'ئ': 'ي',
+})
+_TOKEN = re.compile(r'\w+')
+# أداة التعريف وما يسبقها من حروف العطف والجر: "الأحذية" و"بالأحذية" تطابقان "أحذية"
+_ARTICLES = ('وال', 'بال', 'كال', 'فال', 'ال', 'لل')
+
+SEARCH_TABLE = 'products_productsearchdocument'
+FTS_TABLE = 'products_search_fts'
+# يجب أن يطابق تعبير الفهرس في الترحيل حرفياً حتى يستخدمه PostgreSQL
+PG_VECTOR = (
+    "setweight(to_tsvector('simple'::regconfig, name), 'A') || "
+    "setweight(to_tsvector('simple'::regconfig, keywords), 'B') || "
+    "setweight(to_tsvector('simple'::regconfig, description), 'C')"
+)
+
+
+def normalize_arabic(text):
+    """توحيد أشكال الألف والتاء المربوطة والياء، وحذف التشكيل والتطويل، وتصغير اللاتيني."""
+    if not text:
+        return ''
+    text = _DIACRITICS.sub('', text).translate(_LETTERS).lower()
+    return ' '.join(text.split())
+
+
+def _strip_article(token):
+    for article in _ARTICLES:
+        if token.startswith(article) and len(token) - len(article) >= 2:
+            return token[len(article):]
+    return token
+
+
+def tokenize(text):
+    """كلمات النص بعد التطبيع وحذف أداة التعريف — تُطبَّق على المستند والاستعلام معاً."""
+    return [_strip_article(token) for token in _TOKEN.findall(normalize_arabic(text))]
+
+
+def document_fields(product):
+    """حقول ProductSearchDocument لمنتج — مُطبَّعة."""
+    return {
+        'name': ' '.join(tokenize(product.name)),
+        'keywords': ' '.join(tokenize(f'{product.brand} {product.tags}')),
+        'description': ' '.join(tokenize(product.description)),
+    }
+
+
+def update_search_document(product):
+    """يُستدعى بعد حفظ المنتج: المنتجات النشطة فقط في الفهرس."""
+    from .models import ProductSearchDocument
+
+    if product.is_active:
+        ProductSearchDocument.objects.update_or_create(product=product, defaults=document_fields(product))
+    else:
+        ProductSearchDocument.objects.filter(product=product).delete()
+
+
+def search_product_ids(query, limit):
+    """
+    معرّفات المنتجات المطابقة لكل كلمات الاستعلام (كبادئات)، مرتبة بالصلة، بحد أقصى limit.
+    """
+    tokens = tokenize(query)
+    if not tokens:
+        return []
+    if connection.vendor == 'postgresql':
+        return _search_postgresql(tokens, limit)
+    if connection.vendor == 'sqlite' and fts5_table_exists():
+        return _search_sqlite(tokens, limit)
+    return _search_fallback(tokens, limit)
+
+
+def _search_postgresql(tokens, limit):
+    tsquery = ' & '.join(f'{token}:*' for token in tokens)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT product_id FROM {SEARCH_TABLE}, to_tsquery('simple', %s) AS query "
+            f"WHERE ({PG_VECTOR}) @@ query "
+            f"ORDER BY ts_rank({PG_VECTOR}, query) DESC, product_id LIMIT %s",
+            [tsquery, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _search_sqlite(tokens, limit):
+    # كل كلمة بين علامتي تنصيص (لا تُفسَّر كعامل FTS) مع * للبحث بالبادئة
+    match = ' '.join('"{}"*'.format(token.replace('"', '')) for token in tokens)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+            f"ORDER BY bm25({FTS_TABLE}, 10.0, 5.0, 1.0), rowid LIMIT %s",
+            [match, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _search_fallback(tokens, limit):
+    from django.db.models import Q
+    from .models import ProductSearchDocument
+
+    documents = ProductSearchDocument.objects.all()
+    for token in tokens:
+        documents = documents.filter(
+            Q(name__icontains=token) | Q(keywords__icontains=token) | Q(description__icontains=token)
+        )
+    return list(documents.order_by('product__display_order', 'product_id').values_list('product_id', flat=True)[:limit])
+
+
+def fts5_table_exists():
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+        return cursor.fetchone() is not None
+
+
+def create_search_index(db_connection):
+    """الفهرس النصّي حسب قاعدة البيانات. يُستدعى من أمر rebuild_search_index (الترحيل 0012 يحمل نسخة مجمّدة منه)."""
+    vendor = db_connection.vendor
+    execute = _executor(db_connection)
+    if vendor == 'postgresql':
+        execute(
+            f'CREATE INDEX IF NOT EXISTS products_search_document_gin '
+            f'ON {SEARCH_TABLE} USING gin (({PG_VECTOR}))'
+        )
+    elif vendor == 'sqlite' and _sqlite_has_fts5(db_connection):
+        # external content: النصوص لا تُكرَّر، FTS5 يقرأها من جدول المستندات عبر product_id
+        execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            f"name, keywords, description, "
+            f"content='{SEARCH_TABLE}', content_rowid='product_id', tokenize='unicode61')"
+        )
+        columns = 'name, keywords, description'
+        execute(
+            f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {SEARCH_TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}(rowid, {columns}) "
+            f"VALUES (new.product_id, new.name, new.keywords, new.description); END"
+        )
+        execute(
+            f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {SEARCH_TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) "
+            f"VALUES ('delete', old.product_id, old.name, old.keywords, old.description); END"
+        )
+        execute(
+            f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE ON {SEARCH_TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) "
+            f"VALUES ('delete', old.product_id, old.name, old.keywords, old.description); "
+            f"INSERT INTO {FTS_TABLE}(rowid, {columns}) "
+            f"VALUES (new.product_id, new.name, new.keywords, new.description); END"
+        )
+        execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def drop_search_index(db_connection):
+    vendor = db_connection.vendor
+    execute = _executor(db_connection)
+    if vendor == 'postgresql':
+        execute('DROP INDEX IF EXISTS products_search_document_gin')
+    elif vendor == 'sqlite':
+        for suffix in ('ai', 'ad', 'au'):
+            execute(f'DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}')
+        execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+def _sqlite_has_fts5(db_connection):
+    with db_connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        return any(row[0] == 'ENABLE_FTS5' for row in cursor.fetchall())
+
+
+def _executor(db_connection):
+    def execute(sql):
+        with db_connection.cursor() as cursor:
+            cursor.execute(sql)
+    return execute
@@ -1,5 +1,7 @@
+from django.db.models import Prefetch
 from rest_framework import serializers
 from .models import Product, Category, Banner
+from . import images
 from .models_coupons import Coupon, CouponUsage
 from .serializers_coupons import CouponSerializer, CouponUsageSerializer
 import logging
@@ -8,10 +10,6 @@ logger = logging.getLogger(__name__)
 
 class CategorySerializer(serializers.ModelSerializer):
     children = serializers.SerializerMethodField()
-    # products_count/children_count خصائص (@property) على النموذج، و fields='__all__'
-    # لا يُسلسِل الخصائص — كانت الواجهة تعرض "0 منتج" لكل قسم دائماً. نُصرّح بها هنا.
-    products_count = serializers.IntegerField(read_only=True)
-    children_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = Category
@@ -19,9 +17,116 @@ class CategorySerializer(serializers.ModelSerializer):
 
     def get_children(self, obj):
         """Get subcategories for this category"""
-        if obj.children.exists():
-            return CategorySerializer(obj.children.all(), many=True).data
-        return []
+        # الشجرة محمّلة مسبقاً بـ load_category_tree() — بلا استعلام لكل عقدة
+        children = obj._tree_children
+        if children is None:
+            children = obj.children.all()
+        return CategorySerializer(children, many=True).data
+
+    def validate_parent(self, parent):
+        if parent is not None and self.instance is not None and f'/{self.instance.pk}/' in f'/{parent.path}':
+            raise serializers.ValidationError('لا يمكن نقل القسم تحت نفسه أو تحت أحد فروعه')
+        return parent
+
+class CategorySummarySerializer(serializers.ModelSerializer):
+    """القسم موسَّعاً داخل تمثيل المنتج (?expand=category)."""
+
+    class Meta:
+        model = Category
+        fields = ['id', 'name', 'parent', 'image_url']
+        read_only_fields = fields
+
+
+class SparseFieldsMixin:
+    """
+    ‎?fields=id,name,price‎ يقصر التمثيل على هذه الحقول، و‎?expand=category‎ يضيف الحقول
+    الموسَّعة (EXPANDABLE) أو يستبدل بها المعرّف. الحقول غير المطلوبة تُحذف من self.fields
+    قبل التسلسل، فلا تُستدعى دوالها (get_similar_products، get_all_images...) أصلاً.
+    بدون fields يبقى التمثيل الكامل كما هو. context['expand'] توسيع افتراضي يضيفه العرض
+    إلى ما يطلبه ?expand= للحقول المعروضة (تفاصيل المنتج توسّع similar_products دائماً).
+    """
+    EXPANDABLE = {
+        'category': lambda: CategorySummarySerializer(read_only=True),
+    }
+
+    @staticmethod
+    def requested(request, param):
+        params = getattr(request, 'query_params', None)
+        if params is None or param not in params:
+            return None
+        return {name.strip() for name in params[param].split(',') if name.strip()}
+
+    @classmethod
+    def wants(cls, request, name):
+        """هل سيظهر الحقل في الرد؟ للعروض حتى لا تجلب (prefetch) ما لن يُعرض."""
+        fields = cls.requested(request, 'fields')
+        return fields is None or name in fields or cls.expands(request, name)
+
+    @classmethod
+    def expands(cls, request, name):
+        """هل طُلب الحقل موسَّعاً (?expand=)؟"""
+        return name in (cls.requested(request, 'expand') or ())
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        fields = self.requested(request, 'fields')
+        expand = self.requested(request, 'expand') or set()
+        # التوسيع الافتراضي لا يُدخل حقلاً استبعده ?fields=
+        expand |= {name for name in self.context.get('expand', ()) if fields is None or name in fields}
+        for name in expand & self.EXPANDABLE.keys():
+            self.fields[name] = self.EXPANDABLE[name]()
+        if fields is not None:
+            for name in set(self.fields) - fields - expand:
+                self.fields.pop(name)
+
+
+class ImageSrcsetMixin:
+    """
+    image_srcset: ‎{رابط الصورة: {"webp": "u 160w, u 320w, ...", "avif": ...}}‎ لكل صورة لها نسخ
+    متجاوبة (products/images.py). النسخ تُقرأ باستعلام واحد لكل الكائنات التي يسلسلها
+    المسلسِل الجذر، وتُحفظ عليه — فلا استعلام لكل منتج/بنر في القوائم.
+
+    المسلسِل المستخدم يعرّف image_urls(obj): روابط صور الكائن (قد يكون بعضها فارغاً).
+    """
+
+    def get_image_srcset(self, obj):
+        root = self.root
+        known = root.__dict__.setdefault('_image_srcsets', {})
+        urls = [url for url in self.image_urls(obj) if url]
+        missing = [url for url in urls if url not in known]
+        if missing:
+            instances = root.instance if isinstance(root, serializers.ListSerializer) else None
+            wanted = set(missing)
+            if instances is not None:
+                for item in instances:
+                    if isinstance(item, type(obj)):
+                        wanted.update(url for url in self.image_urls(item) if url and url not in known)
+            found = images.srcsets_for(wanted)
+            known.update({url: found.get(url) for url in wanted})
+        return {url: known[url] for url in urls if known[url]}
+
+
+def similar_products_queryset():
+    """المنتجات المشابهة النشطة بترتيب العرض، مع القسم (يعرض ProductListSerializer اسمه)."""
+    return (Product.objects.filter(is_active=True).with_pricing()
+            .select_related('category')
+            .order_by('display_order', '-created_at'))
+
+
+def similar_product_ids_queryset():
+    """المنتجات المشابهة النشطة بترتيب العرض، معرّفاتها فقط (التمثيل غير الموسَّع)."""
+    return Product.objects.filter(is_active=True).only('id').order_by('display_order', '-created_at')
+
+
+def similar_products_prefetch(expanded=True):
+    """
+    Prefetch يُمرَّر إلى prefetch_related() عند تسلسل قائمة بـ ProductSerializer. بلا توسيع
+    يكفي المعرّف، فلا حساب أسعار ولا JOIN على القسم.
+    """
+    queryset = similar_products_queryset() if expanded else similar_product_ids_queryset()
+    return Prefetch('similar_products', queryset=queryset, to_attr='active_similar_products')
+
 
 class ProductListSerializer(serializers.ModelSerializer):
     """A simplified serializer for product lists"""
@@ -68,7 +173,79 @@ class ProductListSerializer(serializers.ModelSerializer):
         """Get is_on_sale from model property"""
         return obj.is_on_sale
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductCardSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """
+    تمثيل بطاقة المنتج لقوائم المتجر العامة: السعر والصورة الأولى وحالة المخزون فقط.
+    لا وصف ولا حقول SEO ولا منتجات مشابهة — تفاصيل المنتج الكاملة في product_detail.
+    """
+    category_name = serializers.CharField(source='category.name', read_only=True)
+    image = serializers.SerializerMethodField()
+    discount_percentage = serializers.IntegerField(read_only=True)
+    discounted_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    is_on_sale = serializers.BooleanField(read_only=True)
+    time_left = serializers.IntegerField(read_only=True)
+    is_in_stock = serializers.BooleanField(read_only=True)
+
+    # الأعمدة التي تُقرأ من قاعدة البيانات لهذه البطاقة (تُمرَّر إلى only()).
+    # display_order/created_at مطلوبة لمؤشر الترقيم، وإلا جلب كل صف عموده المؤجَّل باستعلام مستقل.
+    IMAGE_FIELDS = ('main_image', 'image_2', 'image_3', 'image_4',
+                    'image_5', 'image_6', 'image_7', 'image_8')
+    # category__parent/image_url لتمثيل ?expand=category (CategorySummarySerializer).
+    DB_FIELDS = ('id', 'name', 'category', 'category__name', 'category__parent', 'category__image_url',
+                 'price', 'discount_price', 'discount_amount', 'discount_start', 'discount_end',
+                 'stock_quantity', 'display_order', 'created_at', 'rating_avg', 'rating_count') + IMAGE_FIELDS
+
+    class Meta:
+        model = Product
+        fields = ['id', 'name', 'category', 'category_name',
+                  'price', 'discount_price', 'discounted_price', 'discount_percentage',
+                  'is_on_sale', 'time_left', 'discount_end',
+                  'image', 'stock_quantity', 'is_in_stock', 'rating_avg', 'rating_count']
+        read_only_fields = fields
+
+    @classmethod
+    def optimize_queryset(cls, queryset):
+        """
+        select_related للقسم + only() للأعمدة أعلاه + أسعار التخفيض من with_pricing():
+        استعلام واحد للصفحة كلها، وبلا timezone.now() لكل بطاقة.
+        """
+        return queryset.select_related('category').only(*cls.DB_FIELDS).with_pricing()
+
+    def get_image(self, obj):
+        """أول صورة متاحة — هي ما تعرضه بطاقة المنتج"""
+        for field in self.IMAGE_FIELDS:
+            value = getattr(obj, field)
+            if value:
+                return value
+        return None
+
+
+class ProductSyncSerializer(ProductCardSerializer):
+    """البطاقة كما تخزّنها تطبيقات الجوال من موجز التغييرات (products/sync.py)، مع ما يلزم لمزامنتها."""
+    DB_FIELDS = ProductCardSerializer.DB_FIELDS + ('is_active', 'updated_at')
+
+    class Meta(ProductCardSerializer.Meta):
+        # discount_start حتى يحسب العميل بدء التخفيض بنفسه؛ لا يغيّر updated_at عند حلوله
+        fields = ProductCardSerializer.Meta.fields + ['discount_start', 'is_active', 'updated_at']
+        read_only_fields = fields
+
+
+class CategorySyncSerializer(serializers.ModelSerializer):
+    """القسم مسطّحاً (بلا children) لموجز التغييرات؛ الشجرة تُركَّب عند العميل من parent."""
+
+    class Meta:
+        model = Category
+        # العدّادات تتغير بـ F() دون updated_at، فلا تصلح للمزامنة التزايدية
+        exclude = Category.COUNTER_FIELDS
+
+
+class ProductSerializer(SparseFieldsMixin, ImageSrcsetMixin, serializers.ModelSerializer):
+    # similar_products معرّفات افتراضياً؛ ‎?expand=similar_products‎ يضع بطاقاتها مكانها
+    EXPANDABLE = {
+        **SparseFieldsMixin.EXPANDABLE,
+        'similar_products': lambda: serializers.SerializerMethodField(method_name='get_similar_product_cards'),
+    }
+
     category_name = serializers.SerializerMethodField()
     
     def get_category_name(self, obj):
@@ -78,6 +255,7 @@ class ProductSerializer(serializers.ModelSerializer):
     main_image_url = serializers.SerializerMethodField()
     image = serializers.SerializerMethodField()
     all_images = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
     # إضافة حقول الخصم المحسوبة
     discount_percentage = serializers.SerializerMethodField()
     discounted_price = serializers.SerializerMethodField()
@@ -85,6 +263,9 @@ class ProductSerializer(serializers.ModelSerializer):
     time_left = serializers.IntegerField(read_only=True)
     stock = serializers.IntegerField(source='stock_quantity', read_only=True)
     similar_products = serializers.SerializerMethodField()
+    views_count = serializers.SerializerMethodField()
+    # تجميعات التقييم مخزَّنة في المنتج (products/ratings.py)
+    rating_histogram = serializers.DictField(child=serializers.IntegerField(), read_only=True)
 
     class Meta:
         model = Product
@@ -94,13 +275,19 @@ class ProductSerializer(serializers.ModelSerializer):
             'discount_percentage', 'discounted_price', 'is_on_sale', 'time_left',
             'stock_quantity', 'stock', 'low_stock_threshold',
             'main_image', 'image_2', 'image_3', 'image_4', 'image_5', 'image_6', 'image_7', 'image_8',
-            'main_image_url', 'image', 'all_images', 'similar_products',
+            'main_image_url', 'image', 'all_images', 'image_srcset', 'similar_products', 'views_count',
+            'rating_avg', 'rating_count', 'rating_histogram',
             'brand', 'model', 'color', 'size', 'weight',
             'slug', 'meta_description', 'tags',
             'is_active', 'is_featured', 'show_on_homepage', 'display_order',
             'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at', 'main_image_url', 'image', 'all_images', 'time_left']
+        read_only_fields = ['id', 'created_at', 'updated_at', 'main_image_url', 'image', 'all_images',
+                            'image_srcset', 'time_left', 'views_count',
+                            'rating_avg', 'rating_count', 'rating_histogram']
+
+    def image_urls(self, obj):
+        return [getattr(obj, field) for field in ProductCardSerializer.IMAGE_FIELDS]
 
     def get_main_image_url(self, obj):
         """إرجاع الصورة الرئيسية"""
@@ -137,9 +324,25 @@ class ProductSerializer(serializers.ModelSerializer):
         """Get is_on_sale from model property"""
         return obj.is_on_sale
 
+    def get_views_count(self, obj):
+        """إجمالي المشاهدات حتى آخر تجميع (ProductViewStats) — العروض تجلبه بـ select_related('view_stats')"""
+        stats = getattr(obj, 'view_stats', None)
+        return stats.total_views if stats is not None else 0
+
     def get_similar_products(self, obj):
+        """معرّفات المنتجات المشابهة النشطة بترتيب العرض"""
+        # في القوائم تُجلب مسبقاً عبر similar_products_prefetch(expanded=False) — بدونها استعلام لكل منتج
+        similar = getattr(obj, 'active_similar_products', None)
+        if similar is None:
+            return list(similar_product_ids_queryset().filter(similar_to=obj).values_list('id', flat=True))
+        return [product.pk for product in similar]
+
+    def get_similar_product_cards(self, obj):
         """Products chosen by admin for the similar section"""
-        qs = obj.similar_products.filter(is_active=True).order_by('display_order', '-created_at')
+        # في القوائم تُجلب مسبقاً عبر similar_products_prefetch() — بدونها استعلام لكل منتج
+        qs = getattr(obj, 'active_similar_products', None)
+        if qs is None:
+            qs = similar_products_queryset().filter(similar_to=obj)
         return ProductListSerializer(qs, many=True, context=self.context).data
     
     def to_representation(self, instance):
@@ -178,16 +381,21 @@ class ProductSerializer(serializers.ModelSerializer):
         
         return super().update(instance, validated_data)
 
-class BannerSerializer(serializers.ModelSerializer):
+class BannerSerializer(ImageSrcsetMixin, serializers.ModelSerializer):
     image = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
     image_url = serializers.URLField(allow_blank=True, required=False)  # Prefer external URL
     link = serializers.SerializerMethodField()
     product_id = serializers.SerializerMethodField()
 
     class Meta:
         model = Banner
-        fields = ['id', 'title', 'description', 'image', 'image_url', 'placement', 'product', 'link_url',
-                  'is_active', 'display_order', 'link', 'product_id', 'created_at', 'updated_at']
+        fields = ['id', 'title', 'description', 'image', 'image_url', 'image_srcset', 'placement', 'product',
+                  'link_url', 'is_active', 'display_order', 'link', 'product_id', 'created_at', 'updated_at']
+
+    def image_urls(self, obj):
+        # النسخ تُولَّد لما رُفع عبر upload_image_to_voro فقط، وهو ما يُحفظ في image_url
+        return [obj.image_url]
 
     def get_image(self, obj):
         # Prefer external URL (ImgBB) over local file
@@ -210,9 +418,5 @@ class BannerSerializer(serializers.ModelSerializer):
         return link
 
     def get_product_id(self, obj):
-        # Return the product ID if exists
-        if obj.product:
-            print(f"Banner {obj.title} is linked to product ID: {obj.product.id}")
-            return obj.product.id
-        print(f"Banner {obj.title} is not linked to any product")
-        return None
\ No newline at end of file
+        # product_id عمود على البنر نفسه — لا حاجة لجلب المنتج
+        return obj.product_id
\ No newline at end of file
@@ -0,0 +1,141 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_save, pre_delete
+from django.dispatch import receiver
+
+from .cache import bump_version, PRODUCTS, CATEGORIES, BANNERS
+from .models import Product, Category, Banner, CatalogDeletion, ProductReview
+from .search import update_search_document
+from . import blobs, counters, ratings, suggest
+
+# كل نموذج يُبطل نطاقه في ذاكرة الكتالوج المؤقّتة (انظر products/cache.py)
+_NAMESPACE_BY_MODEL = {
+    Product: PRODUCTS,
+    Category: CATEGORIES,
+    Banner: BANNERS,
+}
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Banner)
+@receiver(post_delete, sender=Banner)
+def invalidate_catalog_cache(sender, **kwargs):
+    """أي تعديل على منتج أو قسم أو بنر يرفع إصدار نطاقه، فتسقط الردود المخزَّنة التي تعتمد عليه."""
+    # بعد نجاح المعاملة لا قبلها: رفع قبل الالتزام يترك طلباً متزامناً يبني الرد من البيانات
+    # القديمة ويخزّنه تحت الإصدار الجديد، فيبقى قديماً حتى المهلة
+    namespace = _NAMESPACE_BY_MODEL[sender]
+    transaction.on_commit(lambda: bump_version(namespace))
+
+
+_DELETION_KIND_BY_MODEL = {
+    Product: CatalogDeletion.KIND_PRODUCT,
+    Category: CatalogDeletion.KIND_CATEGORY,
+    Banner: CatalogDeletion.KIND_BANNER,
+}
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Banner)
+def record_catalog_deletion(sender, instance, **kwargs):
+    """سجل الحذف لموجز التغييرات (products/sync.py) — يشمل ما حُذف بالتتابع (CASCADE)."""
+    CatalogDeletion.objects.create(kind=_DELETION_KIND_BY_MODEL[sender], object_id=instance.pk)
+
+
+# الحقول التي يُبنى منها مستند البحث؛ حفظ جزئي لا يلمسها (مثل reduce_stock) لا يعيد بناءه
+_SEARCH_FIELDS = {'name', 'brand', 'tags', 'description', 'is_active'}
+_SUGGEST_FIELDS = {'name', 'brand', 'is_active', 'display_order', 'main_image', 'image_2', 'image_3',
+                   'image_4', 'image_5', 'image_6', 'image_7', 'image_8'}
+
+
+@receiver(post_save, sender=Product)
+def refresh_search_document(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not _SEARCH_FIELDS.intersection(update_fields):
+        return
+    update_search_document(instance)
+
+
+# فهرس الاقتراحات (products/suggest.py) يُحدَّث بعد نجاح المعاملة فقط، حتى لا يحمل تعديلاً تراجعت عنه
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def refresh_product_suggestions(sender, instance, update_fields=None, **kwargs):
+    # حفظ جزئي لا يلمس حقول الفهرس (reduce_stock، تقييم، صورة مرفوعة) لا يرفع إصدار suggest
+    if update_fields is not None and not _SUGGEST_FIELDS.intersection(update_fields):
+        return
+    # بعد الحذف يُصفّر Django ‏instance.pk قبل تنفيذ on_commit، فنمرّر المعرّف الآن
+    pk, deleted = instance.pk, 'created' not in kwargs
+    transaction.on_commit(lambda: suggest.product_changed(pk, instance, deleted=deleted))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def refresh_category_suggestions(sender, instance, **kwargs):
+    pk, deleted = instance.pk, 'created' not in kwargs
+    transaction.on_commit(lambda: suggest.category_changed(pk, instance, deleted=deleted))
+
+
+# عدّادات الأقسام المخزَّنة (products/counters.py)
+@receiver(pre_save, sender=Product)
+@receiver(pre_delete, sender=Product)
+def remember_product_counted_state(sender, instance, **kwargs):
+    counters.complete_state(instance, counters.PRODUCT_FIELDS)
+
+
+@receiver(pre_save, sender=Category)
+@receiver(pre_delete, sender=Category)
+def remember_category_counted_state(sender, instance, **kwargs):
+    counters.complete_state(instance, counters.CATEGORY_FIELDS)
+
+
+@receiver(post_save, sender=Product)
+def count_saved_product(sender, instance, update_fields=None, **kwargs):
+    counters.product_saved(instance, update_fields)
+
+
+@receiver(post_delete, sender=Product)
+def count_deleted_product(sender, instance, **kwargs):
+    counters.product_deleted(instance)
+
+
+@receiver(post_save, sender=Category)
+def count_saved_category(sender, instance, update_fields=None, **kwargs):
+    counters.category_saved(instance, update_fields)
+
+
+@receiver(post_delete, sender=Category)
+def count_deleted_category(sender, instance, **kwargs):
+    counters.category_deleted(instance)
+
+
+# مراجع مخزن الصور (products/blobs.py) — ما لا مرجع له يُحذف في gc_image_blobs
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Banner)
+def track_image_references(sender, instance, created=False, update_fields=None, **kwargs):
+    blobs.sync_references(instance, created=created, update_fields=update_fields)
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Banner)
+def drop_image_references(sender, instance, **kwargs):
+    blobs.drop_references(instance)
+
+
+# تجميعات التقييم المخزَّنة في المنتج (products/ratings.py)
+@receiver(pre_save, sender=ProductReview)
+@receiver(pre_delete, sender=ProductReview)
+def remember_review_counted_state(sender, instance, **kwargs):
+    counters.complete_state(instance, ratings.REVIEW_FIELDS)
+
+
+@receiver(post_save, sender=ProductReview)
+def count_saved_review(sender, instance, update_fields=None, **kwargs):
+    ratings.review_saved(instance, update_fields)
+
+
+@receiver(post_delete, sender=ProductReview)
+def count_deleted_review(sender, instance, **kwargs):
+    ratings.review_deleted(instance)
@@ -0,0 +1,144 @@
+"""
+لقطات ثابتة للكتالوج تُخدَم من التخزين (R2/CDN) مباشرة بدل Django.
+
+الأمر build_catalog_snapshot يكتب المنتجات النشطة وشجرة الأقسام والبنرات النشطة كملفات
+JSON باسم يحوي بصمة المحتوى (catalog/products.<sha>.json)، ومعها نسختان مضغوطتان مسبقاً
+(.gz دائماً، و .br إن كانت مكتبة brotli مثبّتة). الاسم يتغير بتغير المحتوى، فتُرفع
+الملفات بـ Cache-Control: immutable ويخزّنها الـCDN والمتصفح إلى الأبد.
+
+ملف catalog/manifest.json (ونقطة ‎/api/products/snapshot/‎) يشير إلى اللقطة الحالية؛
+هو وحده قصير الصلاحية. العميل يقرأ البيان الصغير ثم يجلب الملفات من الـCDN.
+
+اللقطة تُبنى من جديد عندما تتغير "حالة الكتالوج" في قاعدة البيانات: أحدث updated_at لكل من
+المنتجات والأقسام والبنرات، وآخر معرّف في سجل الحذف لكل نوع، وآخر حد تخفيض مرّ (sale_schedule).
+لا تعتمد على إصدارات الذاكرة المؤقّتة، فتعمل مع locmem أيضاً — انظر ‎build_catalog_snapshot --watch‎.
+"""
+import gzip
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+from django.db.models import Max
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import brotli
+except ImportError:  # اختيارية: بدونها تُكتب نسخة gzip فقط
+    brotli = None
+
+PREFIX = 'catalog'
+MANIFEST_NAME = f'{PREFIX}/manifest.json'
+IMMUTABLE = 'public, max-age=31536000, immutable'
+MANIFEST_CACHE_CONTROL = 'public, max-age=60'
+_MANIFEST_KEY = 'catalog:snapshot:manifest'
+# البيان في الذاكرة المؤقّتة يُعاد تحميله من التخزين بعد هذه المدة (مثل max-age ملفه)، فعامل
+# بذاكرة خاصة (locmem) لا يبقى على بيان قديم بعد أن كتبت عملية البناء بياناً جديداً
+MANIFEST_CACHE_TIMEOUT = 60
+
+
+def snapshot_storage(cache_control=IMMUTABLE):
+    """
+    التخزين الافتراضي (R2 أو نظام الملفات محلياً) بنسخة مستقلة تضيف Cache-Control لكل
+    ملف يُرفع — على S3/R2 فقط؛ نظام الملفات يترك الترويسات للخادم الذي يخدمه.
+    """
+    backend = dict(settings.STORAGES['default'])
+    options = dict(backend.get('OPTIONS', {}))
+    if 's3' in backend['BACKEND'].lower():
+        options['object_parameters'] = {**options.get('object_parameters', {}), 'CacheControl': cache_control}
+    backend['OPTIONS'] = options
+    return storages.create_storage(backend)
+
+
+def catalog_state(now=None):
+    """بصمة ما تُبنى منه اللقطة، من قاعدة البيانات (استعلام لكل نموذج + سجل الحذف + التخفيضات)."""
+    from .models import Banner, CatalogDeletion, Category, Product
+    from .sale_schedule import boundaries
+
+    def stamp(value):
+        return value.isoformat() if value is not None else None
+
+    state = {
+        name: stamp(model.objects.aggregate(last=Max('updated_at'))['last'])
+        for name, model in (('products', Product), ('categories', Category), ('banners', Banner))
+    }
+    deletions = dict(CatalogDeletion.objects.order_by().values_list('kind').annotate(last=Max('id')))
+    state['deleted'] = {kind: deletions.get(kind) for kind, _ in CatalogDeletion.KIND_CHOICES}
+    # حالة التخفيض تتغير بالوقت وحده: آخر حد مرّ يغيّر أسعار البطاقات بلا أي حفظ
+    state['sale_boundary'] = stamp(boundaries(now or timezone.now())[0])
+    return state
+
+
+def build_payloads():
+    """{اسم: بايتات JSON} لكل ملف في اللقطة."""
+    from .models import Banner, Product
+    from .serializers import BannerSerializer, CategorySerializer, ProductCardSerializer
+    from .tree import load_category_tree
+
+    products = ProductCardSerializer.optimize_queryset(Product.objects.filter(is_active=True)).order_by(
+        'display_order', '-created_at', 'id'
+    )
+    banners = Banner.objects.filter(is_active=True).select_related('product')
+    data = {
+        'products': ProductCardSerializer(products, many=True).data,
+        'categories': CategorySerializer(load_category_tree(), many=True).data,
+        'banners': BannerSerializer(banners, many=True).data,
+    }
+    return {name: JSONRenderer().render(value) for name, value in data.items()}
+
+
+def build_snapshot():
+    """
+    يكتب ملفات اللقطة (ما لم تكن موجودة بنفس البصمة) ثم البيان، ويُرجع البيان.
+    الحالة تُقرأ قبل البناء: تعديل أثناءه يجعل اللقطة "قديمة" فتُبنى مجدداً.
+    """
+    state = catalog_state()
+    storage = snapshot_storage()
+    files = {}
+    for name, body in build_payloads().items():
+        digest = hashlib.sha256(body).hexdigest()[:16]
+        path = f'{PREFIX}/{name}.{digest}.json'
+        variants = {'': body, '.gz': gzip.compress(body, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variants['.br'] = brotli.compress(body)
+        entry = {'sha256': digest, 'size': len(body)}
+        for suffix, content in variants.items():
+            if not storage.exists(path + suffix):
+                storage.save(path + suffix, ContentFile(content))
+            entry[{'': 'url', '.gz': 'gzip_url', '.br': 'br_url'}[suffix]] = storage.url(path + suffix)
+        files[name] = entry
+
+    manifest = {
+        'version': hashlib.sha256(''.join(files[name]['sha256'] for name in sorted(files)).encode()).hexdigest()[:16],
+        'generated_at': timezone.now().isoformat(),
+        'catalog_state': state,
+        'files': files,
+    }
+    manifest_storage = snapshot_storage(MANIFEST_CACHE_CONTROL)
+    if manifest_storage.exists(MANIFEST_NAME):
+        manifest_storage.delete(MANIFEST_NAME)
+    manifest_storage.save(MANIFEST_NAME, ContentFile(json.dumps(manifest).encode('utf-8')))
+    cache.set(_MANIFEST_KEY, manifest, timeout=MANIFEST_CACHE_TIMEOUT)
+    return manifest
+
+
+def current_manifest():
+    """البيان الأخير: من الذاكرة المؤقّتة، وإلا من ملفه في التخزين، وإلا None."""
+    manifest = cache.get(_MANIFEST_KEY)
+    if manifest is None:
+        storage = snapshot_storage(MANIFEST_CACHE_CONTROL)
+        if not storage.exists(MANIFEST_NAME):
+            return None
+        with storage.open(MANIFEST_NAME) as handle:
+            manifest = json.loads(handle.read())
+        cache.set(_MANIFEST_KEY, manifest, timeout=MANIFEST_CACHE_TIMEOUT)
+    return manifest
+
+
+def is_stale(manifest=None):
+    """هل تغيّر الكتالوج منذ بناء اللقطة؟ (مقارنة حالته في قاعدة البيانات بما سُجّل في البيان)"""
+    manifest = manifest if manifest is not None else current_manifest()
+    return manifest is None or manifest.get('catalog_state') != catalog_state()
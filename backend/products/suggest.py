@@ -0,0 +1,198 @@
+"""
+اقتراحات البحث أثناء الكتابة من فهرس بادئات في ذاكرة العملية.
+
+الفهرس مصفوفة مرتبة من (كلمة مُطبَّعة، نوع، معرّف): كل كلمة في اسم المنتج وعلامته
+التجارية، وكل كلمة في اسم القسم. البحث عن بادئة = bisect إلى أول مفتاح >= البادئة ثم
+المرور على المفاتيح المتتالية التي تبدأ بها — لا قاعدة بيانات ولا مسلسِل.
+
+يُبنى كاملاً عند أول طلب (استعلامان)، ثم تُحدّثه إشارات الحفظ/الحذف (signals.py)
+عنصراً عنصراً. لكل عملية نسختها؛ لتلتقط العملية تعديلات تمّت في عملية أخرى يحفظ
+الفهرس إصدار نطاق suggest من ذاكرة الكتالوج (cache.py) الذي بُني عليه، ويُعاد بناؤه إن
+تغيّر (مع ذاكرة مشتركة كـ Redis). النطاق خاص بالفهرس ولا يُرفع إلا حين يتغير حقل يُبنى منه،
+فالتقييمات والمخزون والصور المرفوعة لا تعيد بناءه كما كانت تفعل مع إصدار products.
+"""
+import bisect
+import threading
+
+from .cache import bump_version, get_version, SUGGEST
+from .search import tokenize
+from .serializers import ProductCardSerializer
+
+PRODUCT = 'product'
+CATEGORY = 'category'
+DEFAULT_LIMIT = 8
+MAX_LIMIT = 20
+# أقصى عدد مفاتيح يُفحص لبادئة واحدة: بادئة من حرف واحد قد تطابق نصف الكتالوج
+MAX_SCAN = 500
+
+
+class SuggestionIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys = []      # [(token, kind, id)] مرتبة
+        self._items = {}     # (kind, id) -> suggestion dict
+        self.version = None
+
+    # ---- البناء والتحديث -------------------------------------------------
+
+    def build(self, products, categories, version=None):
+        keys, items = [], {}
+        for entry in [_product_entry(p) for p in products] + [_category_entry(c) for c in categories]:
+            ref = (entry['type'], entry['id'])
+            items[ref] = entry
+            keys.extend((token, *ref) for token in entry['tokens'])
+        keys.sort()
+        with self._lock:
+            self._keys, self._items, self.version = keys, items, version
+
+    def update_product(self, product):
+        return self._update(_product_entry(product) if product.is_active else None, (PRODUCT, product.pk))
+
+    def update_category(self, category):
+        return self._update(_category_entry(category) if category.is_active else None, (CATEGORY, category.pk))
+
+    def remove(self, kind, pk):
+        return self._update(None, (kind, pk))
+
+    def _update(self, entry, ref):
+        """يستبدل عنصراً في الفهرس. يُرجع False إن كان مطابقاً لما فيه أصلاً."""
+        with self._lock:
+            if self._items.get(ref) == entry:
+                return False
+            old = self._items.pop(ref, None)
+            if old is not None:
+                for token in old['tokens']:
+                    index = bisect.bisect_left(self._keys, (token, *ref))
+                    if index < len(self._keys) and self._keys[index] == (token, *ref):
+                        del self._keys[index]
+            if entry is not None:
+                self._items[ref] = entry
+                for token in entry['tokens']:
+                    bisect.insort(self._keys, (token, *ref))
+            return True
+
+    # ---- الاستعلام -------------------------------------------------------
+
+    def suggest(self, query, limit):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        # الكلمة الأخيرة بادئة (ما زال المستخدم يكتبها)، وما قبلها يجب أن يطابق بادئة كلمة أيضاً
+        prefix, others = tokens[-1], tokens[:-1]
+        keys, items = self._keys, self._items
+
+        matches = {}
+        start = bisect.bisect_left(keys, (prefix,))
+        for token, kind, pk in keys[start:start + MAX_SCAN]:
+            if not token.startswith(prefix):
+                break
+            entry = items.get((kind, pk))
+            if entry is None or (kind, pk) in matches:
+                continue
+            if all(any(t.startswith(other) for t in entry['tokens']) for other in others):
+                matches[(kind, pk)] = entry
+
+        # الأقسام أولاً (قليلة وتقود إلى قائمة)، ثم ما بدأ اسمه بالاستعلام، ثم ترتيب العرض
+        ranked = sorted(
+            matches.values(),
+            key=lambda e: (e['type'] != CATEGORY, not e['tokens'][0].startswith(tokens[0]),
+                           e['display_order'], len(e['name'])),
+        )
+        return [
+            {'type': e['type'], 'id': e['id'], 'name': e['name'], 'thumbnail': e['thumbnail']}
+            for e in ranked[:limit]
+        ]
+
+    def __len__(self):
+        return len(self._items)
+
+
+def _product_entry(product):
+    thumbnail = next(
+        (getattr(product, field) for field in ProductCardSerializer.IMAGE_FIELDS if getattr(product, field)),
+        None,
+    )
+    return {
+        'type': PRODUCT,
+        'id': product.pk,
+        'name': product.name,
+        'thumbnail': thumbnail,
+        'display_order': product.display_order,
+        # كلمات الاسم أولاً: ترتيب النتائج يعتمد على الكلمة الأولى
+        'tokens': _unique(tokenize(product.name) + tokenize(product.brand)),
+    }
+
+
+def _category_entry(category):
+    thumbnail = category.image_url or (category.image.url if category.image else None)
+    return {
+        'type': CATEGORY,
+        'id': category.pk,
+        'name': category.name,
+        'thumbnail': thumbnail,
+        'display_order': category.display_order,
+        'tokens': _unique(tokenize(category.name)),
+    }
+
+
+def _unique(tokens):
+    return list(dict.fromkeys(tokens))
+
+
+_index = SuggestionIndex()
+_build_lock = threading.Lock()
+
+
+def get_index():
+    """الفهرس جاهزاً وعلى آخر إصدار من الكتالوج؛ يُبنى من قاعدة البيانات عند الحاجة فقط."""
+    version = get_version(SUGGEST)
+    if _index.version != version:
+        with _build_lock:
+            if _index.version != version:
+                rebuild_index(version)
+    return _index
+
+
+def rebuild_index(version=None):
+    from .models import Product, Category
+
+    products = Product.objects.filter(is_active=True).only(
+        'id', 'name', 'brand', 'display_order', *ProductCardSerializer.IMAGE_FIELDS,
+    )
+    categories = Category.objects.filter(is_active=True).only('id', 'name', 'image', 'image_url', 'display_order')
+    _index.build(products, categories, version or get_version(SUGGEST))
+
+
+def product_changed(pk, product, deleted=False):
+    if deleted:
+        _apply(lambda: _index.remove(PRODUCT, pk))
+    else:
+        _apply(lambda: _index.update_product(product))
+
+
+def category_changed(pk, category, deleted=False):
+    if deleted:
+        _apply(lambda: _index.remove(CATEGORY, pk))
+    else:
+        _apply(lambda: _index.update_category(category))
+
+
+def _apply(update):
+    """
+    تحديث تدريجي من إشارة في هذه العملية بعد نجاح معاملتها: يُطبَّق التعديل ثم يُرفع إصدار
+    suggest. إن صار الإصدار إصدارَ الفهرس +1 فهذا التعديل وحده ما فات الفهرس وقد طُبِّق للتو؛
+    أي فرق آخر يعني تعديلات من عملية أخرى فيُعاد البناء عند الطلب التالي. حفظ كامل لم يغيّر
+    شيئاً في فهرس محدَّث (تعديل السعر مثلاً) لا يرفع الإصدار.
+    """
+    previous = _index.version
+    if previous is not None:
+        current = previous == get_version(SUGGEST)
+        if not update() and current:
+            return
+    bump_version(SUGGEST)
+    if previous is not None and get_version(SUGGEST) == previous + 1:
+        _index.version = previous + 1
+
+
+def reset_index():
+    _index.build([], [], None)
@@ -0,0 +1,158 @@
+"""
+موجز تغييرات الكتالوج لتطبيقات الجوال: "ما الذي تغيّر منذ آخر مزامنة؟"
+
+لكل من المنتجات والأقسام والبنرات موضع keyset مستقل (updated_at, id) على فهرس
+*_sync_idx، وللحذف موضع (deleted_at, id) في سجل CatalogDeletion الذي تكتبه إشارة
+post_delete. المؤشر الذي يعيده الرد يحمل المواضع الأربعة، فالمزامنة التالية تبدأ من
+حيث انتهت: بعد يوم هادئ تنقل بضعة كيلوبايتات بدل الكتالوج كله.
+
+بلا مؤشر ولا since يبدأ الموجز من أول الكتالوج (مزامنة كاملة) بلا سجل حذف قديم.
+
+الموجز عام (AllowAny)، فلا يحمل إلا الصفوف النشطة: ما صار غير نشط يظهر معرّفه في deleted
+(تعطيله يحدّث updated_at فيمرّ عليه موضع نوعه). سجل الحذف يُقلَّم بعد
+CATALOG_DELETION_RETENTION_DAYS يوماً (prune_catalog_deletions)، فالمؤشر أو since الأقدم من
+ذلك يُرفض بـ 410 (resync_required) وعلى العميل مزامنة كاملة من جديد.
+
+حدود معروفة: QuerySet.update() لا يحدّث updated_at (auto_now) فلا يظهر في الموجز؛
+والعدّادات المخزَّنة ليست فيه أصلاً (انظر CategorySyncSerializer).
+"""
+import base64
+import json
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import APIException, ValidationError
+
+from .models import Banner, CatalogDeletion, Category, Product
+from .serializers import BannerSerializer, CategorySyncSerializer, ProductSyncSerializer
+
+DEFAULT_LIMIT = 200
+MAX_LIMIT = 1000
+# المعاملات لا تُثبَّت بترتيب updated_at: صف كُتب قبل لحظات قد يظهر بعد صف أحدث منه.
+# الموجز لا يتجاوز "الآن ناقص هذه المهلة"، فلا يسبق المؤشر صفاً لم يُثبَّت بعد.
+SETTLE_DELAY = timedelta(seconds=2)
+INVALID_CURSOR = 'مؤشر المزامنة غير صالح'
+MAX_ID = 2 ** 63 - 1
+
+
+class ResyncRequired(APIException):
+    status_code = 410
+    default_detail = 'المؤشر أقدم من مدة الاحتفاظ بسجل الحذف؛ أعد المزامنة الكاملة (بلا cursor ولا since)'
+    default_code = 'resync_required'
+
+
+STREAMS = {
+    'products': (lambda: ProductSyncSerializer.optimize_queryset(Product.objects.all()), ProductSyncSerializer),
+    'categories': (lambda: Category.objects.all(), CategorySyncSerializer),
+    'banners': (lambda: Banner.objects.select_related('product'), BannerSerializer),
+}
+DELETION_STREAMS = {
+    CatalogDeletion.KIND_PRODUCT: 'products',
+    CatalogDeletion.KIND_CATEGORY: 'categories',
+    CatalogDeletion.KIND_BANNER: 'banners',
+}
+
+
+def catalog_changes(request, cursor=None, since=None, limit=DEFAULT_LIMIT):
+    """
+    صفحة واحدة من التغييرات: {products, categories, banners, deleted, cursor, has_more}.
+    has_more=true يعني أن على العميل الطلب فوراً بالمؤشر الجديد حتى ينتهي.
+    """
+    now = timezone.now()
+    settled = now - SETTLE_DELAY
+    positions = _decode(cursor) if cursor else _initial_positions(since, settled)
+    deleted_from = positions['deleted'][0]
+    if deleted_from is None or parse_datetime(deleted_from) < deletions_kept_since(now):
+        raise ResyncRequired()
+
+    page, has_more = {'deleted': {name: [] for name in STREAMS}}, False
+    for name, (queryset, serializer_class) in STREAMS.items():
+        rows, more = _after(queryset().filter(updated_at__lte=settled), 'updated_at', positions[name], limit)
+        if rows:
+            positions[name] = [rows[-1].updated_at.isoformat(), rows[-1].pk]
+        # ما عُطِّل منذ آخر مزامنة يُحذف من العميل ولا تُرسل بياناته
+        page['deleted'][name] = [row.pk for row in rows if not row.is_active]
+        active = [row for row in rows if row.is_active]
+        page[name] = serializer_class(active, many=True, context={'request': request}).data
+        has_more = has_more or more
+
+    deletions = CatalogDeletion.objects.filter(deleted_at__lte=settled)
+    rows, more = _after(deletions, 'deleted_at', positions['deleted'], limit)
+    if rows:
+        positions['deleted'] = [rows[-1].deleted_at.isoformat(), rows[-1].pk]
+    if not more and (not rows or rows[-1].deleted_at < settled):
+        # لا حذف بعدُ: يتقدّم الموضع حتى لا يشيخ مؤشر عميل يزامن بانتظام فيُرفض بعد مدة الاحتفاظ
+        positions['deleted'] = [settled.isoformat(), 0]
+    for row in rows:
+        page['deleted'][DELETION_STREAMS[row.kind]].append(row.object_id)
+
+    page['cursor'] = _encode(positions)
+    page['has_more'] = has_more or more
+    return page
+
+
+def _after(queryset, column, position, limit):
+    """أول limit صفاً بعد الموضع (stamp, id) بترتيب (column, id)، وهل بقي غيرها."""
+    stamp, pk = position
+    if stamp is not None:
+        stamp = parse_datetime(stamp)
+        queryset = queryset.filter(Q(**{f'{column}__gt': stamp}) | Q(**{column: stamp, 'id__gt': pk}))
+    rows = list(queryset.order_by(column, 'id')[:limit + 1])
+    return rows[:limit], len(rows) > limit
+
+
+def deletions_kept_since(now=None):
+    """أقدم لحظة يضمن سجل الحذف اكتماله بعدها (ما قبلها قد يكون قُلِّم)."""
+    return (now or timezone.now()) - timedelta(days=settings.CATALOG_DELETION_RETENTION_DAYS)
+
+
+def prune_deletions(now=None):
+    """يحذف من سجل الحذف ما تجاوز مدة الاحتفاظ. يُرجع عدد الصفوف المحذوفة."""
+    return CatalogDeletion.objects.filter(deleted_at__lt=deletions_kept_since(now)).delete()[0]
+
+
+def _initial_positions(since, settled):
+    if since is None:
+        # مزامنة كاملة: كل الصفوف الحالية، وسجل الحذف من الآن فصاعداً فقط
+        start, deleted = None, settled.isoformat()
+    else:
+        start = deleted = since.isoformat()
+    positions = {name: [start, 0] for name in STREAMS}
+    positions['deleted'] = [deleted, 0]
+    return positions
+
+
+def parse_since(raw):
+    since = parse_datetime(raw)
+    if since is None:
+        raise ValidationError({'since': 'تاريخ غير صالح (ISO 8601)'})
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since, dt_timezone.utc)
+    return since
+
+
+def _encode(positions):
+    raw = json.dumps(positions, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def _decode(encoded):
+    """المواضع من مؤشر العميل؛ أي مؤشر لم يكتبه _encode (ومنه تاريخ بلا منطقة زمنية أو معرّف
+    خارج مدى BigAutoField، وكلاهما كان يصل إلى الاستعلام فيُرجع 500) يُرفض بـ 400."""
+    try:
+        positions = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+        for name in (*STREAMS, 'deleted'):
+            stamp, pk = positions[name]
+            if stamp is not None:
+                parsed = parse_datetime(stamp)
+                if parsed is None or timezone.is_naive(parsed):
+                    raise ValueError(stamp)
+            if isinstance(pk, (bool, float)) or not 0 <= int(pk) <= MAX_ID:
+                raise ValueError(pk)
+            positions[name] = [stamp, int(pk)]
+        return positions
+    except (TypeError, ValueError, KeyError, UnicodeError):
+        raise ValidationError({'cursor': INVALID_CURSOR})
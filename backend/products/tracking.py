@@ -0,0 +1,231 @@
+"""
+تتبّع مشاهدات المنتجات بلا INSERT لكل زيارة.
+
+كل عملية (عامل gunicorn) تجمع المشاهدات في ذاكرتها، وتكتبها دفعة واحدة بـ bulk_create حين
+يبلغ المخزن PRODUCT_VIEW_BUFFER_SIZE حدثاً أو يمر PRODUCT_VIEW_FLUSH_SECONDS منذ آخر كتابة
+(وعند إغلاق العملية). انهيار العامل يُسقط ما في مخزنه — مقبول لإحصاءات لا لحسابات.
+
+لا مؤقّت في الخلفية: المهلة تُفحص عند تسجيل مشاهدة، فعامل هادئ يُبقي ما في مخزنه حتى المشاهدة
+التالية التي تصله بعد انقضائها أو حتى إغلاقه. مع حركة قليلة قد تتأخر المشاهدات عن rollup
+أكثر من PRODUCT_VIEW_FLUSH_SECONDS، ولا تضيع إلا بانهيار العامل.
+
+الأمر rollup_product_views (دوري) يجمع الصفوف الخام غير المجمَّعة في ProductViewDaily
+(منتج × يوم) ويضيفها إلى ProductViewStats (سطر لكل منتج)، ثم يحذف الخام الأقدم من مهلة
+الاحتفاظ. عدد مشاهدات منتج قراءة سطر واحد، و"الأكثر مشاهدة" قراءة فهرس recent_views —
+لا COUNT على جدول المشاهدات أبداً.
+
+    python manage.py rollup_product_views [--watch]
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .cache import bump_version, VIEWS
+
+logger = logging.getLogger(__name__)
+
+RECENT_DAYS = 7
+RETENTION_DAYS = 30
+ROLLUP_BATCH_SIZE = 10000
+PRUNE_BATCH_SIZE = 5000
+USER_AGENT_MAX_LENGTH = 300
+
+_buffer = []
+_lock = threading.Lock()
+_last_flush = time.monotonic()
+
+
+def _client_ip(request):
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR', '')
+    return (forwarded.split(',')[0].strip() if forwarded else request.META.get('REMOTE_ADDR')) or None
+
+
+def record_view(request, product_id):
+    """يضيف مشاهدة إلى المخزن، ويكتبه إن امتلأ أو طال انتظاره. لا استعلام في الحالة العادية."""
+    global _last_flush
+    user = getattr(request, 'user', None)
+    event = (
+        int(product_id),
+        user.pk if user is not None and user.is_authenticated else None,
+        _client_ip(request),
+        request.META.get('HTTP_USER_AGENT', '')[:USER_AGENT_MAX_LENGTH],
+        timezone.now(),
+    )
+    with _lock:
+        _buffer.append(event)
+        due = (len(_buffer) >= settings.PRODUCT_VIEW_BUFFER_SIZE
+               or time.monotonic() - _last_flush >= settings.PRODUCT_VIEW_FLUSH_SECONDS)
+    if due:
+        flush()
+
+
+def counts_views(view):
+    """مزخرف لعرض تفاصيل المنتج: يُسجّل المشاهدة حتى لو كان الرد 304 من conditional_get."""
+    @wraps(view)
+    def wrapper(request, pk, *args, **kwargs):
+        response = view(request, pk, *args, **kwargs)
+        if request.method == 'GET' and response.status_code in (200, 304):
+            try:
+                record_view(request, pk)
+            except Exception:
+                # الإحصاءات لا تُفشل صفحة المنتج
+                logger.exception('recording product view failed')
+        return response
+    return wrapper
+
+
+def flush():
+    """يكتب ما في المخزن بـ bulk_create (ويتجاهل منتجات حُذفت منذ المشاهدة). يُرجع عدد الصفوف."""
+    global _last_flush
+    from .models import Product, ProductView
+
+    with _lock:
+        events = _buffer[:]
+        _buffer.clear()
+        _last_flush = time.monotonic()
+    if not events:
+        return 0
+    try:
+        existing = set(Product.objects.filter(pk__in={event[0] for event in events}).values_list('pk', flat=True))
+        rows = [
+            ProductView(product_id=product_id, user_id=user_id, ip_address=ip, user_agent=agent, viewed_at=at)
+            for product_id, user_id, ip, agent, at in events if product_id in existing
+        ]
+        ProductView.objects.bulk_create(rows, batch_size=500)
+        return len(rows)
+    except Exception:
+        logger.exception('flushing %d product views failed; dropped', len(events))
+        return 0
+
+
+atexit.register(flush)
+
+
+def rollup(now=None, batch_size=ROLLUP_BATCH_SIZE):
+    """
+    يجمع المشاهدات غير المجمَّعة في العدّادات اليومية والإجمالية، دفعةً دفعة (كل دفعة معاملة:
+    الانقطاع لا يعدّ مشاهدة مرتين). يُرجع عدد المشاهدات المجمَّعة.
+    """
+    from .models import ProductView
+
+    total = 0
+    while True:
+        with transaction.atomic():
+            pending = ProductView.objects.filter(rolled_up=False)
+            # حد أعلى صريح للدفعة: ما يُكتب أثناء التجميع يبقى للدفعة التالية
+            upper = pending.order_by('id').values_list('id', flat=True)[batch_size - 1:batch_size]
+            upper = upper[0] if upper else pending.aggregate(last=Max('id'))['last']
+            if upper is None:
+                break
+            batch = pending.filter(id__lte=upper)
+            per_day = Counter({
+                (row['product_id'], row['date']): row['views']
+                for row in batch.annotate(date=TruncDate('viewed_at')).order_by()
+                .values('product_id', 'date').annotate(views=Count('id'))
+            })
+            batch.update(rolled_up=True)
+            _add_daily(per_day)
+            per_product = Counter()
+            for (product_id, _), views in per_day.items():
+                per_product[product_id] += views
+            _add_totals(per_product)
+            total += sum(per_product.values())
+    _refresh_recent(now or timezone.now())
+    if total:
+        bump_version(VIEWS)
+    return total
+
+
+def _add_daily(per_day):
+    from .models import ProductViewDaily
+
+    # الأسطر الناقصة أولاً بلا تعارض (تجميع متزامن قد يُنشئ السطر نفسه)، ثم تُقفل وتُزاد
+    ProductViewDaily.objects.bulk_create([
+        ProductViewDaily(product_id=product_id, date=date, views=0) for product_id, date in per_day
+    ], batch_size=500, ignore_conflicts=True)
+    rows = list(ProductViewDaily.objects.select_for_update().filter(
+        product_id__in={product_id for product_id, _ in per_day},
+        date__in={date for _, date in per_day},
+    ))
+    updated = []
+    for row in rows:
+        views = per_day.get((row.product_id, row.date))
+        if views:
+            row.views += views
+            updated.append(row)
+    ProductViewDaily.objects.bulk_update(updated, ['views'], batch_size=500)
+
+
+def _add_totals(per_product):
+    from .models import ProductViewStats
+
+    now = timezone.now()
+    ProductViewStats.objects.bulk_create([
+        ProductViewStats(product_id=product_id) for product_id in per_product
+    ], batch_size=500, ignore_conflicts=True)
+    rows = list(ProductViewStats.objects.select_for_update().filter(product_id__in=per_product))
+    for row in rows:
+        row.total_views += per_product[row.product_id]
+        # bulk_update لا يطبّق auto_now، وupdated_at جزء من بصمة ETag صفحة المنتج (conditional.py)
+        row.updated_at = now
+    ProductViewStats.objects.bulk_update(rows, ['total_views', 'updated_at'], batch_size=500)
+
+
+def _refresh_recent(now):
+    """recent_views = مجموع آخر RECENT_DAYS يوماً، لكل منتج له مشاهدات فيها أو كانت له."""
+    from .models import ProductViewDaily, ProductViewStats
+
+    # الأيام محلية كما يقطعها TruncDate في rollup (TIME_ZONE)، لا أيام UTC
+    since = timezone.localdate(now) - timedelta(days=RECENT_DAYS - 1)
+    recent = dict(
+        ProductViewDaily.objects.filter(date__gte=since).order_by()
+        .values_list('product_id').annotate(views=Sum('views'))
+    )
+    stale = ProductViewStats.objects.filter(recent_views__gt=0).exclude(product_id__in=recent)
+    stale.update(recent_views=0)
+    stats = list(ProductViewStats.objects.filter(product_id__in=recent))
+    changed = [row for row in stats if row.recent_views != recent[row.product_id]]
+    for row in changed:
+        row.recent_views = recent[row.product_id]
+    ProductViewStats.objects.bulk_update(changed, ['recent_views'], batch_size=500)
+
+
+def prune(now=None, retention_days=RETENTION_DAYS, batch_size=PRUNE_BATCH_SIZE):
+    """يحذف المشاهدات الخام المجمَّعة الأقدم من مهلة الاحتفاظ، دفعةً دفعة. يُرجع عددها."""
+    from .models import ProductView
+
+    cutoff = (now or timezone.now()) - timedelta(days=retention_days)
+    removed = 0
+    while True:
+        ids = list(ProductView.objects.filter(rolled_up=True, viewed_at__lt=cutoff)
+                   .order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return removed
+        removed += ProductView.objects.filter(id__in=ids).delete()[0]
+
+
+def view_count(product_id):
+    """إجمالي مشاهدات المنتج من سطر إحصاءاته (حتى آخر تجميع)."""
+    from .models import ProductViewStats
+
+    return ProductViewStats.objects.filter(product_id=product_id).values_list('total_views', flat=True).first() or 0
+
+
+def most_viewed(limit):
+    """[(معرّف المنتج، مشاهدات آخر RECENT_DAYS يوماً)] للمنتجات النشطة، من الفهرس مباشرة."""
+    from .models import ProductViewStats
+
+    return list(
+        ProductViewStats.objects.filter(recent_views__gt=0, product__is_active=True)
+        .order_by('-recent_views', 'product_id').values_list('product_id', 'recent_views')[:limit]
+    )
@@ -0,0 +1,57 @@
+"""
+شجرة الأقسام من المسار المادي (Category.path).
+
+بدل أن يسأل كل قسم قاعدة البيانات عن أبنائه (استعلام لكل عقدة في كل مستوى)، تُحمَّل
+الشجرة كاملة — أو فرع واحد بـ path__startswith — باستعلام واحد وتُركَّب في بايثون.
+العدّادات (products_count, children_count...) أعمدة مخزَّنة في الصف نفسه (counters.py).
+"""
+from .models import Category
+
+
+def load_category_tree(root=None):
+    """
+    يُرجع أقسام الجذر (أو [root] إن أُعطي) وقد عُلِّق على كل قسم أبناؤه (_tree_children).
+    CategorySerializer يقرأ منها مباشرة.
+    """
+    categories = Category.objects.order_by('depth', 'display_order', 'name')
+    if root is not None:
+        categories = categories.filter(path__startswith=root.path)
+
+    nodes = list(categories)
+    by_id = {}
+    for node in nodes:
+        node._tree_children = []
+        by_id[node.pk] = node
+    # مرتبة بالعمق أولاً، فالأب موجود دائماً قبل أبنائه، والأبناء يُضافون بترتيب العرض
+    roots = []
+    for node in nodes:
+        parent = by_id.get(node.parent_id)
+        if parent is None:
+            roots.append(node)
+        else:
+            parent._tree_children.append(node)
+    return roots
+
+
+def rebuild_category_paths(model=Category):
+    """
+    يعيد حساب path/depth لكل الأقسام من parent — لما أُدرج بـ bulk_create
+    (الذي لا يستدعي save()). الترحيل 0014 يحمل نسخته المجمّدة من هذه الدالة.
+    """
+    categories = list(model.objects.only('id', 'parent_id', 'path', 'depth'))
+    children = {}
+    for category in categories:
+        children.setdefault(category.parent_id, []).append(category)
+
+    changed = []
+    stack = [(category, '', -1) for category in children.get(None, [])]
+    while stack:
+        category, parent_path, parent_depth = stack.pop()
+        path, depth = f'{parent_path}{category.pk}/', parent_depth + 1
+        if (category.path, category.depth) != (path, depth):
+            category.path, category.depth = path, depth
+            changed.append(category)
+        stack.extend((child, path, depth) for child in children.get(category.pk, []))
+
+    model.objects.bulk_update(changed, ['path', 'depth'], batch_size=500)
+    return len(changed)
@@ -0,0 +1,157 @@
+"""
+"الرائج الآن": درجة لكل منتج من المشاهدات والوحدات المباعة، تتلاشى بنصف عمر HALF_LIFE.
+
+درجة منتج في اللحظة t هي Σ وزن_الحدث × 2^(-(t - لحظة_الحدث) / HALF_LIFE). التلاشي يضرب
+كل الدرجات بالعامل نفسه، فلا يغيّر الترتيب؛ لذا نخزّن الدرجة منسوبةً إلى لحظة ثابتة
+(EPOCH) بدل "الآن"، ولوغاريتمياً حتى لا تفيض الأس: log_score = log Σ وزن × e^(λ·(لحظة - EPOCH)).
+إضافة حدث = logaddexp على سطر منتجه وحده، ولا يُعاد حساب أي سطر لم يجدّ عليه شيء —
+مهما كبر الكتالوج أو جدول المشاهدات.
+
+المصادر تُقرأ تزايدياً من نقطة حفظ (TrendingCheckpoint):
+- المشاهدات من ProductViewStats (عدّادات التجميع، products/tracking.py) بما تغيّر منذ آخر
+  تشغيل؛ الجديد = total_views - views_seen، فإعادة قراءة سطر لا تعدّه مرتين.
+- المبيعات من OrderItem بعد آخر معرّف محسوب، عدا الطلبات الملغاة لحظة الحساب (إلغاء لاحق
+  لا يُطرح — الدرجة تتلاشى وحدها).
+
+    python manage.py refresh_trending [--watch]
+"""
+import math
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .cache import bump_version, TRENDING
+
+EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+HALF_LIFE = timedelta(hours=24)
+DECAY = math.log(2) / HALF_LIFE.total_seconds()
+# وحدة مباعة تعادل هذا العدد من المشاهدات
+SALE_WEIGHT = 10
+BATCH_SIZE = 5000
+# تجميع جارٍ قد يلتزم بـ updated_at أقدم من لحظة القراءة؛ نعيد قراءة هذه المهلة (بلا عدّ مزدوج)
+VIEWS_OVERLAP = timedelta(minutes=5)
+
+
+def log_weight(weight, at):
+    """لوغاريتم وزن حدث في اللحظة at، منسوباً إلى EPOCH."""
+    return math.log(weight) + DECAY * (at - EPOCH).total_seconds()
+
+
+def _log_add(a, b):
+    high, low = max(a, b), min(a, b)
+    return high + math.log1p(math.exp(low - high))
+
+
+def score(log_score, now=None):
+    """الدرجة الفعلية (بعد التلاشي) في اللحظة now."""
+    return math.exp(log_score - log_weight(1, now or timezone.now()))
+
+
+def _apply(gains, views_seen=None, units=None):
+    """يضيف {منتج: [لوغاريتم وزن...]} إلى أسطر ProductTrend (داخل معاملة المستدعي)."""
+    from .models import ProductTrend
+
+    views_seen, units = views_seen or {}, units or {}
+    now = timezone.now()
+    existing = ProductTrend.objects.select_for_update().in_bulk(list(gains))
+    updated, created = [], []
+    for product_id, weights in gains.items():
+        row = existing.get(product_id)
+        if row is None:
+            row = ProductTrend(product_id=product_id, log_score=weights[0])
+            weights = weights[1:]
+            created.append(row)
+        else:
+            updated.append(row)
+        for weight in weights:
+            row.log_score = _log_add(row.log_score, weight)
+        if product_id in views_seen:
+            row.views_seen = views_seen[product_id]
+        row.units_sold += units.get(product_id, 0)
+        # bulk_update لا يطبّق auto_now
+        row.updated_at = now
+    ProductTrend.objects.bulk_update(updated, ['log_score', 'views_seen', 'units_sold', 'updated_at'],
+                                     batch_size=500)
+    ProductTrend.objects.bulk_create(created, batch_size=500)
+    return len(gains)
+
+
+def _add_views(since, until, batch_size):
+    """المشاهدات المجمَّعة الجديدة منذ since، دفعةً دفعة بترتيب المنتج. يُرجع عدد المنتجات."""
+    from .models import ProductTrend, ProductViewStats, TrendingCheckpoint
+
+    changed = ProductViewStats.objects.filter(updated_at__lte=until)
+    if since is not None:
+        changed = changed.filter(updated_at__gt=since)
+    touched, after = 0, 0
+    while True:
+        with transaction.atomic():
+            # القفل نفسه في _add_sales: تشغيلان متزامنان لا يقرآن views_seen نفسه فيعدّان مرتين
+            TrendingCheckpoint.objects.select_for_update().get(pk=1)
+            rows = list(changed.filter(product_id__gt=after).order_by('product_id')
+                        .values_list('product_id', 'total_views', 'updated_at')[:batch_size])
+            if not rows:
+                return touched
+            after = rows[-1][0]
+            seen = dict(ProductTrend.objects.filter(product_id__in=[row[0] for row in rows])
+                        .values_list('product_id', 'views_seen'))
+            gains, views_seen = {}, {}
+            for product_id, total, at in rows:
+                new = total - seen.get(product_id, 0)
+                if new > 0:
+                    gains[product_id] = [log_weight(new, at)]
+                    views_seen[product_id] = total
+            touched += _apply(gains, views_seen=views_seen)
+
+
+def _add_sales(batch_size):
+    """وحدات عناصر الطلبات بعد نقطة الحفظ، دفعةً دفعة (كل دفعة معاملة). يُرجع عدد المنتجات."""
+    from orders.models import OrderItem
+    from .models import TrendingCheckpoint
+
+    upper = OrderItem.objects.aggregate(last=Max('id'))['last'] or 0
+    touched = 0
+    while True:
+        with transaction.atomic():
+            # القفل يمنع تشغيلين متزامنين من عدّ الدفعة نفسها مرتين
+            after = TrendingCheckpoint.objects.select_for_update().get(pk=1).last_order_item_id
+            if after >= upper:
+                return touched
+            ids = list(OrderItem.objects.filter(id__gt=after, id__lte=upper)
+                       .order_by('id').values_list('id', flat=True)[batch_size - 1:batch_size])
+            last = ids[0] if ids else upper
+            gains, units = {}, {}
+            items = (OrderItem.objects.filter(id__gt=after, id__lte=last, quantity__gt=0)
+                     .exclude(order__status='cancelled')
+                     .values_list('product_id', 'quantity', 'order__created_at'))
+            for product_id, quantity, at in items:
+                gains.setdefault(product_id, []).append(log_weight(quantity * SALE_WEIGHT, at))
+                units[product_id] = units.get(product_id, 0) + quantity
+            touched += _apply(gains, units=units)
+            TrendingCheckpoint.objects.filter(pk=1).update(last_order_item_id=last)
+
+
+def refresh(now=None, batch_size=BATCH_SIZE):
+    """يضيف ما جدّ من مشاهدات ومبيعات إلى الدرجات. يُرجع عدد المنتجات التي تغيّرت درجتها."""
+    from .models import TrendingCheckpoint
+
+    now = now or timezone.now()
+    checkpoint, _ = TrendingCheckpoint.objects.get_or_create(pk=1)
+    touched = _add_views(checkpoint.views_checked_at, now, batch_size)
+    TrendingCheckpoint.objects.filter(pk=1).update(views_checked_at=now - VIEWS_OVERLAP)
+    touched += _add_sales(batch_size)
+    if touched:
+        bump_version(TRENDING)
+    return touched
+
+
+def top(limit, category=None):
+    """[(معرّف المنتج، log_score)] لأعلى المنتجات النشطة، اختيارياً داخل شجرة قسم."""
+    from .models import ProductTrend
+
+    ranked = ProductTrend.objects.filter(product__is_active=True)
+    if category is not None:
+        ranked = ranked.filter(product__category_id__in=category.get_descendants(include_self=True).values('id'))
+    return list(ranked.order_by('-log_score', 'product_id').values_list('product_id', 'log_score')[:limit])
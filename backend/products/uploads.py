@@ -0,0 +1,144 @@
+"""
+رفع الصور مباشرة من المتصفح إلى R2 بروابط PUT موقَّعة، بدل بثّها عبر عامل gunicorn.
+
+    1) POST upload-image/presign/   {content_type, size}
+       → {upload_url, method, headers, token, expires_in}
+    2) المتصفح يرفع الملف بـ PUT إلى upload_url بالترويسات المعطاة (Content-Type و
+       Content-Length موقَّعان: أي حجم أو نوع آخر يرفضه R2 نفسه).
+    3) POST upload-image/complete/  {token}
+       → {url, path, storage} كما يُرجع upload-image/
+
+الاستكمال يقرأ رأس الملف فقط (طلب Range واحد، REQUEST_HEADER_BYTES) ويتحقق منه: الصيغة
+من البايتات لا من الاسم، الحجم، والأبعاد. ملف لا يجتاز التحقق يُحذف من الحاوية. الرمز
+(token) موقَّع بـ SECRET_KEY ويحمل المفتاح المسموح، فلا يمكن "استكمال" ملف آخر في الحاوية.
+
+يتطلب أن يكون default_storage هو S3/R2؛ محلياً (FileSystemStorage) يبقى upload-image/.
+متصفح المشرف يرفع إلى نطاق R2 مباشرة، فيلزم ضبط CORS على الحاوية (PUT من نطاق لوحة التحكم).
+"""
+import io
+import uuid
+
+from django.conf import settings
+from django.core import signing
+from django.core.files.storage import default_storage
+from PIL import Image
+
+# الصيغ المسموح بها، ولكل صيغة امتدادها المعتمد.
+# الامتداد يُشتق من محتوى الملف المتحقَّق منه، لا من اسمه: اسم الملف وContent-Type
+# يتحكم بهما العميل، ورفع ملف باسم ‎.html/.svg‎ على نطاق الوسائط يعني XSS مخزَّن.
+ALLOWED_IMAGE_FORMATS = {'JPEG': '.jpg', 'PNG': '.png', 'WEBP': '.webp', 'GIF': '.gif'}
+CONTENT_TYPES = {'image/jpeg': 'JPEG', 'image/png': 'PNG', 'image/webp': 'WEBP', 'image/gif': 'GIF'}
+MAX_UPLOAD_BYTES = 5 * 1024 * 1024  # 5 ميغابايت
+
+PRESIGN_EXPIRES = 15 * 60
+_TOKEN_SALT = 'products.uploads'
+# رأس JPEG قد يسبقه EXIF كبير قبل مقطع الأبعاد؛ إن لم يكفِ الأول نقرأ الثاني
+REQUEST_HEADER_BYTES = (64 * 1024, 1024 * 1024)
+
+
+class UploadError(Exception):
+    """رسالة موجَّهة للمشرف (ردّ 400)."""
+
+
+def check_image(image_format, width, height, size):
+    """يرفع UploadError إن كانت الصورة مرفوضة، ويُرجع امتدادها."""
+    if size > MAX_UPLOAD_BYTES:
+        raise UploadError(f'حجم الصورة يتجاوز الحد المسموح ({MAX_UPLOAD_BYTES // (1024 * 1024)} ميغابايت)')
+    ext = ALLOWED_IMAGE_FORMATS.get(image_format)
+    if not ext:
+        raise UploadError('صيغة غير مدعومة. الصيغ المسموحة: JPG، PNG، WEBP، GIF')
+    limit = settings.IMAGE_UPLOAD_MAX_DIMENSION
+    if width > limit or height > limit:
+        raise UploadError(f'أبعاد الصورة ({width}×{height}) تتجاوز الحد المسموح ({limit} بكسل)')
+    return ext
+
+
+def supports_direct_upload(storage=None):
+    return hasattr(storage or default_storage, 'bucket_name')
+
+
+def _client(storage):
+    return storage.bucket.meta.client
+
+
+def _key(storage, name):
+    return storage._normalize_name(name)
+
+
+def presign(content_type, size, storage=None):
+    """رابط PUT موقَّع لمفتاح جديد، مع رمز الاستكمال."""
+    storage = storage or default_storage
+    if not supports_direct_upload(storage):
+        raise UploadError('الرفع المباشر يتطلب تخزين R2؛ استخدم upload-image/')
+    image_format = CONTENT_TYPES.get(content_type)
+    if image_format is None:
+        raise UploadError('صيغة غير مدعومة. الصيغ المسموحة: JPG، PNG، WEBP، GIF')
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        raise UploadError('size مطلوب (بالبايت)')
+    if size <= 0:
+        raise UploadError('size مطلوب (بالبايت)')
+    # الأبعاد غير معروفة قبل الرفع؛ تُفحص عند الاستكمال
+    ext = check_image(image_format, 0, 0, size)
+
+    name = f'{uuid.uuid4()}{ext}'
+    upload_url = _client(storage).generate_presigned_url(
+        'put_object',
+        Params={'Bucket': storage.bucket_name, 'Key': _key(storage, name),
+                'ContentType': content_type, 'ContentLength': size},
+        ExpiresIn=PRESIGN_EXPIRES,
+    )
+    return {
+        'upload_url': upload_url,
+        'method': 'PUT',
+        'headers': {'Content-Type': content_type},
+        'token': signing.dumps({'name': name, 'format': image_format}, salt=_TOKEN_SALT),
+        'expires_in': PRESIGN_EXPIRES,
+    }
+
+
+def complete(token, storage=None):
+    """
+    يتحقق من الملف المرفوع من رأسه فقط، ويُرجع (المسار، الرابط، الصيغة). الملف المرفوض يُحذف.
+    """
+    storage = storage or default_storage
+    try:
+        claims = signing.loads(token or '', salt=_TOKEN_SALT, max_age=PRESIGN_EXPIRES * 2)
+    except signing.BadSignature:
+        raise UploadError('رمز الرفع غير صالح أو منتهي الصلاحية')
+    name = claims['name']
+    try:
+        image_format, width, height, size = _inspect(storage, name)
+        if image_format != claims['format']:
+            # Content-Type موقَّع، لكن البايتات نفسها قد تكون صيغة أخرى (أو HTML)
+            raise UploadError('محتوى الملف لا يطابق صيغته المعلنة')
+        check_image(image_format, width, height, size)
+    except UploadError:
+        storage.delete(name)
+        raise
+    return name, storage.url(name), image_format
+
+
+def _inspect(storage, name):
+    """(الصيغة، العرض، الارتفاع، الحجم الكلي) من أول بايتات الملف — بلا تنزيله كاملاً."""
+    from botocore.exceptions import ClientError
+
+    client = _client(storage)
+    for limit in REQUEST_HEADER_BYTES:
+        try:
+            response = client.get_object(
+                Bucket=storage.bucket_name, Key=_key(storage, name), Range=f'bytes=0-{limit - 1}',
+            )
+        except ClientError:
+            raise UploadError('لم يُرفع الملف بعد')
+        head = response['Body'].read()
+        # "bytes 0-65535/1234567" — وبدونها (ملف أصغر من المدى) الطول هو ما قُرئ
+        size = int(response.get('ContentRange', '').rpartition('/')[2] or len(head))
+        try:
+            with Image.open(io.BytesIO(head)) as image:
+                return image.format, image.width, image.height, size
+        except Exception:
+            if size <= len(head):
+                break
+    raise UploadError('الملف ليس صورة صالحة')
@@ -7,10 +7,20 @@ urlpatterns = [
     path('', views.product_list, name='product_list'),
     path('<int:pk>/', views.product_detail, name='product_detail'),
     path('featured/', views.featured_products, name='featured_products'),
+    path('most-viewed/', views.most_viewed_products, name='most_viewed_products'),
+    path('trending/', views.trending_products, name='trending_products'),
+    path('home/', views.home, name='home'),
+    path('batch/', views.product_batch, name='product_batch'),
+    path('changes/', views.catalog_changes, name='catalog_changes'),
+    path('snapshot/', views.catalog_snapshot, name='catalog_snapshot'),
+    path('filter/', views.filter_products, name='filter_products'),
     path('search/', views.search_products, name='search_products'),
+    path('search/suggest/', views.search_suggestions, name='search_suggestions'),
     path('run-migration-secret-123/', views.run_migration_view, name='run_migration'),
 
     path('upload-image/', views.upload_image_to_voro, name='upload_image'),
+    path('upload-image/presign/', views.presign_image_upload, name='presign_image_upload'),
+    path('upload-image/complete/', views.complete_image_upload, name='complete_image_upload'),
 
     # Categories
     path('categories/', views.category_list, name='category_list'),
@@ -1,12 +1,26 @@
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, BasePermission
 from rest_framework.response import Response
-from .models import Product, Category, Banner
+from .models import MAX_PRODUCT_ID, Product, Category, Banner
 from .models_coupons import Coupon, CouponUsage
-from .serializers import ProductSerializer, CategorySerializer, BannerSerializer
+from .serializers import (
+    ProductSerializer, ProductCardSerializer, CategorySerializer, BannerSerializer,
+    similar_products_prefetch,
+)
 from .serializers_coupons import CouponSerializer, CouponUsageSerializer
+from .pagination import ProductKeysetPagination, RatingKeysetPagination, SearchResultsPagination
+from .search import search_product_ids, tokenize
+from . import blobs, image_migration, images, snapshots, suggest, sync, tracking, trending, uploads
+from .filters import parse_filters, apply_filters, facet_counts
+from .tree import load_category_tree
+from .cache import catalog_cache, PRODUCTS, CATEGORIES, BANNERS, SALES, VIEWS, TRENDING
+from .conditional import (
+    conditional_get, product_list_fingerprint, product_detail_fingerprint,
+    category_list_fingerprint, banner_list_fingerprint, coupon_list_fingerprint,
+)
 from django.conf import settings
 from django.core.files.storage import default_storage
+from django.utils import timezone
 import requests
 import logging
 
@@ -22,136 +36,293 @@ class IsProjectAdmin(BasePermission):
             return False
         return bool(getattr(user, 'is_staff', False) or getattr(user, 'is_staff_member', False) or getattr(user, 'is_superuser', False))
 
-# الصيغ المسموح بها، ولكل صيغة امتدادها المعتمد.
-# الامتداد يُشتق من محتوى الملف المتحقَّق منه، لا من اسمه: اسم الملف وContent-Type
-# يتحكم بهما العميل، ورفع ملف باسم ‎.html/.svg‎ على نطاق الوسائط يعني XSS مخزَّن.
-ALLOWED_IMAGE_FORMATS = {'JPEG': '.jpg', 'PNG': '.png', 'WEBP': '.webp', 'GIF': '.gif'}
-MAX_UPLOAD_BYTES = 5 * 1024 * 1024  # 5 ميغابايت
+
 LOCAL_FILE_STORAGE = 'django.core.files.storage.FileSystemStorage'
 
 
 @csrf_exempt
-@api_view(['POST'])
+@api_view(['GET', 'POST'])
 @permission_classes([IsProjectAdmin])
 def upload_image_to_voro(request):
     """
     رفع صورة من جهاز المشرف إلى تخزين المشروع (Cloudflare R2 عبر default_storage).
     يُرجع {'url': ...} وهو الرابط الذي يُحفظ في image_url للقسم/البنر/المنتج.
+    الاسم بصمة المحتوى (products/blobs.py): الصورة نفسها تُخزَّن مرة ويعود رابطها نفسه.
+    GET ‎?sha256=‎ يسأل إن كانت مخزَّنة أصلاً (200 برابطها أو 404) قبل إرسال البايتات.
     """
+    is_local = settings.STORAGES.get('default', {}).get('BACKEND') == LOCAL_FILE_STORAGE
+    if request.method == 'GET':
+        blob = blobs.existing(request.query_params.get('sha256', '').lower())
+        if blob is None:
+            return Response({'error': 'الصورة غير موجودة'}, status=404)
+        return Response({'url': blob.url, 'path': blob.path, 'storage': 'local' if is_local else 'remote',
+                         'existing': True})
+
     image_file = request.FILES.get('image')
     if not image_file:
         return Response({'error': 'لم يتم إرسال أي صورة'}, status=400)
 
-    if image_file.size > MAX_UPLOAD_BYTES:
-        return Response(
-            {'error': f'حجم الصورة يتجاوز الحد المسموح ({MAX_UPLOAD_BYTES // (1024 * 1024)} ميغابايت)'},
-            status=400,
-        )
-
-    # نتحقق من البايتات نفسها. verify() يُبطل الكائن بعد استدعائه، لذا نفتح مرة ثانية للصيغة.
+    # رأس الصورة يكفي للصيغة والأبعاد؛ verify() يفحص بقية البنية. فتح واحد بدل اثنين.
     try:
         from PIL import Image
-        Image.open(image_file).verify()
-        image_file.seek(0)
-        image_format = Image.open(image_file).format
+        image = Image.open(image_file)
+        image_format, (width, height) = image.format, image.size
+        image.verify()
         image_file.seek(0)
     except Exception:
         return Response({'error': 'الملف ليس صورة صالحة'}, status=400)
 
-    ext = ALLOWED_IMAGE_FORMATS.get(image_format)
-    if not ext:
-        return Response(
-            {'error': 'صيغة غير مدعومة. الصيغ المسموحة: JPG، PNG، WEBP، GIF'},
-            status=400,
-        )
+    try:
+        ext = uploads.check_image(image_format, width, height, image_file.size)
+    except uploads.UploadError as exc:
+        return Response({'error': str(exc)}, status=400)
 
     try:
-        import uuid
-        # نمرّر الملف نفسه (لا ContentFile(read())) حتى يُبَثّ بدل تحميله كاملاً في الذاكرة
-        path = default_storage.save(f'{uuid.uuid4()}{ext}', image_file)
-        url = default_storage.url(path)
-        # التخزين المحلي (وضع التطوير) يُرجع مساراً نسبياً مثل /media/x.jpg، وحقول
-        # image_url في النماذج من نوع URLField فترفض المسار النسبي. نجعله مطلقاً دائماً.
-        if not url.startswith('http'):
-            url = request.build_absolute_uri(url)
-
-        # نُبلّغ الواجهة أين حُفظت الصورة فعلاً. التخزين المحلي ينتج روابط
-        # ‏127.0.0.1 تعمل على جهاز المطوّر وحده — تبدو ناجحة ولا يراها أي زبون.
-        # إخفاء هذه الحقيقة هو بالضبط ما يجعل الرفع "ينجح" ثم لا تظهر الصورة.
-        is_local = settings.STORAGES.get('default', {}).get('BACKEND') == LOCAL_FILE_STORAGE
-        return Response({
-            'url': url,
-            'path': path,
-            'storage': 'local' if is_local else 'remote',
-        })
+        sha = blobs.sha256_of(image_file)
+        blob = blobs.existing(sha)
+        if blob is None:
+            # نمرّر الملف نفسه (لا ContentFile(read())) حتى يُبَثّ بدل تحميله كاملاً في الذاكرة
+            path, _ = blobs.write(image_file, sha, ext)
+            url = default_storage.url(path)
+            # التخزين المحلي (وضع التطوير) يُرجع مساراً نسبياً مثل /media/x.jpg، وحقول
+            # image_url في النماذج من نوع URLField فترفض المسار النسبي. نجعله مطلقاً دائماً.
+            if not url.startswith('http'):
+                url = request.build_absolute_uri(url)
+            blob = blobs.register(sha, path, url, image_file.size, image_format)
+            created = True
+        else:
+            created = False
     except Exception:
         # لا نُسرّب نص الاستثناء (قد يحوي تفاصيل التخزين/المفاتيح)
         logger.exception('upload_image_to_voro: storage write failed')
         return Response({'error': 'تعذّر حفظ الصورة. راجع سجلات الخادم.'}, status=500)
 
-from django.core.management import call_command
-from django.http import HttpResponse
-import io
+    # نسخ WebP/AVIF بعروض ثابتة تُولَّد خارج الطلب (products/images.py). GIF يبقى كما هو
+    # حتى لا تضيع الحركة. فشلها لا يُفشل الرفع: الصورة الأصلية محفوظة، والأمر
+    # generate_image_variants يُكمل ما فات. صورة مخزَّنة من قبل لها نسخها أصلاً.
+    if created and image_format != 'GIF':
+        try:
+            image_file.seek(0)
+            images.schedule_variants(blob.path, blob.url, image_file.read())
+        except Exception:
+            logger.exception('upload_image_to_voro: scheduling image variants failed')
+
+    # نُبلّغ الواجهة أين حُفظت الصورة فعلاً. التخزين المحلي ينتج روابط
+    # ‏127.0.0.1 تعمل على جهاز المطوّر وحده — تبدو ناجحة ولا يراها أي زبون.
+    # إخفاء هذه الحقيقة هو بالضبط ما يجعل الرفع "ينجح" ثم لا تظهر الصورة.
+    return Response({
+        'url': blob.url,
+        'path': blob.path,
+        'storage': 'local' if is_local else 'remote',
+        'existing': not created,
+    })
 
+
+@csrf_exempt
 @api_view(['POST'])
 @permission_classes([IsProjectAdmin])
-def run_migration_view(request):
+def presign_image_upload(request):
     """
-    تشغيل أمر تهجير الصور — مقصور على المشرفين وعبر POST فقط.
-    URL: /api/products/run-migration-secret-123/
-    ملاحظة: يُفضّل تشغيل أوامر الإدارة عبر CLI/CI؛ هذه النقطة أداة صيانة محمية.
+    الخطوة الأولى للرفع المباشر إلى R2 (products/uploads.py): {content_type, size} →
+    رابط PUT موقَّع يرفع إليه المتصفح، ورمز يُمرَّر بعدها إلى upload-image/complete/.
     """
-    # نستخدم StringIO لالتقاط مخرجات الأمر (stdout)
-    out = io.StringIO()
     try:
-        # 1. تهجير الصور من ImgBB إلى R2
-        call_command('migrate_images_to_r2', stdout=out)
+        return Response(uploads.presign(request.data.get('content_type'), request.data.get('size')))
+    except uploads.UploadError as exc:
+        return Response({'error': str(exc)}, status=400)
 
-        # 2. إصلاح المسارات بإزالة uploads/
-        call_command('fix_image_paths', stdout=out)
 
-        result = out.getvalue()
-        return HttpResponse(f"<h1>voro Image Migration & Path Fix Result</h1><pre>{result}</pre>", content_type="text/html")
+@csrf_exempt
+@api_view(['POST'])
+@permission_classes([IsProjectAdmin])
+def complete_image_upload(request):
+    """
+    الخطوة الأخيرة للرفع المباشر: يتحقق من الملف المرفوع (من رأسه فقط) ويُرجع رابطه
+    بنفس شكل رد upload-image/. الملف المرفوض يُحذف من الحاوية.
+    """
+    try:
+        path, url, image_format = uploads.complete(request.data.get('token'))
+    except uploads.UploadError as exc:
+        return Response({'error': str(exc)}, status=400)
     except Exception:
-        # لا نُسرّب نص الاستثناء الداخلي للعميل
-        logger.exception("run_migration_view failed")
-        return HttpResponse("<h1>Error during migration</h1><p>حدث خطأ داخلي. راجع سجلات الخادم.</p>", status=500)
+        logger.exception('complete_image_upload: storage read failed')
+        return Response({'error': 'تعذّر التحقق من الصورة. راجع سجلات الخادم.'}, status=500)
+
+    if image_format != 'GIF':
+        try:
+            # الأصل في R2 لا في الطلب: الخيط الخلفي ينزّله بنفسه
+            images.schedule_variants(path, url)
+        except Exception:
+            logger.exception('complete_image_upload: scheduling image variants failed')
+    return Response({'url': url, 'path': path, 'storage': 'remote'})
+
 
+@api_view(['GET', 'POST'])
+@permission_classes([IsProjectAdmin])
+def run_migration_view(request):
+    """
+    تهجير الصور من ImgBB إلى R2 (products/image_migration.py) — مقصور على المشرفين.
+    URL: /api/products/run-migration-secret-123/
+    POST يبدأ تشغيلاً في الخلفية (202، أو 409 إن كان أحدها جارياً) ثم إصلاح المسارات
+    (fix_image_paths)؛ GET يعرض التقدم. التشغيل المنقطع يُستأنف من نقاط ImageMigration.
+    ملاحظة: يُفضّل تشغيل أوامر الإدارة عبر CLI/CI؛ هذه النقطة أداة صيانة محمية.
+    """
+    if request.method == 'POST':
+        started = image_migration.start_background_run()
+        return Response(image_migration.progress(), status=202 if started else 409)
+    return Response(image_migration.progress())
+
+@conditional_get(product_list_fingerprint)
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@catalog_cache(PRODUCTS, CATEGORIES, SALES)
 def product_list(request):
     """
-    قائمة جميع المنتجات مرتبة حسب display_order
+    قائمة المنتجات مرتبة حسب display_order، مرقّمة بالمؤشر (?cursor=&page_size=)
     """
-    try:
-        # المنتجات الموقوفة (is_active=False) يجب ألا تظهر للزبون ولا تُشترى
-        products = Product.objects.filter(is_active=True).order_by('display_order', '-created_at')
-        print(f"📡 Product list requested. Found {products.count()} products.")
-        serializer = ProductSerializer(products, many=True)
-        data = serializer.data
-        print(f"✅ Successfully serialized {len(data)} products.")
-        return Response(data)
-    except Exception as e:
-        import traceback
-        print(f"❌ Error in product_list: {str(e)}")
-        traceback.print_exc()
-        return Response({'error': str(e)}, status=500)
+    # المنتجات الموقوفة (is_active=False) يجب ألا تظهر للزبون ولا تُشترى
+    products = Product.objects.filter(is_active=True)
+    return _paginated_products(request, products)
 
+
+@conditional_get(product_list_fingerprint)
+@api_view(['GET'])
+@permission_classes([AllowAny])
+@catalog_cache(PRODUCTS, CATEGORIES, SALES)
+def filter_products(request):
+    """
+    فلترة المنتجات: ‎/api/products/filter/?brand=Nike,Adidas&size=42&min_price=10000&on_sale=true‎
+    الرد مثل قائمة المنتجات ({next, results}) ومعه facets (عدّاد كل قيمة لكل خاصية) في
+    الصفحة الأولى فقط — الصفحات التالية لا تغيّر العدّادات. انظر products/filters.py.
+    """
+    filters = parse_filters(request.query_params)
+    products = Product.objects.filter(is_active=True).with_pricing()
+    if filters['category'] is not None:
+        # القسم وكل فروعه كما في products_by_category، على فهرس path
+        category = Category.objects.only('id', 'path').filter(pk=filters['category']).first()
+        if category is None:
+            products = products.none()
+        else:
+            products = products.filter(category_id__in=category.get_descendants(include_self=True).values('id'))
+
+    response = _paginated_products(request, apply_filters(products, filters))
+    if not request.query_params.get(ProductKeysetPagination.cursor_query_param):
+        response.data['facets'] = facet_counts(products, filters)
+    return response
+
+def _paginated_products(request, products):
+    """
+    صفحة واحدة من المنتجات بترقيم المؤشر وبتمثيل البطاقة الخفيف،
+    بدل تسلسل القائمة كاملة بـ ProductSerializer في رد واحد.
+    ‎?sort=rating‎ يرتّبها بالتقييم المخزَّن في المنتج (products/ratings.py).
+    """
+    if request.query_params.get('sort') == 'rating':
+        paginator = RatingKeysetPagination()
+    else:
+        paginator = ProductKeysetPagination()
+    page = paginator.paginate_queryset(ProductCardSerializer.optimize_queryset(products), request)
+    serializer = ProductCardSerializer(page, many=True, context={'request': request})
+    return paginator.get_paginated_response(serializer.data)
+
+@tracking.counts_views
+@conditional_get(product_detail_fingerprint)
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def product_detail(request, pk):
     """
-    تفاصيل منتج محدد
+    تفاصيل منتج محدد (كل طلب يُسجَّل مشاهدة — products/tracking.py)
     """
+    if pk > MAX_PRODUCT_ID:
+        return Response({'error': 'المنتج غير موجود'}, status=404)
     try:
-        product = Product.objects.get(pk=pk)
-        serializer = ProductSerializer(product)
+        product = Product.objects.with_pricing().select_related('category', 'view_stats').get(pk=pk)
+        # صفحة المنتج تعرض بطاقات المشابهة، فتُوسَّع هنا دائماً (القوائم تكتفي بمعرّفاتها)
+        serializer = ProductSerializer(product, context={'request': request, 'expand': ('similar_products',)})
         return Response(serializer.data)
     except Product.DoesNotExist:
         return Response({'error': 'المنتج غير موجود'}, status=404)
 
+def _batch_id(value):
+    """معرّف منتج من قائمة batch/: عدد صحيح موجب لا يتجاوز MAX_PRODUCT_ID، وإلا ValueError."""
+    # true و 1.5 في JSON ليسا معرّفين وإن قبلهما int()
+    if isinstance(value, (bool, float)):
+        raise ValueError(value)
+    pk = int(value)
+    if not 0 < pk <= MAX_PRODUCT_ID:
+        raise ValueError(value)
+    return pk
+
+@api_view(['GET', 'POST'])
+@permission_classes([AllowAny])
+@catalog_cache(PRODUCTS, CATEGORIES, SALES)
+def product_batch(request):
+    """
+    عدة منتجات باستعلام واحد بدل طلب product_detail لكل منتج (السلة، المفضلة، سجل الطلبات):
+    GET ‎/api/products/batch/?ids=1,2,3‎ أو POST ‎{"ids": [1, 2, 3]}‎ للقوائم الطويلة.
+    النتائج بتمثيل البطاقة وبترتيب الطلب؛ missing للمعرّفات غير الموجودة و inactive للموقوفة.
+    الحد الأقصى PRODUCT_BATCH_MAX_SIZE معرّفاً.
+    """
+    source = request.data if request.method == 'POST' else request.query_params
+    raw = source.getlist('ids') if hasattr(source, 'getlist') else source.get('ids', [])
+    if not isinstance(raw, list):
+        raw = [raw]
+    # كل قيمة رقم أو نص بمعرّفات مفصولة بفواصل ("1,2,3")
+    values = [part for value in raw for part in (value.split(',') if isinstance(value, str) else [value])]
+    try:
+        ids = list(dict.fromkeys(_batch_id(value) for value in values if str(value).strip()))
+    except (TypeError, ValueError):
+        return Response({'error': 'قائمة المعرّفات غير صالحة'}, status=400)
+    if len(ids) > settings.PRODUCT_BATCH_MAX_SIZE:
+        return Response({'error': f'الحد الأقصى {settings.PRODUCT_BATCH_MAX_SIZE} منتجاً في الطلب الواحد'}, status=400)
+
+    products = ProductCardSerializer.optimize_queryset(Product.objects.filter(id__in=ids))
+    by_id = {product.pk: product for product in products.only(*ProductCardSerializer.DB_FIELDS, 'is_active')}
+    found = [by_id[pk] for pk in ids if pk in by_id and by_id[pk].is_active]
+    return Response({
+        'results': ProductCardSerializer(found, many=True, context={'request': request}).data,
+        'missing': [pk for pk in ids if pk not in by_id],
+        'inactive': [pk for pk in ids if pk in by_id and not by_id[pk].is_active],
+    })
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def catalog_changes(request):
+    """
+    موجز تغييرات الكتالوج للمزامنة التزايدية (products/sync.py):
+    ‎/api/products/changes/?cursor=...‎ (أو ‎?since=2025-01-01T00:00:00Z‎ لأول مرة، أو بلا شيء
+    لمزامنة كاملة). يعيد المنتجات والأقسام والبنرات المعدّلة النشطة، معرّفات المحذوف والمعطَّل
+    في deleted، والمؤشر التالي؛ ما دام has_more صحيحاً يطلب العميل الصفحة التالية فوراً.
+    مؤشر أقدم من مدة الاحتفاظ بسجل الحذف يُرجع 410 ويلزم مزامنة كاملة.
+    """
+    cursor = request.query_params.get('cursor')
+    since = request.query_params.get('since')
+    try:
+        limit = int(request.query_params.get('limit', sync.DEFAULT_LIMIT))
+    except ValueError:
+        limit = sync.DEFAULT_LIMIT
+    limit = min(max(limit, 1), sync.MAX_LIMIT)
+    return Response(sync.catalog_changes(
+        request, cursor=cursor, since=sync.parse_since(since) if since and not cursor else None, limit=limit,
+    ))
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def catalog_snapshot(request):
+    """
+    بيان اللقطة الثابتة الحالية للكتالوج (products/snapshots.py): روابط ملفات المنتجات والأقسام
+    والبنرات على الـCDN (مع نسخها المضغوطة) وبصماتها. العميل يجلب الملفات من هناك مباشرة.
+    """
+    manifest = snapshots.current_manifest()
+    if manifest is None:
+        return Response({'error': 'لا توجد لقطة للكتالوج بعد'}, status=404)
+    response = Response(manifest)
+    response['Cache-Control'] = snapshots.MANIFEST_CACHE_CONTROL
+    return response
+
+@conditional_get(category_list_fingerprint)
 @api_view(['GET', 'POST'])
 @permission_classes([AllowAny])
+@catalog_cache(CATEGORIES, PRODUCTS)
 def category_list(request):
     """
     GET: قائمة الفئات الرئيسية (الأب فقط) مع فئاتها الفرعية مرتبة حسب display_order
@@ -166,17 +337,9 @@ def category_list(request):
             return Response(serializer.data, status=201)
         return Response(serializer.errors, status=400)
 
-    # Return only parent categories (where parent is None), ordered by display_order
-    categories = Category.objects.filter(parent__isnull=True).order_by('display_order', 'name')
-    print(f"Found {categories.count()} parent categories")
-    
-    # Log categories for debugging
-    for category in categories:
-        children_count = category.children.count()
-        print(f"Category: {category.name}, ID: {category.id}, Active: {category.is_active}, Display Order: {category.display_order}, Children: {children_count}")
-        
-    serializer = CategorySerializer(categories, many=True)
-    print(f"Returning {len(serializer.data)} categories with their subcategories")
+    # الأقسام الرئيسية (parent=None) بترتيب العرض، وتحت كل منها فروعه بأي عمق —
+    # الشجرة كلها باستعلامين (products/tree.py)
+    serializer = CategorySerializer(load_category_tree(), many=True)
     return Response(serializer.data)
 
 @api_view(['GET', 'PUT', 'PATCH', 'DELETE'])
@@ -193,6 +356,7 @@ def category_detail(request, pk):
         return Response({'error': 'القسم غير موجود'}, status=404)
 
     if request.method == 'GET':
+        [category] = load_category_tree(root=category)
         return Response(CategorySerializer(category, context={'request': request}).data)
 
     # طرق الكتابة — للمشرف فقط
@@ -202,8 +366,9 @@ def category_detail(request, pk):
     if request.method in ('PUT', 'PATCH'):
         serializer = CategorySerializer(category, data=request.data, partial=True, context={'request': request})
         if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data)
+            category = serializer.save()
+            [category] = load_category_tree(root=category)
+            return Response(CategorySerializer(category, context={'request': request}).data)
         return Response(serializer.errors, status=400)
 
     # DELETE
@@ -214,48 +379,136 @@ def category_detail(request, pk):
 @permission_classes([AllowAny])
 def products_by_category(request, category_id):
     """
-    قائمة المنتجات حسب الفئة
+    قائمة المنتجات حسب الفئة، شاملةً منتجات كل فروعها بأي عمق (صفحة القسم الرئيسي
+    بطلب واحد). ‎?descendants=false‎ يقصرها على منتجات القسم نفسه.
     """
     try:
-        category = Category.objects.get(id=category_id)
-        products = Product.objects.filter(category=category, is_active=True)
-        print(f"Found {products.count()} products in category {category.name}")
-        
-        # Log products for debugging
-        for product in products:
-            print(f"Product: {product.name}, ID: {product.id}, Active: {product.is_active}")
-            
-        serializer = ProductSerializer(products, many=True)
-        print(f"Returning {len(serializer.data)} products")
-        return Response(serializer.data)
+        category = Category.objects.only('id', 'path').get(id=category_id)
     except Category.DoesNotExist:
         print(f"Category with ID {category_id} not found or not active")
         return Response({'error': 'الفئة غير موجودة أو غير نشطة'}, status=404)
 
+    if request.query_params.get('descendants', '').lower() in ('0', 'false', 'no'):
+        products = Product.objects.filter(category=category, is_active=True)
+    else:
+        # معرّفات الشجرة الفرعية كاستعلام فرعي على فهرس path — رحلة واحدة إلى قاعدة البيانات
+        subtree = category.get_descendants(include_self=True).values('id')
+        products = Product.objects.filter(category_id__in=subtree, is_active=True)
+    return _paginated_products(request, products)
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@catalog_cache(PRODUCTS, CATEGORIES, SALES)
 def featured_products(request):
     """
     قائمة المنتجات المميزة
     """
     # الحقل اسمه is_featured لا featured — كانت النقطة ترجع 500 عند كل نداء
     products = Product.objects.filter(is_featured=True, is_active=True)
-    serializer = ProductSerializer(products, many=True)
-    return Response(serializer.data)
+    return _paginated_products(request, products)
+
+# الحد الأقصى لـ ?limit= في most-viewed/ و trending/
+MOST_VIEWED_MAX = 50
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+@catalog_cache(PRODUCTS, CATEGORIES, SALES, VIEWS)
+def most_viewed_products(request):
+    """
+    الأكثر مشاهدة في آخر أيام (tracking.RECENT_DAYS) من عدّادات التجميع مباشرة:
+    قراءة فهرس + استعلام البطاقات، مهما كبر جدول المشاهدات. ‎?limit=‎ (الافتراضي 20).
+    كل بطاقة معها views.
+    """
+    try:
+        limit = min(max(int(request.query_params.get('limit', 20)), 1), MOST_VIEWED_MAX)
+    except ValueError:
+        return Response({'error': 'limit غير صالح'}, status=400)
+    results = _ranked_cards(request, tracking.most_viewed(limit), 'views')
+    return Response({'days': tracking.RECENT_DAYS, 'results': results})
+
+
+def _ranked_cards(request, ranked, field):
+    """بطاقات [(معرّف، قيمة)] بترتيبها، وكل بطاقة تحمل قيمتها في field."""
+    products = ProductCardSerializer.optimize_queryset(Product.objects.filter(pk__in=[pk for pk, _ in ranked]))
+    by_id = {product.pk: product for product in products}
+    ordered = [by_id[pk] for pk, _ in ranked if pk in by_id]
+    results = ProductCardSerializer(ordered, many=True, context={'request': request}).data
+    values = dict(ranked)
+    for item in results:
+        item[field] = values[item['id']]
+    return results
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+@catalog_cache(PRODUCTS, CATEGORIES, SALES, TRENDING)
+def trending_products(request):
+    """
+    الرائج الآن (products/trending.py): مشاهدات ومبيعات تتلاشى بنصف عمر trending.HALF_LIFE،
+    من جدول الدرجات مباشرة. ‎?category=<id>‎ يقصرها على شجرة القسم، و ‎?limit=‎ (الافتراضي 20).
+    كل بطاقة معها score (الدرجة بعد التلاشي لحظة الحساب).
+    """
+    try:
+        limit = min(max(int(request.query_params.get('limit', 20)), 1), MOST_VIEWED_MAX)
+        category_id = request.query_params.get('category')
+        category_id = int(category_id) if category_id else None
+    except ValueError:
+        return Response({'error': 'limit أو category غير صالح'}, status=400)
+    category = None
+    if category_id is not None:
+        category = Category.objects.only('id', 'path').filter(id=category_id).first()
+        if category is None:
+            return Response({'error': 'الفئة غير موجودة'}, status=404)
+    now = timezone.now()
+    ranked = [(pk, round(trending.score(log_score, now), 2)) for pk, log_score in trending.top(limit, category)]
+    return Response({
+        'half_life_hours': trending.HALF_LIFE.total_seconds() / 3600,
+        'results': _ranked_cards(request, ranked, 'score'),
+    })
+
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def search_products(request):
     """
-    البحث عن المنتجات
+    البحث عن المنتجات بالاسم والعلامة التجارية والكلمات المفتاحية والوصف، مرتبة بالصلة.
+    يتجاهل التشكيل واختلاف الهمزات والتاء المربوطة (انظر products/search.py).
+    بدون q تُرجِع كل المنتجات النشطة كما في القائمة العادية.
     """
     query = request.GET.get('q', '')
-    products = Product.objects.filter(name__icontains=query, is_active=True)
-    serializer = ProductSerializer(products, many=True)
-    return Response(serializer.data)
+    products = Product.objects.filter(is_active=True)
+    if not tokenize(query):
+        return _paginated_products(request, products)
+
+    paginator = SearchResultsPagination()
+    page = paginator.paginate_search(
+        lambda limit: search_product_ids(query, limit),
+        ProductCardSerializer.optimize_queryset(products),
+        request,
+    )
+    serializer = ProductCardSerializer(page, many=True, context={'request': request})
+    return paginator.get_paginated_response(serializer.data)
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
+def search_suggestions(request):
+    """
+    اقتراحات أثناء الكتابة لمربع البحث: ‎/api/products/search/suggest/?q=احذ&limit=8‎
+    تُجاب من فهرس بادئات في الذاكرة (products/suggest.py) بلا قاعدة بيانات.
+    كل اقتراح: type (product/category)، id، name، thumbnail.
+    """
+    query = request.query_params.get('q', '')
+    try:
+        limit = min(max(int(request.query_params.get('limit', suggest.DEFAULT_LIMIT)), 1), suggest.MAX_LIMIT)
+    except ValueError:
+        limit = suggest.DEFAULT_LIMIT
+    return Response({'results': suggest.get_index().suggest(query, limit)})
+
+@conditional_get(banner_list_fingerprint)
+@api_view(['GET'])
+@permission_classes([AllowAny])
+@catalog_cache(BANNERS, PRODUCTS)
 def banner_list(request):
     """
     قائمة البانرات النشطة. تدعم الفلترة حسب مكان الظهور:
@@ -263,11 +516,51 @@ def banner_list(request):
     (بدون بارامتر تُرجِع بنرات الرئيسية للحفاظ على السلوك السابق.)
     """
     placement = request.query_params.get('placement', Banner.PLACEMENT_HOME)
-    banners = Banner.objects.filter(is_active=True, placement=placement)
+    banners = Banner.objects.filter(is_active=True, placement=placement).select_related('product')
     serializer = BannerSerializer(banners, many=True, context={'request': request})
     return Response(serializer.data)
 
 
+# عدد المنتجات في كل قسم من أقسام الرئيسية؛ البقية من featured/ وقائمة المنتجات بالمؤشر
+HOME_PRODUCTS_LIMIT = 20
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+@catalog_cache(BANNERS, CATEGORIES, PRODUCTS, SALES, compress=True)
+def home(request):
+    """
+    كل ما تحتاجه الواجهة الرئيسية في طلب واحد: بنرات الرئيسية، الأقسام المميّزة
+    (featured_on_homepage)، المنتجات المميّزة، ومنتجات show_on_homepage.
+    يُبنى مرة لكل إصدار من الكتالوج ويُخزَّن مضغوطاً (gzip)؛ بقية الطلبات قراءة واحدة من الذاكرة.
+    """
+    banners = (Banner.objects.filter(is_active=True, placement=Banner.PLACEMENT_HOME)
+               .select_related('product'))
+
+    # الشجرة كلها باستعلام واحد، ثم المميّز منها بأي عمق — مع فروعه كما في categories/
+    featured_categories = []
+    stack = load_category_tree()
+    while stack:
+        category = stack.pop()
+        if category.featured_on_homepage and category.is_active:
+            featured_categories.append(category)
+        stack.extend(category._tree_children)
+    featured_categories.sort(key=lambda category: (category.display_order, category.name))
+
+    def products(**filters):
+        queryset = ProductCardSerializer.optimize_queryset(Product.objects.filter(is_active=True, **filters))
+        queryset = queryset.order_by(*ProductKeysetPagination.ordering)[:HOME_PRODUCTS_LIMIT]
+        return ProductCardSerializer(queryset, many=True, context={'request': request}).data
+
+    return Response({
+        'banners': BannerSerializer(banners, many=True, context={'request': request}).data,
+        'categories': CategorySerializer(featured_categories, many=True).data,
+        'featured_products': products(is_featured=True),
+        'products': products(show_on_homepage=True),
+    })
+
+
+@conditional_get(coupon_list_fingerprint)
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def coupon_list(request):
@@ -326,7 +619,11 @@ def admin_products_list(request):
     POST: Create a new product
     """
     if request.method == 'GET':
-        products = Product.objects.all().order_by('-created_at')
+        products = Product.objects.with_pricing().order_by('-created_at').select_related('category', 'view_stats')
+        # ‎?fields=‎ بلا similar_products (شبكة الإدارة) يوفّر استعلام المنتجات المشابهة كله
+        if ProductSerializer.wants(request, 'similar_products'):
+            expanded = ProductSerializer.expands(request, 'similar_products')
+            products = products.prefetch_related(similar_products_prefetch(expanded=expanded))
         
         # تسجيل بيانات الصور للتحقق
         print("📦 Getting Admin Products List")
@@ -375,7 +672,7 @@ def admin_product_detail(request, pk):
     DELETE: Delete product
     """
     try:
-        product = Product.objects.get(pk=pk)
+        product = Product.objects.with_pricing().select_related('view_stats').get(pk=pk)
     except Product.DoesNotExist:
         return Response({'error': 'المنتج غير موجود'}, status=404)
     
@@ -415,7 +712,8 @@ def admin_banners_list(request):
     POST: إنشاء بنر جديد.
     """
     if request.method == 'GET':
-        banners = Banner.objects.all().order_by('placement', 'display_order', '-created_at')
+        banners = (Banner.objects.all().order_by('placement', 'display_order', '-created_at')
+                   .select_related('product'))
         serializer = BannerSerializer(banners, many=True, context={'request': request})
         return Response(serializer.data)
 
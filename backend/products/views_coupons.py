@@ -57,14 +57,13 @@ def apply_coupon(request):
     cart_items = request.data.get('cart_items', [])
     cart_total = Decimal(str(request.data.get('total', request.data.get('cart_total', 0))))
 
-    # تحديد المنتجات المخفّضة (المعتمدة على خاصية is_on_sale في المنتج)
+    # تحديد المنتجات المخفّضة (نفس شرط is_on_sale في المنتج، كاستعلام على المعرّفات فقط)
     from .models import Product
     product_ids = [item.get('product') for item in cart_items if item.get('product')]
     on_sale_ids = set()
     if product_ids:
-        for product in Product.objects.filter(id__in=product_ids):
-            if product.is_on_sale:
-                on_sale_ids.add(str(product.id))
+        on_sale = Product.objects.filter(id__in=product_ids).on_sale().values_list('id', flat=True)
+        on_sale_ids = {str(pk) for pk in on_sale}
 
     def _is_discounted(item):
         pid = item.get('product')
@@ -191,7 +190,7 @@ def coupon_usage_stats(request, pk):
     except Coupon.DoesNotExist:
         return Response({'error': 'الكوبون غير موجود'}, status=status.HTTP_404_NOT_FOUND)
 
-    usages = CouponUsage.objects.filter(coupon=coupon)
+    usages = CouponUsage.objects.filter(coupon=coupon).select_related('coupon', 'user')
     serializer = CouponUsageSerializer(usages, many=True)
 
     # حساب إجمالي الخصم
@@ -211,6 +210,6 @@ def all_coupon_usages(request):
     """
     الحصول على قائمة جميع استخدامات الكوبونات (للمديرين)
     """
-    usages = CouponUsage.objects.all()
+    usages = CouponUsage.objects.select_related('coupon', 'user')
     serializer = CouponUsageSerializer(usages, many=True)
     return Response(serializer.data)
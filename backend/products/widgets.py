@@ -74,14 +74,26 @@ class ImgBBUploadWidget(forms.TextInput):
             }};
             const csrftoken = getCookie('csrftoken');
             
-            fetch('/api/products/upload-image/', {{
+            // التخزين بعنوان المحتوى: نحسب البصمة هنا ونسأل أولاً، فالصورة المخزَّنة
+            // من قبل لا تُرفع مرة ثانية (crypto.subtle متاح على HTTPS و localhost فقط)
+            const findExisting = () => {{
+                if (!(window.crypto && crypto.subtle)) return Promise.resolve(null);
+                return file.arrayBuffer()
+                    .then(buffer => crypto.subtle.digest('SHA-256', buffer))
+                    .then(digest => Array.from(new Uint8Array(digest)).map(b => b.toString(16).padStart(2, '0')).join(''))
+                    .then(sha => fetch('/api/products/upload-image/?sha256=' + sha, {{credentials: 'same-origin'}}))
+                    .then(response => response.ok ? response.json() : null)
+                    .catch(() => null);
+            }};
+
+            findExisting()
+            .then(existing => existing || fetch('/api/products/upload-image/', {{
                 method: 'POST',
                 body: formData,
                 headers: {{
                     'X-CSRFToken': csrftoken || ''
                 }}
-            }})
-            .then(response => response.json())
+            }}).then(response => response.json()))
             .then(data => {{
                 if (data.url) {{
                     const imageUrl = data.url;
@@ -1,3 +1,2200 @@
-from django.test import TestCase
+"""
+ميزانية الاستعلامات لكل نقاط الـAPI العامة (products / orders / notifications).
 
-# Create your tests here.
+كل اختبار يستدعي نقطة واحدة مرتين: مرة والبيانات بحجم SMALL، ومرة بعد تنميتها
+إلى LARGE (منتجات، أقسام، بنرات، كوبونات، طلبات، إشعارات...). عدد استعلامات SQL
+يجب أن يبقى هو نفسه؛ أي تغيير يضيف استعلاماً لكل صف (N+1) يُفشل الاختبار.
+
+خارج النطاق عمداً: upload-image/ و run-migration-secret-123/ — تكتبان إلى
+التخزين الخارجي وتنزّلان من الشبكة، ولا يتغير عملهما مع حجم الكتالوج.
+"""
+import base64
+import gzip
+import io
+import itertools
+import json
+import tempfile
+from datetime import timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command, CommandError
+from django.db import DatabaseError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.test import APIClient
+
+from notifications.models import DeviceToken, Notification
+from orders.models import Order, OrderItem
+from products.models import (
+    Banner, CatalogDeletion, Category, ImageBlob, ImageBlobReference, ImageMigration, ImageVariantSet, Product,
+    ProductReview, ProductSearchDocument, ProductTrend, ProductView, ProductViewDaily, ProductViewStats,
+)
+from products.models_coupons import Coupon, CouponUsage
+from products import (
+    blobs, image_migration, images, ratings, sale_schedule, snapshots, suggest, sync, tracking, trending, uploads,
+)
+from products import cache as catalog_cache_module
+from products.cache import CATEGORIES, PRODUCTS, SALES, SUGGEST, bump_version
+from products.search import document_fields, normalize_arabic
+from products.counters import rebuild_category_counters
+from products.serializers import CategorySerializer
+from products.tree import load_category_tree, rebuild_category_paths
+
+User = get_user_model()
+
+SMALL = 10
+LARGE = 1000
+
+DUMMY_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests'}}
+# مخزن المشاهدات (products/tracking.py) لا يُكتب أثناء القياس: كتابته تضيف استعلاماً لطلب واحد
+NO_VIEW_FLUSH = {'PRODUCT_VIEW_BUFFER_SIZE': 10 ** 6, 'PRODUCT_VIEW_FLUSH_SECONDS': 10 ** 9}
+# تخزين محلي كما في التطوير، مهما كان DEBUG: الافتراضي في الإنتاج R2 (S3)، والاختبارات تكتب في MEDIA_ROOT مؤقّت
+LOCAL_MEDIA = {
+    'STORAGES': {**settings.STORAGES, 'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'}},
+    'MEDIA_URL': '/media/',
+}
+
+
+def use_shared_cache(test):
+    """ذاكرة ملفات في مجلد مؤقّت — للأوامر الخلفية التي ترفض ذاكرة خاصة بالعملية (locmem)."""
+    directory = tempfile.TemporaryDirectory()
+    test.addCleanup(directory.cleanup)
+    override = override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory.name,
+    }})
+    override.enable()
+    test.addCleanup(override.disable)
+
+
+def isolate_view_buffer(test):
+    """
+    مخزن المشاهدات (products/tracking.py) متغيّر على مستوى الوحدة يعيش طوال العملية: يُفرَّغ
+    قبل الاختبار وبعده، وإلا كتبه اختبار لاحق (أو atexit) بمعرّفات منتجات من اختبار سابق.
+    """
+    tracking._buffer.clear()
+    test.addCleanup(tracking._buffer.clear)
+
+
+# الذاكرة المؤقّتة معطّلة هنا: نقيس كلفة بناء الرد نفسه، لا كلفة الإصابة
+@override_settings(SECURE_SSL_REDIRECT=False, CACHES=DUMMY_CACHE, **NO_VIEW_FLUSH)
+@mock.patch('orders.views.send_telegram_order_notification')
+@mock.patch('orders.views.send_notification_to_topic')
+@mock.patch('orders.views.subscribe_to_topic')
+@mock.patch('notifications.views.send_notification_to_device')
+class QueryBudgetTestCase(TestCase):
+    """
+    Seeds SMALL rows of every catalog/order entity and provides
+    assertConstantQueries(), which seeds up to LARGE rows between two
+    measurements of the same request.
+
+    Size-dependent relations all hang off a handful of fixed objects so that
+    detail endpoints scale too: self.root has the child categories and the
+    products, self.product lists every product as similar, self.order holds
+    an item for every second product, self.coupon has a usage per order, and self.customer
+    owns every notification and device token.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(
+            username='budget-admin', phone='07000000001', password='x', is_staff=True, is_superuser=True,
+        )
+        cls.customer = User.objects.create_user(username='budget-customer', phone='07000000002', password='x')
+        cls.root = Category.objects.create(name='root')
+        cls.product = Product.objects.create(name='anchor', description='d', category=cls.root, price=1000, stock_quantity=50)
+        cls.coupon = Coupon.objects.create(
+            code='BUDGET', discount_type='fixed', discount_value=100,
+            end_date=timezone.now() + timedelta(days=30),
+        )
+        cls.order = cls._order('anchor-order')
+        cls.seed(0, SMALL)
+
+    def setUp(self):
+        isolate_view_buffer(self)
+        self.client = APIClient()
+        self.counter = itertools.count()
+
+    # ---- seeding -----------------------------------------------------------
+
+    @staticmethod
+    def _order(name):
+        return Order.objects.create(
+            customer_name=name, customer_phone='0770', customer_address='Baghdad', governorate='Baghdad',
+            payment_method='cash_on_delivery', subtotal=1000, total=1000,
+        )
+
+    @classmethod
+    def seed(cls, start, stop):
+        """Add rows start..stop-1 to every size-dependent table."""
+        new = range(start, stop)
+        future = timezone.now() + timedelta(days=30)
+
+        Category.objects.bulk_create(
+            Category(name=f'cat-{i}', parent=cls.root if i % 2 else None) for i in new
+        )
+        rebuild_category_paths()
+        products = Product.objects.bulk_create(
+            Product(
+                name=f'item {i}', slug=f'item-{i}', description='d', category=cls.root,
+                price=1000, stock_quantity=5, is_featured=not i % 2,
+                main_image=f'https://media.example.com/{i}.jpg',
+            )
+            for i in new
+        )
+        # bulk_create لا يرسل post_save، فمستندات البحث وعدّادات الأقسام تُبنى هنا كما تبنيها الإشارات
+        ProductSearchDocument.objects.bulk_create(
+            ProductSearchDocument(product=p, **document_fields(p)) for p in products
+        )
+        rebuild_category_counters()
+        Product.similar_products.through.objects.bulk_create(
+            Product.similar_products.through(from_product=cls.product, to_product=p) for p in products
+        )
+        Banner.objects.bulk_create(
+            Banner(title=f'banner {i}', image_url=f'https://media.example.com/b{i}.jpg',
+                   product=p if i % 2 else None)
+            for i, p in zip(new, products)
+        )
+        Coupon.objects.bulk_create(
+            Coupon(code=f'CODE{i}', discount_type='percentage', discount_value=10, end_date=future)
+            for i in new
+        )
+        orders = Order.objects.bulk_create(
+            Order(customer_name=f'customer {i}', customer_phone='0770', customer_address='Baghdad',
+                  governorate='Baghdad', payment_method='cash_on_delivery', subtotal=1000, total=1000)
+            for i in new
+        )
+        # عنصر في كل طلب جديد، وفي self.order عنصر لكل منتج ثانٍ. نصف فقط لأن
+        # prefetch منتجات الطلب بـ IN يتجاوز حد عمق التعبير في SQLite عند 1000 معامل.
+        OrderItem.objects.bulk_create(
+            OrderItem(order=order, product=p, product_name=p.name, price=1000, quantity=1, total_price=1000)
+            for i, p, own_order in zip(new, products, orders)
+            for order in ((own_order, cls.order) if i % 2 else (own_order,))
+        )
+        CouponUsage.objects.bulk_create(
+            CouponUsage(coupon=cls.coupon, order=order, user=cls.customer, discount_amount=100) for order in orders
+        )
+        Notification.objects.bulk_create(
+            Notification(recipient=cls.customer, type='system', title=f'n{i}', message='m') for i in new
+        )
+        DeviceToken.objects.bulk_create(
+            DeviceToken(user=cls.customer, token=f'token-{i}') for i in new
+        )
+
+    def unique(self, prefix):
+        return f'{prefix}{next(self.counter)}'
+
+    # ---- assertions --------------------------------------------------------
+
+    def assertConstantQueries(self, request, user=None, status=200):
+        """
+        `request` is a zero-argument callable issuing one API call through
+        self.client. It runs once to warm up, once at SMALL, and once at LARGE.
+        """
+        self.client.force_authenticate(user=user)
+        self._run(request, status)
+        small = self._run(request, status)
+        self.seed(SMALL, LARGE)
+        large = self._run(request, status)
+        self.assertEqual(
+            len(small), len(large),
+            f'Query count grows with data size ({len(small)} at {SMALL} rows, {len(large)} at {LARGE}):\n'
+            + '\n'.join(q['sql'] for q in large),
+        )
+
+    def _run(self, request, status):
+        with CaptureQueriesContext(connection) as ctx:
+            response = request()
+        self.assertEqual(response.status_code, status, getattr(response, 'data', response.content))
+        return ctx.captured_queries
+
+
+class ProductEndpointQueryTests(QueryBudgetTestCase):
+
+    def test_product_list(self, *mocks):
+        self.assertConstantQueries(lambda: self.client.get('/api/products/'))
+
+    def test_product_list_next_page(self, *mocks):
+        def request():
+            first = self.client.get('/api/products/', {'page_size': 5})
+            return self.client.get(first.json()['next'])
+        self.assertConstantQueries(request)
+
+    def test_product_detail(self, *mocks):
+        self.assertConstantQueries(lambda: self.client.get(f'/api/products/{self.product.pk}/'))
+
+    def test_featured_products(self, *mocks):
+        self.assertConstantQueries(lambda: self.client.get('/api/products/featured/'))
+
+    def test_home(self, *mocks):
+        self.assertConstantQueries(lambda: self.client.get('/api/products/home/'))
+
+    def test_product_batch(self, *mocks):
+        def request():
+            ids = list(Product.objects.values_list('pk', flat=True)[:100])
+            return self.client.post('/api/products/batch/', {'ids': ids}, format='json')
+        self.assertConstantQueries(request)
+
+    @mock.patch('products.sync.SETTLE_DELAY', timedelta(0))
+    def test_catalog_changes(self, *mocks):
+        self.assertConstantQueries(lambda: self.client.get('/api/products/changes/'))
+
+    def test_search_products(self, *mocks):
+        self.assertConstantQueries(lambda: self.client.get('/api/products/search/', {'q': 'item'}))
+
+    def test_filter_products(self, *mocks):
+        self.assertConstantQueries(lambda: self.client.get('/api/products/filter/', {'in_stock': 'true'}))
+
+    def test_search_suggestions(self, *mocks):
+        # DummyCache لا يحفظ إصدار الكتالوج، فكل طلب هنا يعيد بناء الفهرس: نقيس كلفة البناء
+        self.assertConstantQueries(lambda: self.client.get('/api/products/search/suggest/', {'q': 'item'}))
+
+    def test_products_by_category(self, *mocks):
+        self.assertConstantQueries(lambda: self.client.get(f'/api/products/categories/{self.root.pk}/products/'))
+
+    def test_banner_list(self, *mocks):
+        self.assertConstantQueries(lambda: self.client.get('/api/products/banners/'))
+
+    def test_coupon_list(self, *mocks):
+        self.assertConstantQueries(lambda: self.client.get('/api/products/coupons/'))
+
+    def test_validate_coupon(self, *mocks):
+        self.assertConstantQueries(
+            lambda: self.client.post('/api/products/coupons/validate/', {'code': 'BUDGET', 'cart_total': 5000}, format='json')
+        )
+
+    def test_user_coupons(self, *mocks):
+        self.assertConstantQueries(lambda: self.client.get('/api/products/coupons/user/'), user=self.customer)
+
+    def test_apply_coupon_with_whole_catalog_in_cart(self, *mocks):
+        def request():
+            items = [{'product': pk, 'price': 1000, 'quantity': 1}
+                     for pk in Product.objects.values_list('pk', flat=True)]
+            return self.client.post('/api/products/coupons/apply/', {'code': 'BUDGET', 'cart_items': items}, format='json')
+        self.assertConstantQueries(request)
+
+
+class CategoryEndpointQueryTests(QueryBudgetTestCase):
+
+    def test_create_category(self, *mocks):
+        self.assertConstantQueries(
+            lambda: self.client.post('/api/products/categories/', {'name': self.unique('new-')}),
+            user=self.admin, status=201,
+        )
+
+    def test_delete_category(self, *mocks):
+        def request():
+            category = Category.objects.create(name=self.unique('gone-'))
+            return self.client.delete(f'/api/products/categories/{category.pk}/')
+        self.assertConstantQueries(request, user=self.admin, status=204)
+
+    def test_category_list(self, *mocks):
+        self.assertConstantQueries(lambda: self.client.get('/api/products/categories/'))
+
+    def test_category_detail(self, *mocks):
+        self.assertConstantQueries(lambda: self.client.get(f'/api/products/categories/{self.root.pk}/'))
+
+    def test_update_category(self, *mocks):
+        self.assertConstantQueries(
+            lambda: self.client.patch(f'/api/products/categories/{self.root.pk}/', {'description': 'x'}),
+            user=self.admin,
+        )
+
+
+class AdminProductEndpointQueryTests(QueryBudgetTestCase):
+
+    def test_admin_products_list(self, *mocks):
+        self.assertConstantQueries(lambda: self.client.get('/api/products/admin/products/'), user=self.admin)
+
+    def test_admin_create_product(self, *mocks):
+        payload = {'name': 'new', 'description': 'd', 'category': self.root.pk, 'price': '1000'}
+        self.assertConstantQueries(
+            lambda: self.client.post('/api/products/admin/products/', payload, format='json'),
+            user=self.admin, status=201,
+        )
+
+    def test_admin_product_detail(self, *mocks):
+        self.assertConstantQueries(
+            lambda: self.client.get(f'/api/products/admin/products/{self.product.pk}/'), user=self.admin,
+        )
+
+    def test_admin_update_product(self, *mocks):
+        self.assertConstantQueries(
+            lambda: self.client.put(f'/api/products/admin/products/{self.product.pk}/', {'name': 'renamed'}, format='json'),
+            user=self.admin,
+        )
+
+    def test_admin_delete_product(self, *mocks):
+        def request():
+            product = Product.objects.create(name='gone', description='d', category=self.root, price=1)
+            return self.client.delete(f'/api/products/admin/products/{product.pk}/')
+        self.assertConstantQueries(request, user=self.admin, status=204)
+
+    def test_admin_banners_list(self, *mocks):
+        self.assertConstantQueries(lambda: self.client.get('/api/products/admin/banners/'), user=self.admin)
+
+    def test_admin_create_banner(self, *mocks):
+        payload = {'title': 'new', 'image_url': 'https://media.example.com/new.jpg', 'product': self.product.pk}
+        self.assertConstantQueries(
+            lambda: self.client.post('/api/products/admin/banners/', payload, format='json'),
+            user=self.admin, status=201,
+        )
+
+    def test_admin_banner_detail(self, *mocks):
+        banner = Banner.objects.create(title='one', product=self.product)
+        self.assertConstantQueries(lambda: self.client.get(f'/api/products/admin/banners/{banner.pk}/'), user=self.admin)
+
+    def test_admin_update_banner(self, *mocks):
+        banner = Banner.objects.create(title='one', product=self.product)
+        self.assertConstantQueries(
+            lambda: self.client.put(f'/api/products/admin/banners/{banner.pk}/', {'title': 'two'}, format='json'),
+            user=self.admin,
+        )
+
+    def test_admin_delete_banner(self, *mocks):
+        def request():
+            banner = Banner.objects.create(title='gone')
+            return self.client.delete(f'/api/products/admin/banners/{banner.pk}/')
+        self.assertConstantQueries(request, user=self.admin, status=204)
+
+
+class AdminCouponEndpointQueryTests(QueryBudgetTestCase):
+
+    def test_admin_coupons(self, *mocks):
+        self.assertConstantQueries(lambda: self.client.get('/api/products/admin/coupons/'), user=self.admin)
+
+    def test_create_coupon(self, *mocks):
+        def request():
+            return self.client.post('/api/products/admin/coupons/create/', {
+                'code': self.unique('NEW'), 'discount_type': 'fixed', 'discount_value': '100',
+                'start_date': timezone.now().isoformat(),
+                'end_date': (timezone.now() + timedelta(days=1)).isoformat(),
+            }, format='json')
+        self.assertConstantQueries(request, user=self.admin, status=201)
+
+    def test_admin_coupon_detail(self, *mocks):
+        self.assertConstantQueries(
+            lambda: self.client.get(f'/api/products/admin/coupons/{self.coupon.pk}/'), user=self.admin,
+        )
+
+    def test_admin_update_coupon(self, *mocks):
+        payload = {
+            'code': 'BUDGET', 'discount_type': 'fixed', 'discount_value': '150',
+            'start_date': timezone.now().isoformat(),
+            'end_date': (timezone.now() + timedelta(days=1)).isoformat(),
+        }
+        self.assertConstantQueries(
+            lambda: self.client.put(f'/api/products/admin/coupons/{self.coupon.pk}/', payload, format='json'),
+            user=self.admin,
+        )
+
+    def test_admin_delete_coupon(self, *mocks):
+        def request():
+            coupon = Coupon.objects.create(code=self.unique('GONE'), discount_value=1, end_date=timezone.now())
+            return self.client.delete(f'/api/products/admin/coupons/{coupon.pk}/')
+        self.assertConstantQueries(request, user=self.admin, status=204)
+
+    def test_coupon_usage_stats(self, *mocks):
+        self.assertConstantQueries(
+            lambda: self.client.get(f'/api/products/admin/coupons/{self.coupon.pk}/stats/'), user=self.admin,
+        )
+
+    def test_all_coupon_usages(self, *mocks):
+        self.assertConstantQueries(lambda: self.client.get('/api/products/admin/coupons/usages/'), user=self.admin)
+
+
+class OrderEndpointQueryTests(QueryBudgetTestCase):
+
+    def order_payload(self):
+        return {
+            'customer_name': 'c', 'customer_phone': '0770', 'customer_address': 'Baghdad',
+            'governorate': 'Baghdad', 'payment_method': 'cash_on_delivery',
+            'subtotal': '1000', 'total': '1000',
+            'items': [{'product_id': self.product.pk, 'quantity': 1, 'price': '1000', 'total_price': '1000'}],
+        }
+
+    def test_order_list(self, *mocks):
+        self.assertConstantQueries(lambda: self.client.get('/api/orders/'), user=self.admin)
+
+    def test_order_detail(self, *mocks):
+        self.assertConstantQueries(lambda: self.client.get(f'/api/orders/{self.order.pk}/'), user=self.admin)
+
+    def test_create_order(self, *mocks):
+        self.assertConstantQueries(
+            lambda: self.client.post('/api/orders/', self.order_payload(), format='json'), status=201,
+        )
+
+    def test_create_order_action(self, *mocks):
+        self.assertConstantQueries(
+            lambda: self.client.post('/api/orders/create/', self.order_payload(), format='json'), status=201,
+        )
+
+    def test_update_order_status(self, *mocks):
+        self.assertConstantQueries(
+            lambda: self.client.patch(f'/api/orders/{self.order.pk}/', {'status': 'confirmed'}, format='json'),
+            user=self.admin,
+        )
+
+    def test_delete_order(self, *mocks):
+        def request():
+            order = self._order('gone')
+            return self.client.delete(f'/api/orders/{order.pk}/')
+        self.assertConstantQueries(request, user=self.admin, status=204)
+
+    def test_register_admin_token(self, *mocks):
+        self.assertConstantQueries(
+            lambda: self.client.post('/api/orders/register_admin_token/', {'token': 't'}, format='json'),
+        )
+
+
+class NotificationEndpointQueryTests(QueryBudgetTestCase):
+
+    def test_notification_list(self, *mocks):
+        self.assertConstantQueries(
+            lambda: self.client.get('/api/notifications/notifications/'), user=self.customer,
+        )
+
+    def test_admin_notification_list(self, *mocks):
+        self.assertConstantQueries(
+            lambda: self.client.get('/api/notifications/notifications/', {'all': 'true'}), user=self.admin,
+        )
+
+    def test_notification_detail(self, *mocks):
+        notification = Notification.objects.filter(recipient=self.customer).first()
+        self.assertConstantQueries(
+            lambda: self.client.get(f'/api/notifications/notifications/{notification.pk}/'), user=self.customer,
+        )
+
+    def test_mark_as_read(self, *mocks):
+        notification = Notification.objects.filter(recipient=self.customer).first()
+        self.assertConstantQueries(
+            lambda: self.client.post(f'/api/notifications/notifications/{notification.pk}/mark_as_read/'),
+            user=self.customer,
+        )
+
+    def test_mark_all_as_read(self, *mocks):
+        self.assertConstantQueries(
+            lambda: self.client.post('/api/notifications/notifications/mark_all_as_read/'), user=self.customer,
+        )
+
+    def test_unread_count(self, *mocks):
+        self.assertConstantQueries(
+            lambda: self.client.get('/api/notifications/notifications/unread_count/'), user=self.customer,
+        )
+
+    def test_delete_notification(self, *mocks):
+        def request():
+            notification = Notification.objects.create(recipient=self.customer, title='gone', message='m')
+            return self.client.delete(f'/api/notifications/notifications/{notification.pk}/')
+        self.assertConstantQueries(request, user=self.customer, status=204)
+
+    def test_device_token_list(self, *mocks):
+        self.assertConstantQueries(
+            lambda: self.client.get('/api/notifications/device-tokens/'), user=self.customer,
+        )
+
+    def test_create_device_token(self, *mocks):
+        self.assertConstantQueries(
+            lambda: self.client.post('/api/notifications/device-tokens/', {'token': self.unique('new-')}),
+            user=self.customer, status=201,
+        )
+
+    def test_register_device_token(self, *mocks):
+        self.assertConstantQueries(
+            lambda: self.client.post('/api/notifications/device-tokens/register/', {'token': 'token-1'}),
+            user=self.customer,
+        )
+
+    def test_unregister_device_token(self, *mocks):
+        self.assertConstantQueries(
+            lambda: self.client.post('/api/notifications/device-tokens/unregister/', {'token': 'token-1'}),
+            user=self.customer,
+        )
+
+    def test_device_token_detail(self, *mocks):
+        token = DeviceToken.objects.filter(user=self.customer).first()
+        self.assertConstantQueries(
+            lambda: self.client.get(f'/api/notifications/device-tokens/{token.pk}/'), user=self.customer,
+        )
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, CACHES=DUMMY_CACHE)
+class ProductPaginationTests(TestCase):
+    """products/pagination.py: bounded pages, a total order on ties, and cursors that survive writes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='paged')
+        Product.objects.bulk_create([
+            Product(name=f'p{i}', slug=f'p-{i}', description='d', category=cls.category, price=1, display_order=1)
+            for i in range(6)
+        ])
+        # مفتاح الترتيب متطابق لكل الصفوف: الـid وحده يفصل بينها
+        Product.objects.update(created_at=timezone.now() - timedelta(days=1))
+        cls.ids = sorted(Product.objects.values_list('id', flat=True))
+
+    def page(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        return [p['id'] for p in data['results']], data['next']
+
+    def walk(self, url):
+        ids = []
+        while url:
+            page, url = self.page(url)
+            ids.extend(page)
+        return ids
+
+    def test_equal_sort_keys_are_ordered_by_id(self):
+        self.assertEqual(self.walk('/api/products/?page_size=4'), self.ids)
+        self.assertEqual(self.walk('/api/products/?page_size=1'), self.ids)
+
+    def test_page_size_is_capped(self):
+        Product.objects.bulk_create([
+            Product(name=f'bulk{i}', slug=f'bulk-{i}', description='d', category=self.category, price=1,
+                    display_order=2)
+            for i in range(100)
+        ])
+        page, next_url = self.page('/api/products/?page_size=1000')
+        self.assertEqual(len(page), 100)
+        self.assertIsNotNone(next_url)
+        for size in ('0', '-5', 'abc'):
+            page, _ = self.page(f'/api/products/?page_size={size}')
+            self.assertEqual(len(page), settings.REST_FRAMEWORK['PAGE_SIZE'], size)
+
+    def test_cursor_survives_inserts_updates_and_deletes(self):
+        first, next_url = self.page('/api/products/?page_size=3')
+        self.assertEqual(first, self.ids[:3])
+
+        # قبل المؤشر (display_order أصغر)، بعده، تعديل صف في الصفحة التالية، وحذف آخر صف معروض
+        Product.objects.create(name='before', description='d', category=self.category, price=1, display_order=0)
+        after = Product.objects.create(name='after', description='d', category=self.category, price=1,
+                                       display_order=5)
+        Product.objects.filter(pk=self.ids[3]).update(name='renamed')
+        Product.objects.filter(pk=first[-1]).delete()
+
+        response = self.client.get(next_url).json()
+        self.assertEqual([p['id'] for p in response['results']], self.ids[3:6])
+        self.assertEqual(response['results'][0]['name'], 'renamed')
+        self.assertEqual(self.walk(response['next']), [after.pk])
+
+    def test_invalid_cursor_is_404(self):
+        for cursor in ('garbage', 'WzEsMl0='):
+            self.assertEqual(self.client.get(f'/api/products/?cursor={cursor}').status_code, 404, cursor)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, CACHES=LOCMEM_CACHE)
+class CatalogCacheTests(TestCase):
+    """products/cache.py: a hit skips the view entirely; saving a model invalidates its namespace."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='cached')
+        cls.product = Product.objects.create(name='cached', description='d', category=cls.category, price=1000)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_second_request_is_served_from_cache(self):
+        first = self.client.get('/api/products/')
+        self.assertEqual(first['X-Catalog-Cache'], 'MISS')
+        # الاستعلام الوحيد هو بصمة الـETag (products/conditional.py)
+        with self.assertNumQueries(1):
+            second = self.client.get('/api/products/')
+        self.assertEqual(second['X-Catalog-Cache'], 'HIT')
+        self.assertEqual(first.content, second.content)
+
+    def test_query_string_is_part_of_the_key(self):
+        self.client.get('/api/products/banners/?placement=home')
+        response = self.client.get('/api/products/banners/?placement=offers')
+        self.assertEqual(response['X-Catalog-Cache'], 'MISS')
+
+    def test_saving_a_product_invalidates_product_lists(self):
+        self.client.get('/api/products/')
+        self.product.name = 'renamed'
+        self.product.save()
+        response = self.client.get('/api/products/')
+        self.assertEqual(response['X-Catalog-Cache'], 'MISS')
+        self.assertEqual(response.json()['results'][0]['name'], 'renamed')
+
+    def test_deleting_a_banner_invalidates_only_banner_dependents(self):
+        banner = Banner.objects.create(title='b')
+        self.client.get('/api/products/banners/')
+        self.client.get('/api/products/categories/')
+        banner.delete()
+        self.assertEqual(self.client.get('/api/products/banners/')['X-Catalog-Cache'], 'MISS')
+        self.assertEqual(self.client.get('/api/products/categories/')['X-Catalog-Cache'], 'HIT')
+
+    def test_clear_cache_command_invalidates_one_namespace(self):
+        self.client.get('/api/products/categories/')
+        self.client.get('/api/products/banners/')
+        call_command('clear_cache', 'categories', stdout=io.StringIO())
+        self.assertEqual(self.client.get('/api/products/categories/')['X-Catalog-Cache'], 'MISS')
+        self.assertEqual(self.client.get('/api/products/banners/')['X-Catalog-Cache'], 'HIT')
+
+    def test_home_snapshot_is_stored_compressed(self):
+        self.category.featured_on_homepage = True
+        self.category.save()
+        Banner.objects.create(title='home')
+        first = self.client.get('/api/products/home/', HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual((first['X-Catalog-Cache'], first['Content-Encoding']), ('MISS', 'gzip'))
+        self.assertIn('Accept-Encoding', first['Vary'])
+        with self.assertNumQueries(0):
+            plain = self.client.get('/api/products/home/')
+        self.assertEqual(plain['X-Catalog-Cache'], 'HIT')
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertEqual(gzip.decompress(first.content), plain.content)
+        data = plain.json()
+        self.assertEqual([c['name'] for c in data['categories']], ['cached'])
+        self.assertEqual([b['title'] for b in data['banners']], ['home'])
+        self.assertEqual([p['name'] for p in data['products']], ['cached'])
+        self.assertEqual(data['featured_products'], [])
+
+    def test_sale_boundary_invalidates_price_listings_only(self):
+        start = timezone.now() + timedelta(hours=1)
+        Product.objects.create(name='flash', description='d', category=self.category, price=1000,
+                               discount_amount=100, discount_start=start)
+        self.assertEqual(sale_schedule.advance(), (True, start))
+        self.client.get('/api/products/')
+        self.client.get('/api/products/categories/')
+
+        self.assertEqual(sale_schedule.advance(start - timedelta(seconds=1)), (False, start))
+        self.assertEqual(self.client.get('/api/products/')['X-Catalog-Cache'], 'HIT')
+        self.assertEqual(sale_schedule.advance(start), (True, None))
+        self.assertEqual(self.client.get('/api/products/')['X-Catalog-Cache'], 'MISS')
+        self.assertEqual(self.client.get('/api/products/categories/')['X-Catalog-Cache'], 'HIT')
+
+    def test_sale_start_rebuilds_the_body_with_the_etag(self):
+        self.product.discount_amount = 100
+        self.product.discount_start = timezone.now() + timedelta(hours=1)
+        self.product.save()
+        before = self.client.get('/api/products/')
+        self.assertFalse(before.json()['results'][0]['is_on_sale'])
+
+        # لا أحد يرفع إصدار sales هنا (لا مجدول): البصمة وحدها يجب أن تُسقط الجسم المخزَّن
+        with mock.patch('django.utils.timezone.now', return_value=timezone.now() + timedelta(hours=2)):
+            after = self.client.get('/api/products/', HTTP_IF_NONE_MATCH=before['ETag'])
+        self.assertEqual(after.status_code, 200)
+        self.assertNotEqual(after['ETag'], before['ETag'])
+        self.assertEqual(after['X-Catalog-Cache'], 'MISS')
+        self.assertTrue(after.json()['results'][0]['is_on_sale'])
+
+    def test_version_bump_waits_for_commit(self):
+        self.product.is_featured = True
+        self.product.save()
+        self.client.get('/api/products/featured/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.name = 'renamed'
+            self.product.save()
+            self.assertEqual(self.client.get('/api/products/featured/')['X-Catalog-Cache'], 'HIT')
+        response = self.client.get('/api/products/featured/')
+        self.assertEqual(response['X-Catalog-Cache'], 'MISS')
+        self.assertEqual(response.json()['results'][0]['name'], 'renamed')
+
+    def test_review_bump_waits_for_commit(self):
+        reviewer = User.objects.create_user(username='cache-reviewer', phone='07200000001', password='x')
+        self.product.is_featured = True
+        self.product.save()
+        self.client.get('/api/products/featured/')
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductReview.objects.create(product=self.product, user=reviewer, rating=4, is_approved=True)
+            self.assertEqual(self.client.get('/api/products/featured/')['X-Catalog-Cache'], 'HIT')
+        response = self.client.get('/api/products/featured/')
+        self.assertEqual(response['X-Catalog-Cache'], 'MISS')
+        self.assertEqual(response.json()['results'][0]['rating_count'], 1)
+
+    def test_price_listings_expire_at_the_next_sale_boundary(self):
+        Product.objects.create(name='flash', description='d', category=self.category, price=1000,
+                               discount_amount=100, discount_start=timezone.now() + timedelta(seconds=40))
+        self.assertLessEqual(catalog_cache_module._timeout((PRODUCTS, SALES)), 40)
+        self.assertEqual(catalog_cache_module._timeout((PRODUCTS, CATEGORIES)), settings.CATALOG_CACHE_TIMEOUT)
+
+    def test_run_sale_scheduler_refuses_a_process_local_cache(self):
+        with self.assertRaisesMessage(CommandError, 'shared'):
+            call_command('run_sale_scheduler', '--once', stdout=io.StringIO())
+
+    def test_run_sale_scheduler_once(self):
+        use_shared_cache(self)
+        out = io.StringIO()
+        call_command('run_sale_scheduler', '--once', stdout=out)
+        self.assertIn('invalidated', out.getvalue())
+        out = io.StringIO()
+        call_command('run_sale_scheduler', '--once', stdout=out)
+        self.assertEqual(out.getvalue(), '')
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, CACHES=DUMMY_CACHE, **NO_VIEW_FLUSH)
+class ConditionalGetTests(TestCase):
+    """products/conditional.py: 304 from one aggregate query; any catalog change moves the ETag."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='etag')
+        cls.product = Product.objects.create(name='etag', description='d', category=cls.category, price=1000)
+
+    def setUp(self):
+        isolate_view_buffer(self)
+
+    def test_unchanged_catalog_returns_304_from_one_query(self):
+        for url in ('/api/products/', f'/api/products/{self.product.pk}/', '/api/products/categories/',
+                    '/api/products/banners/', '/api/products/coupons/'):
+            etag = self.client.get(url)['ETag']
+            with self.assertNumQueries(1 if url != '/api/products/categories/' else 2):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304, url)
+
+    def test_detail_pk_beyond_the_id_range_is_404_without_etag(self):
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/products/1000000000000000000000000000000/')
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn('ETag', response)
+        self.assertEqual(self.client.get(f'/api/products/{2 ** 63}/').status_code, 404)
+
+    def test_last_modified_round_trip(self):
+        last_modified = self.client.get('/api/products/')['Last-Modified']
+        response = self.client.get('/api/products/', HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_changes_on_update_and_delete(self):
+        etag = self.client.get('/api/products/')['ETag']
+        other = Product.objects.create(name='other', description='d', category=self.category, price=5)
+        self.assertEqual(self.client.get('/api/products/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        etag = self.client.get('/api/products/')['ETag']
+        other.delete()
+        self.assertEqual(self.client.get('/api/products/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_etag_changes_when_a_sale_starts(self):
+        self.product.discount_amount = 100
+        self.product.discount_start = timezone.now() + timedelta(hours=1)
+        self.product.save()
+        etag = self.client.get('/api/products/')['ETag']
+        with mock.patch('django.utils.timezone.now', return_value=timezone.now() + timedelta(hours=2)):
+            response = self.client.get('/api/products/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['results'][0]['is_on_sale'])
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, CACHES=DUMMY_CACHE)
+class ProductSearchTests(TestCase):
+    """products/search.py: Arabic-normalized full-text search, ranked, over active products only."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='search')
+        cls.shoes = Product.objects.create(
+            name='أَحْذِيَة رياضية', description='مريحة للجري', category=cls.category, price=1000, stock_quantity=5,
+        )
+        cls.described = Product.objects.create(
+            name='جوارب', description='تُلبس مع الأحذية الرياضية', category=cls.category, price=500,
+        )
+        cls.branded = Product.objects.create(
+            name='Runner X', description='d', brand='Nike', tags='حذاء,جري', category=cls.category, price=900,
+        )
+
+    def search(self, query, **params):
+        response = self.client.get('/api/products/search/', {'q': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def names(self, query):
+        return [p['name'] for p in self.search(query)['results']]
+
+    def test_normalize_arabic(self):
+        self.assertEqual(normalize_arabic('أَحْذِيَة  إسـتـيراد'), 'احذيه استيراد')
+        self.assertEqual(normalize_arabic('مستشفى مسؤول'), 'مستشفي مسوول')
+
+    def test_matches_regardless_of_diacritics_hamza_and_taa_marbuta(self):
+        for query in ('احذيه', 'أحذية', 'الأحذية', 'أَحْذِيَة'):
+            self.assertIn(self.shoes.name, self.names(query), query)
+        self.assertEqual(self.names('احذيه رياضيه'), [self.shoes.name, self.described.name])
+
+    def test_name_matches_rank_above_description_matches(self):
+        self.assertEqual(self.names('رياضية'), [self.shoes.name, self.described.name])
+
+    def test_brand_tags_and_prefix_match(self):
+        self.assertEqual(self.names('nike'), ['Runner X'])
+        self.assertEqual(self.names('حذاء'), ['Runner X'])
+        self.assertEqual(self.names('جوا'), ['جوارب'])
+
+    def test_inactive_products_leave_the_index(self):
+        self.shoes.is_active = False
+        self.shoes.save()
+        self.assertEqual(self.names('رياضية'), [self.described.name])
+        self.shoes.is_active = True
+        self.shoes.save()
+        self.assertEqual(self.names('رياضية'), [self.shoes.name, self.described.name])
+
+    def test_stock_updates_do_not_rewrite_the_document(self):
+        with self.assertNumQueries(1):
+            self.shoes.reduce_stock(1)
+
+    def test_results_are_paginated_by_cursor(self):
+        first = self.search('رياضية', page_size=1)
+        self.assertEqual([p['name'] for p in first['results']], [self.shoes.name])
+        second = self.client.get(first['next']).json()
+        self.assertEqual([p['name'] for p in second['results']], [self.described.name])
+        self.assertIsNone(second['next'])
+
+    def test_empty_query_lists_all_active_products(self):
+        self.assertEqual(len(self.search('')['results']), 3)
+
+    def test_rebuild_search_index_command(self):
+        Product.objects.filter(pk=self.branded.pk).update(name='Sprinter')
+        self.assertEqual(self.names('sprinter'), [])
+        call_command('rebuild_search_index', stdout=io.StringIO())
+        self.assertEqual(self.names('sprinter'), ['Sprinter'])
+        self.assertEqual(self.names('رياضية'), [self.shoes.name, self.described.name])
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, CACHES=LOCMEM_CACHE)
+class SearchSuggestionTests(TestCase):
+    """products/suggest.py: prefix suggestions from memory, kept current by signals."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='أحذية')
+        cls.shoes = Product.objects.create(
+            name='حذاء رياضي', description='d', brand='Nike', category=cls.category, price=1000,
+            stock_quantity=5, main_image='https://media.example.com/shoes.jpg',
+        )
+        cls.sandals = Product.objects.create(
+            name='صندل صيفي', description='d', category=cls.category, price=500, display_order=1,
+        )
+
+    def setUp(self):
+        cache.clear()
+        suggest.reset_index()
+
+    def suggestions(self, query, **params):
+        response = self.client.get('/api/products/search/suggest/', {'q': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return [(s['type'], s['name']) for s in response.json()['results']]
+
+    def test_warm_index_answers_without_queries(self):
+        self.suggestions('حذ')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.suggestions('حذ'), [('product', 'حذاء رياضي')])
+
+    def test_payload_and_normalized_prefixes(self):
+        response = self.client.get('/api/products/search/suggest/', {'q': 'nik'})
+        self.assertEqual(response.json()['results'], [{
+            'type': 'product', 'id': self.shoes.pk, 'name': 'حذاء رياضي',
+            'thumbnail': 'https://media.example.com/shoes.jpg',
+        }])
+        # "الأحذية" → "احذيه": القسم يظهر قبل المنتجات
+        self.assertEqual(self.suggestions('الأحذ'), [('category', 'أحذية')])
+        self.assertEqual(self.suggestions('حذاء ري'), [('product', 'حذاء رياضي')])
+        self.assertEqual(self.suggestions('حذاء صي'), [])
+        self.assertEqual(self.suggestions(''), [])
+
+    def test_limit(self):
+        self.assertEqual(len(self.suggestions('ص', limit=1)), 1)
+
+    def test_saves_and_deletes_update_the_index_incrementally(self):
+        self.suggestions('حذ')
+        with self.captureOnCommitCallbacks(execute=True):
+            boots = Product.objects.create(name='حذاء شتوي', description='d', category=self.category, price=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sandals.name = 'حذاء صيفي'
+            self.sandals.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.shoes.delete()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.suggestions('حذ'), [('product', 'حذاء شتوي'), ('product', 'حذاء صيفي')])
+        with self.captureOnCommitCallbacks(execute=True):
+            boots.is_active = False
+            boots.save()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.suggestions('حذ'), [('product', 'حذاء صيفي')])
+
+    def test_stock_updates_do_not_force_a_rebuild(self):
+        self.suggestions('حذ')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.shoes.reduce_stock(1)
+        with self.assertNumQueries(0):
+            self.suggestions('حذ')
+
+    def test_catalog_changes_outside_the_index_do_not_force_a_rebuild(self):
+        self.suggestions('حذ')
+        user = User.objects.create_user(username='suggest-reviewer', phone='07100000099', password='x')
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductReview.objects.create(product=self.shoes, user=user, rating=5, is_approved=True)
+            self.shoes.price = 900
+            self.shoes.save()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.suggestions('حذ'), [('product', 'حذاء رياضي')])
+
+    def test_changes_from_another_process_trigger_a_rebuild(self):
+        self.suggestions('حذ')
+        Product.objects.filter(pk=self.sandals.pk).update(name='حذاء صيفي')
+        bump_version(SUGGEST)
+        with self.assertNumQueries(2):
+            self.assertEqual(self.suggestions('حذ'), [('product', 'حذاء رياضي'), ('product', 'حذاء صيفي')])
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, CACHES=DUMMY_CACHE)
+class FacetFilterTests(TestCase):
+    """products/filters.py: facet filters on the effective price, disjunctive counts from one small grouped query per facet."""
+
+    @classmethod
+    def setUpTestData(cls):
+        shoes = Category.objects.create(name='shoes')
+        bags = Category.objects.create(name='bags')
+
+        def product(name, category=shoes, **fields):
+            return Product.objects.create(name=name, description='d', category=category, **fields)
+
+        cls.runner = product('runner', brand='Nike', color='red', size='42', price=20000, stock_quantity=5)
+        cls.sale = product('sale', brand='Nike', color='blue', size='43', price=60000, discount_amount=20000)
+        cls.cheap = product('cheap', brand='Adidas', color='red', size='42', price=8000, stock_quantity=3)
+        cls.bag = product('bag', category=bags, brand='Adidas', color='black', price=150000, stock_quantity=1)
+        product('hidden', brand='Nike', price=1, is_active=False)
+        cls.shoes = shoes
+
+    def filter(self, **params):
+        response = self.client.get('/api/products/filter/', params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def names(self, **params):
+        return sorted(p['name'] for p in self.filter(**params)['results'])
+
+    @staticmethod
+    def counts(facet):
+        return {entry['value']: entry['count'] for entry in facet}
+
+    def test_value_facets_filter_and_count_disjunctively(self):
+        data = self.filter(brand='Nike')
+        self.assertEqual(sorted(p['name'] for p in data['results']), ['runner', 'sale'])
+        # عدّادات العلامة تتجاهل فلتر العلامة نفسه؛ بقية الخصائص تُحسب على منتجات Nike فقط
+        self.assertEqual(self.counts(data['facets']['brand']), {'Nike': 2, 'Adidas': 2})
+        self.assertEqual(self.counts(data['facets']['color']), {'red': 1, 'blue': 1})
+        self.assertEqual(self.names(brand='Nike,Adidas', color='red'), ['cheap', 'runner'])
+        # مع خاصيتين: عدّادات كل منهما مفلترة بالأخرى
+        facets = self.filter(brand='Nike', color='red')['facets']
+        self.assertEqual(self.counts(facets['brand']), {'Nike': 1, 'Adidas': 1})
+        self.assertEqual(self.counts(facets['color']), {'red': 1, 'blue': 1})
+        self.assertEqual(self.counts(facets['size']), {'42': 1})
+        self.assertEqual(self.names(size='42', brand='Adidas'), ['cheap'])
+
+    def test_price_range_uses_the_discounted_price(self):
+        self.assertEqual(self.names(min_price=30000, max_price=50000), ['sale'])
+        data = self.filter(max_price=10000)
+        self.assertEqual([bucket['count'] for bucket in data['facets']['price']], [1, 1, 1, 0, 1])
+        self.assertEqual(self.counts(data['facets']['brand']), {'Adidas': 1})
+
+    def test_on_sale_in_stock_and_category(self):
+        self.assertEqual(self.names(on_sale='true'), ['sale'])
+        self.assertEqual(self.names(in_stock='false'), ['sale'])
+        self.assertEqual(self.names(category=self.shoes.pk, brand='Adidas'), ['cheap'])
+        self.assertEqual(self.names(category=0), [])
+        facets = self.filter(category=self.shoes.pk)['facets']
+        self.assertEqual(self.counts(facets['on_sale']), {True: 1, False: 2})
+        self.assertEqual(self.counts(facets['in_stock']), {True: 2, False: 1})
+
+    def test_each_facet_groups_by_its_own_column_on_the_first_page_only(self):
+        with CaptureQueriesContext(connection) as ctx:
+            first = self.filter(page_size=1, brand='Nike')
+        grouped = [q for q in ctx.captured_queries if 'GROUP BY' in q['sql']]
+        # brand, color, size, on_sale, in_stock, price: استعلام صغير لكل خاصية على عمودها
+        self.assertEqual(len(grouped), 6)
+        self.assertIn('facets', first)
+        second = self.client.get(first['next']).json()
+        self.assertNotIn('facets', second)
+        self.assertEqual(len(second['results']), 1)
+
+    def test_category_covers_its_subtree_like_the_category_listing(self):
+        trail = Category.objects.create(name='trail', parent=self.shoes)
+        Product.objects.create(name='trail', description='d', category=trail, brand='Adidas', price=30000)
+        self.assertEqual(self.names(category=self.shoes.pk, brand='Adidas'), ['cheap', 'trail'])
+        self.assertEqual(self.names(category=trail.pk), ['trail'])
+        listing = self.client.get(f'/api/products/categories/{self.shoes.pk}/products/').json()
+        self.assertEqual(sorted(p['name'] for p in listing['results']), self.names(category=self.shoes.pk))
+        facets = self.filter(category=self.shoes.pk)['facets']
+        self.assertEqual(self.counts(facets['brand']), {'Nike': 2, 'Adidas': 2})
+
+    def test_invalid_price_is_rejected(self):
+        response = self.client.get('/api/products/filter/', {'min_price': 'cheap'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('min_price', response.json())
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, CACHES=DUMMY_CACHE)
+class CategoryTreeTests(TestCase):
+    """Category.path + products/tree.py: the whole tree from one query, kept correct when categories move."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username='tree-admin', phone='07000000009', password='x', is_staff=True)
+        cls.clothes = Category.objects.create(name='clothes')
+        cls.men = Category.objects.create(name='men', parent=cls.clothes, display_order=1)
+        cls.women = Category.objects.create(name='women', parent=cls.clothes, display_order=0)
+        cls.shirts = Category.objects.create(name='shirts', parent=cls.men)
+        Category.objects.create(name='archived', parent=cls.clothes, is_active=False)
+        for name in ('a', 'b'):
+            Product.objects.create(name=name, description='d', category=cls.shirts, price=1)
+        Product.objects.create(name='off', description='d', category=cls.shirts, price=1, is_active=False)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+
+    def test_paths_and_depths(self):
+        self.assertEqual(self.shirts.path, f'{self.clothes.pk}/{self.men.pk}/{self.shirts.pk}/')
+        self.assertEqual(self.shirts.depth, 2)
+        self.assertEqual(set(self.men.get_descendants()), {self.shirts})
+
+    def test_tree_is_assembled_from_one_query(self):
+        with self.assertNumQueries(1):
+            [root] = load_category_tree()
+            data = CategorySerializer(root).data
+        self.assertEqual([child['name'] for child in data['children']], ['archived', 'women', 'men'])
+        self.assertEqual(data['children_count'], 2)
+        men = data['children'][2]
+        self.assertEqual(men['children'][0]['name'], 'shirts')
+        self.assertEqual(men['children'][0]['products_count'], 2)
+
+    def test_moving_a_category_moves_its_subtree(self):
+        response = self.client.patch(f'/api/products/categories/{self.men.pk}/', {'parent': self.women.pk})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.shirts.refresh_from_db()
+        self.assertEqual(self.shirts.path, f'{self.clothes.pk}/{self.women.pk}/{self.men.pk}/{self.shirts.pk}/')
+        self.assertEqual(self.shirts.depth, 3)
+        self.assertEqual(response.json()['children'][0]['name'], 'shirts')
+
+    def test_category_cannot_move_under_its_own_subtree(self):
+        response = self.client.patch(f'/api/products/categories/{self.clothes.pk}/', {'parent': self.shirts.pk})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('parent', response.json())
+
+    def test_products_by_category_covers_the_subtree(self):
+        url = f'/api/products/categories/{self.clothes.pk}/products/'
+        # القسم + صفحة المنتجات (الشجرة الفرعية استعلام فرعي داخلها)
+        with self.assertNumQueries(2):
+            first = self.client.get(url, {'page_size': 1}).json()
+        second = self.client.get(first['next']).json()
+        self.assertEqual(sorted(p['name'] for p in first['results'] + second['results']), ['a', 'b'])
+        self.assertIsNone(second['next'])
+        self.assertEqual(self.client.get(url, {'descendants': 'false'}).json()['results'], [])
+        women = self.client.get(f'/api/products/categories/{self.women.pk}/products/').json()
+        self.assertEqual(women['results'], [])
+
+    def counts(self, category):
+        category.refresh_from_db()
+        return category.products_count, category.total_products_count, category.children_count
+
+    def test_counters_roll_up_through_ancestors(self):
+        self.assertEqual(self.counts(self.shirts), (2, 2, 0))
+        self.assertEqual(self.counts(self.men), (0, 2, 1))
+        self.assertEqual(self.counts(self.clothes), (0, 2, 2))
+
+        product = Product.objects.create(name='c', description='d', category=self.women, price=1)
+        self.assertEqual(self.counts(self.clothes), (0, 3, 2))
+        product.category = self.shirts
+        product.save()
+        self.assertEqual(self.counts(self.women), (0, 0, 0))
+        self.assertEqual(self.counts(self.men), (0, 3, 1))
+        product.is_active = False
+        product.save()
+        self.assertEqual(self.counts(self.shirts), (2, 2, 0))
+        Product.objects.get(name='a').delete()
+        self.assertEqual(self.counts(self.clothes), (0, 1, 2))
+
+    def test_counters_follow_moved_and_deactivated_categories(self):
+        self.men.parent = self.women
+        self.men.save()
+        self.assertEqual(self.counts(self.women), (0, 2, 1))
+        self.assertEqual(self.counts(self.clothes), (0, 2, 1))
+        self.women.is_active = False
+        self.women.save()
+        self.assertEqual(self.counts(self.clothes), (0, 2, 0))
+        self.men.delete()
+        self.assertEqual(self.counts(self.women), (0, 0, 0))
+        self.assertEqual(self.counts(self.clothes), (0, 0, 0))
+
+    def test_a_failed_counter_update_rolls_back_the_save(self):
+        product = Product.objects.get(name='a')
+        with mock.patch('products.counters._add_products', side_effect=DatabaseError('boom')):
+            with self.assertRaises(DatabaseError):
+                Product.objects.create(name='c', description='d', category=self.women, price=1)
+            product.category = self.women
+            with self.assertRaises(DatabaseError):
+                product.save()
+        with mock.patch('products.counters._add_children', side_effect=DatabaseError('boom')):
+            with self.assertRaises(DatabaseError):
+                Category.objects.create(name='socks', parent=self.men)
+        # الصف والعدّادات في معاملة واحدة: لا صف بلا عدّاده ولا نقل بلا تحديث الأسلاف
+        self.assertFalse(Product.objects.filter(name='c').exists())
+        self.assertFalse(Category.objects.filter(name='socks').exists())
+        self.assertEqual(Product.objects.get(name='a').category_id, self.shirts.pk)
+        self.assertEqual(self.counts(self.shirts), (2, 2, 0))
+        self.assertEqual(self.counts(self.men), (0, 2, 1))
+
+    def test_full_save_keeps_deferred_fields_and_counters(self):
+        shirts = Category.objects.only('name', 'parent', 'is_active', 'path').get(pk=self.shirts.pk)
+        shirts.name = 'tees'
+        shirts.save()
+        self.assertIn('description', shirts.get_deferred_fields())
+        self.assertEqual(self.counts(self.shirts), (2, 2, 0))
+        self.assertEqual(self.shirts.name, 'tees')
+
+    def test_full_save_reinserts_a_category_deleted_meanwhile(self):
+        archived = Category.objects.get(name='archived')
+        Category.objects.filter(pk=archived.pk).delete()
+        archived.save()
+        self.assertTrue(Category.objects.filter(pk=archived.pk, name='archived').exists())
+
+    def test_stock_updates_do_not_touch_counters(self):
+        product = Product.objects.get(name='a')
+        product.stock_quantity = 5
+        product.save(update_fields=['stock_quantity'])
+        with self.assertNumQueries(1):
+            product.reduce_stock(1)
+
+    def test_rebuild_category_counters_command(self):
+        Category.objects.update(products_count=9, total_products_count=9, children_count=9)
+        call_command('rebuild_category_counters', '--chunk-size', '2', stdout=io.StringIO())
+        self.assertEqual(self.counts(self.clothes), (0, 2, 2))
+        self.assertEqual(self.counts(self.shirts), (2, 2, 0))
+
+    def test_rebuild_category_paths_fixes_bulk_created_rows(self):
+        [orphan] = Category.objects.bulk_create([Category(name='bulk', parent=self.shirts)])
+        self.assertEqual(rebuild_category_paths(), 1)
+        orphan.refresh_from_db()
+        self.assertEqual(orphan.path, f'{self.shirts.path}{orphan.pk}/')
+
+
+class ProductPricingTests(TestCase):
+    """Product.objects.with_pricing()/on_sale(): the sale properties as SQL, matching the Python versions."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='pricing')
+        now = timezone.now()
+
+        def product(name, **fields):
+            return Product.objects.create(name=name, description='d', category=category, price=30000, **fields)
+
+        product('plain')
+        product('amount', discount_amount=7500)
+        product('third', discount_price=20000)
+        product('ending', discount_amount=1000, discount_end=now + timedelta(hours=1))
+        product('upcoming', discount_amount=1000, discount_start=now + timedelta(days=1))
+        product('expired', discount_price=10000, discount_end=now - timedelta(days=1))
+
+    def test_annotations_match_the_python_properties(self):
+        annotated = {p.name: p for p in Product.objects.with_pricing()}
+        for plain in Product.objects.all():
+            with self.subTest(plain.name):
+                product = annotated[plain.name]
+                self.assertIn('sale_active', product.__dict__)
+                self.assertEqual(product.is_on_sale, plain.is_on_sale)
+                self.assertEqual(product.discounted_price, plain.discounted_price)
+                self.assertEqual(product.discount_percentage, plain.discount_percentage)
+                self.assertAlmostEqual(product.time_left, plain.time_left, delta=2)
+        self.assertEqual(annotated['third'].discount_percentage, 33)
+        self.assertGreater(annotated['ending'].time_left, 3500)
+
+    def test_on_sale_filter(self):
+        names = sorted(Product.objects.on_sale().values_list('name', flat=True))
+        self.assertEqual(names, ['amount', 'ending', 'third'])
+
+    def test_saving_drops_stale_annotations(self):
+        product = Product.objects.with_pricing().get(name='plain')
+        product.discount_amount = 3000
+        product.save()
+        self.assertTrue(product.is_on_sale)
+        self.assertEqual(product.discounted_price, 27000)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, CACHES=DUMMY_CACHE, **NO_VIEW_FLUSH)
+class SparseFieldsTests(TestCase):
+    """?fields= / ?expand= on product serializers: unrequested fields are neither computed nor queried."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username='fields-admin', phone='07000000010', password='x', is_staff=True)
+        cls.category = Category.objects.create(name='sparse')
+        cls.product = Product.objects.create(name='main', description='d', category=cls.category, price=1000)
+        cls.other = Product.objects.create(name='other', description='d', category=cls.category, price=2000)
+        cls.product.similar_products.add(cls.other)
+
+    def setUp(self):
+        isolate_view_buffer(self)
+
+    def get(self, url, **params):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json(), [query['sql'] for query in ctx.captured_queries]
+
+    @staticmethod
+    def similar_queries(queries):
+        # بصمة الـETag التجميعية (COUNT) تشمل المنتجات المشابهة دائماً؛ المقصود جلبها للتسلسل
+        return [sql for sql in queries if 'products_product_similar_products' in sql and 'COUNT(' not in sql]
+
+    def test_detail_fields_skip_similar_products(self):
+        url = f'/api/products/{self.product.pk}/'
+        full, full_queries = self.get(url)
+        self.assertEqual([p['name'] for p in full['similar_products']], ['other'])
+        self.assertTrue(self.similar_queries(full_queries))
+        sparse, sparse_queries = self.get(url, fields='id,name,price')
+        self.assertEqual(set(sparse), {'id', 'name', 'price'})
+        self.assertEqual(self.similar_queries(sparse_queries), [])
+        expanded, _ = self.get(url, fields='id', expand='similar_products')
+        self.assertEqual(set(expanded), {'id', 'similar_products'})
+        # صفحة المنتج توسّعها دائماً، فيبقى رد التفاصيل كما كان
+        self.assertEqual(expanded['similar_products'], full['similar_products'])
+
+    def test_expand_turns_similar_product_ids_into_cards_on_lists(self):
+        self.client.force_login(self.admin)
+        url = '/api/products/admin/products/'
+        rows, id_queries = self.get(url, fields='id,similar_products')
+        self.assertIn({'id': self.product.pk, 'similar_products': [self.other.pk]}, rows)
+        self.assertFalse([sql for sql in self.similar_queries(id_queries) if 'products_category' in sql])
+        rows, card_queries = self.get(url, fields='id', expand='similar_products')
+        [main] = [row for row in rows if row['id'] == self.product.pk]
+        self.assertEqual(main.keys(), {'id', 'similar_products'})
+        self.assertEqual([(p['id'], p['name']) for p in main['similar_products']], [(self.other.pk, 'other')])
+        self.assertEqual(len(self.similar_queries(card_queries)), len(self.similar_queries(id_queries)))
+
+    def test_expand_category(self):
+        data, _ = self.get(f'/api/products/{self.product.pk}/', fields='id', expand='category')
+        self.assertEqual(data['category'], {'id': self.category.pk, 'name': 'sparse', 'parent': None, 'image_url': None})
+        cards, queries = self.get('/api/products/', fields='name,category', expand='category')
+        self.assertIn({'name': 'main', 'category': data['category']}, cards['results'])
+        self.assertEqual(len(self.get('/api/products/')[1]), len(queries))
+
+    def test_admin_grid_without_similar_products_skips_the_prefetch(self):
+        self.client.force_login(self.admin)
+        _, full_queries = self.get('/api/products/admin/products/')
+        self.assertTrue(self.similar_queries(full_queries))
+        rows, sparse_queries = self.get('/api/products/admin/products/', fields='id,name,stock')
+        self.assertEqual(rows[0].keys(), {'id', 'name', 'stock'})
+        self.assertEqual(self.similar_queries(sparse_queries), [])
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, CACHES=DUMMY_CACHE, PRODUCT_BATCH_MAX_SIZE=4)
+class ProductBatchTests(TestCase):
+    """batch/: several products from one id__in query, in request order, with missing/inactive ids reported."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='batch')
+        cls.a = Product.objects.create(name='a', description='d', category=category, price=1000)
+        cls.b = Product.objects.create(name='b', description='d', category=category, price=2000)
+        cls.off = Product.objects.create(name='off', description='d', category=category, price=1, is_active=False)
+
+    def test_get_keeps_request_order_and_reports_missing_and_inactive(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/products/batch/', {'ids': f'{self.b.pk},999,{self.off.pk},{self.a.pk}'})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([p['name'] for p in data['results']], ['b', 'a'])
+        self.assertEqual((data['missing'], data['inactive']), ([999], [self.off.pk]))
+
+    def test_post_with_sparse_fields(self):
+        response = self.client.post('/api/products/batch/?fields=id,price', {'ids': [self.a.pk, self.a.pk]},
+                                    content_type='application/json')
+        self.assertEqual(response.json()['results'], [{'id': self.a.pk, 'price': '1000.00'}])
+
+    def test_invalid_and_oversized_lists_are_rejected(self):
+        self.assertEqual(self.client.get('/api/products/batch/', {'ids': '1,x'}).status_code, 400)
+        # خارج مدى BigAutoField أو غير موجب: 400 لا OverflowError
+        for ids in (str(2 ** 63), str(-1), '0', '99999999999999999999999'):
+            self.assertEqual(self.client.get('/api/products/batch/', {'ids': f'1,{ids}'}).status_code, 400, ids)
+        for ids in ([2 ** 64], [True], [1.5]):
+            response = self.client.post('/api/products/batch/', {'ids': ids}, content_type='application/json')
+            self.assertEqual(response.status_code, 400, ids)
+        response = self.client.post('/api/products/batch/', {'ids': [1, 2, 3, 4, 5]}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, CACHES=DUMMY_CACHE)
+@mock.patch.object(sync, 'SETTLE_DELAY', timedelta(0))
+class CatalogSyncTests(TestCase):
+    """changes/: keyset upserts by updated_at plus tombstones from post_delete, resumable by cursor."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='sync')
+        cls.other = Category.objects.create(name='sync-other')
+        cls.product = Product.objects.create(name='kept', description='d', category=cls.category, price=1000)
+        cls.doomed = Product.objects.create(name='doomed', description='d', category=cls.other, price=1000)
+        cls.banner = Banner.objects.create(title='b')
+
+    def changes(self, **params):
+        response = self.client.get('/api/products/changes/', params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_full_sync_then_only_deltas(self):
+        full = self.changes()
+        self.assertEqual(sorted(p['name'] for p in full['products']), ['doomed', 'kept'])
+        self.assertEqual(len(full['categories']), 2)
+        self.assertNotIn('children', full['categories'][0])
+        self.assertFalse(full['has_more'])
+
+        quiet = self.changes(cursor=full['cursor'])
+        self.assertEqual((quiet['products'], quiet['categories'], quiet['banners']), ([], [], []))
+
+        self.product.name = 'renamed'
+        self.product.save()
+        deleted = {'products': [self.doomed.pk], 'categories': [self.other.pk], 'banners': [self.banner.pk]}
+        self.other.delete()
+        self.banner.delete()
+        delta = self.changes(cursor=quiet['cursor'])
+        self.assertEqual([p['name'] for p in delta['products']], ['renamed'])
+        self.assertEqual(delta['deleted'], deleted)
+        self.assertEqual(self.changes(cursor=delta['cursor'])['deleted']['products'], [])
+
+    def test_small_pages_resume_from_the_cursor(self):
+        names, params = [], {'limit': 1}
+        while True:
+            page = self.changes(**params)
+            names += [p['name'] for p in page['products']]
+            params['cursor'] = page['cursor']
+            if not page['has_more']:
+                break
+        self.assertEqual(sorted(names), ['doomed', 'kept'])
+
+    def test_inactive_rows_are_withheld_and_reported_as_deleted(self):
+        hidden = Product.objects.create(name='hidden', description='d', category=self.category, price=1,
+                                        is_active=False)
+        full = self.changes()
+        self.assertNotIn('hidden', [p['name'] for p in full['products']])
+        self.product.is_active = False
+        self.product.save()
+        self.other.is_active = False
+        self.other.save()
+        delta = self.changes(cursor=full['cursor'])
+        self.assertEqual(delta['products'], [])
+        self.assertEqual(delta['deleted']['products'], [self.product.pk])
+        self.assertEqual(delta['deleted']['categories'], [self.other.pk])
+        self.assertNotIn(hidden.pk, delta['deleted']['products'])
+
+    def test_cursors_older_than_the_tombstone_retention_must_resync(self):
+        retention = timedelta(days=settings.CATALOG_DELETION_RETENTION_DAYS)
+        CatalogDeletion.objects.create(kind=CatalogDeletion.KIND_PRODUCT, object_id=999,
+                                       deleted_at=timezone.now() - retention - timedelta(days=1))
+        out = io.StringIO()
+        call_command('prune_catalog_deletions', stdout=out)
+        self.assertIn('Pruned 1 catalog deletions', out.getvalue())
+
+        old = (timezone.now() - retention - timedelta(minutes=1)).isoformat()
+        self.assertEqual(self.client.get('/api/products/changes/', {'since': old}).status_code, 410)
+        cursor = sync._decode(self.changes()['cursor'])
+        cursor['deleted'] = [old, 0]
+        self.assertEqual(self.client.get('/api/products/changes/', {'cursor': sync._encode(cursor)}).status_code, 410)
+
+    def test_quiet_syncs_keep_the_cursor_fresh(self):
+        first = sync._decode(self.changes()['cursor'])['deleted'][0]
+        later = sync._decode(self.changes(cursor=self.changes()['cursor'])['cursor'])['deleted'][0]
+        self.assertGreater(parse_datetime(later), parse_datetime(first))
+
+    def test_since_and_invalid_cursor(self):
+        since = (timezone.now() + timedelta(minutes=1)).isoformat()
+        self.assertEqual(self.changes(since=since)['products'], [])
+        self.assertEqual(self.client.get('/api/products/changes/', {'cursor': 'nope'}).status_code, 400)
+        # مؤشر سليم البنية بتاريخ بلا منطقة زمنية أو بمعرّف خارج المدى: 400 لا 500
+        positions = sync._decode(self.changes()['cursor'])
+        for name, position in (('deleted', ['2025-01-01T00:00:00', 0]), ('products', [None, 2 ** 63])):
+            cursor = sync._encode({**positions, name: position})
+            response = self.client.get('/api/products/changes/', {'cursor': cursor})
+            self.assertEqual(response.status_code, 400, name)
+            self.assertIn('cursor', response.json())
+        self.assertEqual(self.client.get('/api/products/changes/', {'since': 'yesterday'}).status_code, 400)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, CACHES=LOCMEM_CACHE, **LOCAL_MEDIA)
+class CatalogSnapshotTests(TestCase):
+    """products/snapshots.py: content-hashed, pre-compressed catalog files plus a manifest pointing at them."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='snap')
+        cls.product = Product.objects.create(name='snapped', description='d', category=cls.category, price=1000)
+
+    def setUp(self):
+        cache.clear()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.media_root = media.name
+        override = override_settings(MEDIA_ROOT=media.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def build(self, *args):
+        out = io.StringIO()
+        call_command('build_catalog_snapshot', *args, stdout=out)
+        return out.getvalue()
+
+    def read(self, url):
+        with open(f'{self.media_root}/{url.split("/media/", 1)[1]}', 'rb') as handle:
+            return handle.read()
+
+    def test_build_writes_hashed_compressed_files_and_manifest(self):
+        self.assertEqual(self.client.get('/api/products/snapshot/').status_code, 404)
+        self.assertIn('written', self.build())
+        response = self.client.get('/api/products/snapshot/')
+        self.assertEqual(response['Cache-Control'], snapshots.MANIFEST_CACHE_CONTROL)
+        files = response.json()['files']
+        self.assertEqual(set(files), {'products', 'categories', 'banners'})
+        entry = files['products']
+        self.assertIn(entry['sha256'], entry['url'])
+        body = self.read(entry['url'])
+        self.assertEqual(gzip.decompress(self.read(entry['gzip_url'])), body)
+        self.assertEqual([p['name'] for p in json.loads(body)], ['snapped'])
+
+    def test_rebuilds_only_after_a_catalog_change(self):
+        self.build()
+        first = self.client.get('/api/products/snapshot/').json()
+        self.assertIn('up to date', self.build())
+        self.product.name = 'renamed'
+        self.product.save()
+        self.assertIn('written', self.build())
+        second = self.client.get('/api/products/snapshot/').json()
+        self.assertNotEqual(first['files']['products']['url'], second['files']['products']['url'])
+        self.assertEqual(first['files']['banners'], second['files']['banners'])
+
+    def test_staleness_is_read_from_the_database(self):
+        self.build()
+        # إصدارات الذاكرة المؤقّتة لا تهم: مسحها لا يجعل اللقطة قديمة، والتعديل بلا إشارة يجعلها كذلك
+        cache.clear()
+        self.assertFalse(snapshots.is_stale())
+        Product.objects.filter(pk=self.product.pk).update(updated_at=timezone.now())
+        self.assertTrue(snapshots.is_stale())
+        self.build()
+        Banner.objects.create(title='gone').delete()
+        self.assertTrue(snapshots.is_stale())
+
+    def test_sale_boundaries_make_the_snapshot_stale(self):
+        start = timezone.now() + timedelta(hours=1)
+        Product.objects.filter(pk=self.product.pk).update(discount_amount=100, discount_start=start)
+        self.build()
+        with mock.patch.object(timezone, 'now', return_value=start + timedelta(seconds=1)):
+            self.assertTrue(snapshots.is_stale())
+
+    def test_manifest_survives_a_cache_flush(self):
+        self.build()
+        version = snapshots.current_manifest()['version']
+        cache.clear()
+        self.assertEqual(snapshots.current_manifest()['version'], version)
+
+    def test_s3_uploads_are_marked_immutable(self):
+        with override_settings(STORAGES={'default': {'BACKEND': 'storages.backends.s3.S3Storage'}}):
+            storage = snapshots.snapshot_storage()
+        self.assertEqual(storage.get_object_parameters('x')['CacheControl'], snapshots.IMMUTABLE)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, CACHES=DUMMY_CACHE, IMAGE_VARIANTS_ASYNC=False, **LOCAL_MEDIA)
+class ImageVariantTests(TestCase):
+    """products/images.py: WebP (and AVIF when available) width variants of uploads, exposed as srcset."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username='uploader', password='x', is_staff=True)
+        cls.category = Category.objects.create(name='imgs')
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.media_root = media.name
+        override = override_settings(MEDIA_ROOT=media.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.api = APIClient()
+        self.api.force_authenticate(self.admin)
+
+    def png(self, width, height, name='photo.png'):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from PIL import Image
+
+        buffer = io.BytesIO()
+        Image.new('RGB', (width, height), 'red').save(buffer, 'PNG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+    def upload(self, width, height):
+        response = self.api.post('/api/products/upload-image/', {'image': self.png(width, height)}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['url']
+
+    def test_upload_generates_smaller_webp_widths(self):
+        url = self.upload(800, 400)
+        variant_set = ImageVariantSet.objects.get(original_url=url)
+        self.assertEqual((variant_set.width, variant_set.height), (800, 400))
+        self.assertEqual(set(variant_set.variants['webp']), {'160', '320', '640'})
+        path = variant_set.variants['webp']['320'].split('/media/', 1)[1]
+        from PIL import Image
+        with Image.open(f'{self.media_root}/{path}') as variant:
+            self.assertEqual((variant.format, variant.size), ('WEBP', (320, 160)))
+
+    def test_small_images_are_not_upscaled(self):
+        url = self.upload(100, 50)
+        self.assertEqual(list(ImageVariantSet.objects.get(original_url=url).variants['webp']), ['100'])
+
+    def test_serializers_expose_srcset_with_one_lookup(self):
+        url = self.upload(700, 700)
+        for i in range(3):
+            Product.objects.create(name=f'p{i}', description='d', category=self.category, price=10,
+                                   main_image=url, image_2='https://cdn.example.com/external.jpg')
+        Banner.objects.create(title='b', image_url=url, is_active=True)
+
+        with CaptureQueriesContext(connection) as queries:
+            results = self.api.get('/api/products/admin/products/').json()
+        results = results.get('results', results) if isinstance(results, dict) else results
+        self.assertEqual(sum('products_imagevariantset' in q['sql'] for q in queries.captured_queries), 1)
+        srcset = results[0]['image_srcset']
+        self.assertEqual(list(srcset), [url])
+        self.assertTrue(srcset[url]['webp'].startswith('http://testserver/media/variants/'))
+        self.assertTrue(srcset[url]['webp'].endswith('640w'))
+        self.assertEqual(srcset[url]['webp'].count('w,'), 2)
+
+        banner = self.client.get('/api/products/banners/').json()[0]
+        self.assertEqual(banner['image_srcset'], srcset)
+
+    def test_backfill_command_covers_existing_images(self):
+        from django.core.files.storage import default_storage
+        path = default_storage.save('old.png', self.png(400, 400))
+        url = 'http://testserver' + default_storage.url(path)
+        Product.objects.create(name='old', description='d', category=self.category, price=10, main_image=url,
+                               image_2='https://cdn.example.com/external.jpg')
+        out = io.StringIO()
+        call_command('generate_image_variants', stdout=out)
+        self.assertIn('Generated variants for 1 images (1 external', out.getvalue())
+        self.assertEqual(set(ImageVariantSet.objects.get().variants['webp']), {'160', '320'})
+        self.assertEqual(images.storage_path('https://cdn.example.com/external.jpg'), None)
+
+
+S3_STORAGE = {**settings.STORAGES, 'default': {'BACKEND': 'storages.backends.s3.S3Storage'}}
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, CACHES=DUMMY_CACHE, STORAGES=S3_STORAGE)
+class DirectUploadTests(TestCase):
+    """products/uploads.py: presigned PUT to R2, then a completion check that only reads the object's header."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username='direct-uploader', password='x', is_staff=True)
+
+    def setUp(self):
+        from PIL import Image
+
+        self.api = APIClient()
+        self.api.force_authenticate(self.admin)
+        buffer = io.BytesIO()
+        Image.new('RGB', (300, 200), 'blue').save(buffer, 'PNG')
+        self.png = buffer.getvalue()
+
+    def presign(self, content_type='image/png', size=None):
+        return self.api.post('/api/products/upload-image/presign/',
+                             {'content_type': content_type, 'size': size or len(self.png)}, format='json')
+
+    def stub_object(self, body, total=None):
+        """Stubs the ranged GET the completion step makes (no network)."""
+        from botocore.response import StreamingBody
+        from botocore.stub import Stubber
+        from django.core.files.storage import default_storage
+
+        stubber = Stubber(default_storage.bucket.meta.client)
+        head = body[:uploads.REQUEST_HEADER_BYTES[0]]
+        stubber.add_response('get_object', {
+            'Body': StreamingBody(io.BytesIO(head), len(head)),
+            'ContentRange': f'bytes 0-{len(head) - 1}/{total or len(body)}',
+        })
+        self.addCleanup(stubber.deactivate)
+        return stubber
+
+    def complete(self, token):
+        return self.api.post('/api/products/upload-image/complete/', {'token': token}, format='json')
+
+    def test_presign_signs_content_type_and_length(self):
+        response = self.presign()
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body['method'], 'PUT')
+        self.assertIn('X-Amz-Signature=', body['upload_url'])
+        self.assertIn('content-length', body['upload_url'].lower())
+        self.assertEqual(body['headers'], {'Content-Type': 'image/png'})
+
+    def test_presign_rejects_bad_type_size_and_local_storage(self):
+        self.assertEqual(self.presign('text/html').status_code, 400)
+        self.assertEqual(self.presign(size=uploads.MAX_UPLOAD_BYTES + 1).status_code, 400)
+        with override_settings(STORAGES={**S3_STORAGE, 'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'}}):
+            self.assertEqual(self.presign().status_code, 400)
+
+    def test_complete_validates_header_and_schedules_variants(self):
+        token = self.presign().json()['token']
+        stubber = self.stub_object(self.png)
+        with stubber, mock.patch.object(images, 'schedule_variants') as schedule:
+            response = self.complete(token)
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertTrue(body['path'].endswith('.png'))
+        self.assertEqual(body['url'], f'https://{settings.AWS_S3_CUSTOM_DOMAIN}/{body["path"]}')
+        schedule.assert_called_once_with(body['path'], body['url'])
+
+    def test_complete_deletes_objects_that_fail_validation(self):
+        token = self.presign().json()['token']
+        stubber = self.stub_object(b'<html><script>alert(1)</script></html>')
+        stubber.add_response('delete_object', {})
+        with stubber:
+            response = self.complete(token)
+        self.assertEqual(response.status_code, 400)
+        stubber.assert_no_pending_responses()
+
+    def test_complete_rejects_oversized_dimensions(self):
+        from PIL import Image
+
+        buffer = io.BytesIO()
+        Image.new('1', (settings.IMAGE_UPLOAD_MAX_DIMENSION + 1, 10)).save(buffer, 'PNG')
+        token = self.presign(size=len(buffer.getvalue())).json()['token']
+        stubber = self.stub_object(buffer.getvalue())
+        stubber.add_response('delete_object', {})
+        with stubber:
+            response = self.complete(token)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(str(settings.IMAGE_UPLOAD_MAX_DIMENSION), response.json()['error'])
+
+    def test_complete_rejects_forged_tokens(self):
+        self.assertEqual(self.complete('not-a-token').status_code, 400)
+
+
+class FakeImageHost:
+    """Stands in for ImgBB: a requests-like session serving fixed bodies, recording every GET."""
+
+    def __init__(self, bodies):
+        self.bodies = bodies
+        self.requested = []
+
+    def __call__(self, workers):
+        return self
+
+    def get(self, url, stream=False, timeout=None):
+        self.requested.append(url)
+        body = self.bodies[url]
+        response = mock.MagicMock()
+        response.__enter__.return_value = response
+        if isinstance(body, Exception):
+            response.raise_for_status.side_effect = body
+        response.iter_content.side_effect = lambda size: (body[i:i + size] for i in range(0, len(body), size))
+        return response
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, CACHES=LOCMEM_CACHE, **LOCAL_MEDIA)
+class ImageMigrationTests(TestCase):
+    """products/image_migration.py: parallel ImgBB → storage migration, deduplicated by SHA-256 and resumable."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='migrated')
+        cls.admin = User.objects.create_user(username='migrator', password='x', is_staff=True)
+
+    def setUp(self):
+        from PIL import Image
+
+        cache.clear()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.media_root = media.name
+        override = override_settings(MEDIA_ROOT=media.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        buffer = io.BytesIO()
+        Image.new('RGB', (20, 20), 'green').save(buffer, 'PNG')
+        self.png = buffer.getvalue()
+
+    def migrate(self, bodies):
+        host = FakeImageHost(bodies)
+        with mock.patch.object(image_migration, '_session', host):
+            summary = image_migration.migrate(workers=3, log=lambda message: None)
+        return host, summary
+
+    def test_shared_and_identical_images_are_stored_once(self):
+        shared, copy = 'https://i.ibb.co/a/shared.png', 'https://i.ibb.co/b/copy.jpg'
+        first = Product.objects.create(name='a', description='d', category=self.category, price=1,
+                                       main_image=shared, image_2=copy)
+        Product.objects.create(name='b', description='d', category=self.category, price=1, main_image=shared)
+        banner = Banner.objects.create(title='b', image_url=shared)
+
+        host, summary = self.migrate({shared: self.png, copy: self.png})
+        self.assertEqual(sorted(host.requested), sorted([shared, copy]))
+        self.assertEqual((summary['done'], summary['unique_images'], summary['remaining_references']), (2, 1, 0))
+        first.refresh_from_db()
+        banner.refresh_from_db()
+        self.assertEqual(first.main_image, first.image_2)
+        self.assertEqual(banner.image_url, first.main_image)
+        self.assertTrue(first.main_image.endswith(f'images/{ImageMigration.objects.first().sha256}.png'))
+        import os
+        self.assertEqual(os.listdir(f'{self.media_root}/images'), [first.main_image.rsplit('/', 1)[1]])
+        self.assertEqual(ImageBlob.objects.get().references.count(), 4)
+
+    def test_interrupted_runs_resume_without_refetching(self):
+        import requests
+
+        good, bad = 'https://i.ibb.co/a/good.png', 'https://i.ibb.co/a/bad.png'
+        product = Product.objects.create(name='a', description='d', category=self.category, price=1,
+                                         main_image=good, image_2=bad)
+        _, summary = self.migrate({good: self.png, bad: requests.HTTPError('503')})
+        self.assertEqual((summary['done'], summary['failed']), (1, 1))
+        self.assertIn('503', ImageMigration.objects.get(source_url=bad).error)
+
+        host, summary = self.migrate({bad: self.png})
+        self.assertEqual(host.requested, [bad])
+        self.assertEqual((summary['done'], summary['failed']), (2, 0))
+        self.assertEqual(ImageMigration.objects.get(source_url=bad).attempts, 2)
+        product.refresh_from_db()
+        self.assertFalse(image_migration.is_external(product.image_2))
+
+    def test_collected_blobs_of_finished_rows_are_fetched_again(self):
+        url = 'https://i.ibb.co/a/gone.png'
+        product = Product.objects.create(name='a', description='d', category=self.category, price=1, main_image=url)
+        self.migrate({url: self.png})
+        # كأن التشغيل انقطع قبل الاستبدال، ثم حذف جمع المهملات الصورة التي بلا مرجع
+        Product.objects.filter(pk=product.pk).update(main_image=url)
+        ImageBlob.objects.all().delete()
+
+        host, summary = self.migrate({url: self.png})
+        self.assertEqual(host.requested, [url])
+        self.assertEqual((summary['done'], summary['failed']), (1, 0))
+        product.refresh_from_db()
+        self.assertEqual(product.main_image, ImageBlob.objects.get().url)
+
+    def test_non_images_are_rejected(self):
+        url = 'https://i.ibb.co/a/page.png'
+        Banner.objects.create(title='b', image_url=url)
+        _, summary = self.migrate({url: b'<html></html>'})
+        self.assertEqual(summary['failed'], 1)
+        self.assertEqual(Banner.objects.get().image_url, url)
+
+    def test_view_starts_one_background_run_and_reports_progress(self):
+        api = APIClient()
+        api.force_authenticate(self.admin)
+        with mock.patch.object(image_migration.threading, 'Thread') as thread:
+            self.assertEqual(api.post('/api/products/run-migration-secret-123/').status_code, 202)
+            self.assertEqual(api.post('/api/products/run-migration-secret-123/').status_code, 409)
+        thread.return_value.start.assert_called_once_with()
+        progress = api.get('/api/products/run-migration-secret-123/').json()
+        self.assertTrue(progress['running'])
+        self.assertEqual(progress['total'], 0)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, CACHES=DUMMY_CACHE, IMAGE_VARIANTS_ASYNC=False, **LOCAL_MEDIA)
+class ImageBlobTests(TestCase):
+    """products/blobs.py: content-addressed uploads, the reference table and batched garbage collection."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username='blob-uploader', password='x', is_staff=True)
+        cls.category = Category.objects.create(name='blobs')
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.media_root = media.name
+        override = override_settings(MEDIA_ROOT=media.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.api = APIClient()
+        self.api.force_authenticate(self.admin)
+
+    def upload(self, color='red', name='photo.png'):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from PIL import Image
+
+        buffer = io.BytesIO()
+        Image.new('RGB', (200, 100), color).save(buffer, 'PNG')
+        image = SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+        response = self.api.post('/api/products/upload-image/', {'image': image}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def age(self, hours):
+        then = timezone.now() - timedelta(hours=hours)
+        ImageBlob.objects.update(created_at=then, last_referenced_at=then)
+
+    def test_same_bytes_are_stored_once_and_return_the_same_url(self):
+        import os
+
+        first = self.upload(name='a.png')
+        with mock.patch.object(images, 'schedule_variants') as schedule:
+            second = self.upload(name='copy-of-a.png')
+        self.assertEqual((first['existing'], second['existing']), (False, True))
+        self.assertEqual(first['url'], second['url'])
+        schedule.assert_not_called()
+        blob = ImageBlob.objects.get()
+        self.assertEqual(first['path'], f'images/{blob.sha256}.png')
+        self.assertEqual(os.listdir(f'{self.media_root}/images'), [f'{blob.sha256}.png'])
+
+    def test_lookup_by_hash_skips_the_upload(self):
+        import hashlib
+
+        self.assertEqual(self.api.get('/api/products/upload-image/', {'sha256': '0' * 64}).status_code, 404)
+        uploaded = self.upload()
+        with open(f'{self.media_root}/{uploaded["path"]}', 'rb') as handle:
+            sha = hashlib.sha256(handle.read()).hexdigest()
+        response = self.api.get('/api/products/upload-image/', {'sha256': sha})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['url'], uploaded['url'])
+
+    def test_references_follow_saves_and_deletes(self):
+        red, blue = self.upload('red')['url'], self.upload('blue')['url']
+        product = Product.objects.create(name='p', description='d', category=self.category, price=1,
+                                         main_image=red, image_2=red)
+        banner = Banner.objects.create(title='b', image_url=red)
+        self.assertEqual(ImageBlob.objects.get(url=red).references.count(), 3)
+
+        product.image_2 = blue
+        product.save()
+        self.assertEqual(ImageBlob.objects.get(url=red).references.count(), 2)
+        self.assertEqual(ImageBlob.objects.get(url=blue).references.get().field, 'image_2')
+
+        with CaptureQueriesContext(connection) as queries:
+            product.increase_stock(1)
+        self.assertFalse(any('imageblob' in q['sql'].lower() for q in queries.captured_queries))
+
+        banner.delete()
+        product.delete()
+        self.assertFalse(ImageBlobReference.objects.exists())
+
+    def test_garbage_collection_keeps_referenced_and_fresh_images(self):
+        import os
+
+        kept = self.upload('red')
+        dropped = self.upload('blue')
+        Category.objects.create(name='uses red', image_url=kept['url'])
+        self.age(hours=48)
+        fresh = self.upload('green')
+        dropped_variants = ImageVariantSet.objects.get(original_url=dropped['url']).variants['webp']
+
+        out = io.StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('gc_image_blobs', '--batch-size', '1', stdout=out)
+        self.assertIn('Deleted 1 unreferenced images', out.getvalue())
+        self.assertEqual(set(ImageBlob.objects.values_list('url', flat=True)), {kept['url'], fresh['url']})
+        self.assertFalse(os.path.exists(f'{self.media_root}/{dropped["path"]}'))
+        self.assertTrue(os.path.exists(f'{self.media_root}/{kept["path"]}'))
+        for url in dropped_variants.values():
+            self.assertFalse(os.path.exists(f'{self.media_root}/{url.split("/media/", 1)[1]}'))
+        self.assertFalse(ImageVariantSet.objects.filter(original_url=dropped['url']).exists())
+
+    def test_lookup_by_hash_renews_the_grace_period(self):
+        self.upload()
+        self.age(hours=48)
+        self.assertEqual(blobs.collect_garbage(dry_run=True), 1)
+        self.assertIsNotNone(blobs.existing(ImageBlob.objects.get().sha256))
+        self.assertEqual(blobs.collect_garbage(), 0)
+        self.assertIsNone(blobs.existing('0' * 64))
+
+    def test_rebuild_references_recovers_bulk_updates(self):
+        url = self.upload()['url']
+        product = Product.objects.create(name='p', description='d', category=self.category, price=1)
+        Product.objects.filter(pk=product.pk).update(main_image=url)
+        self.assertFalse(ImageBlobReference.objects.exists())
+        self.age(hours=48)
+        self.assertEqual(blobs.rebuild_references(), 1)
+        self.assertEqual(blobs.collect_garbage(dry_run=True), 0)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, CACHES=LOCMEM_CACHE,
+                   PRODUCT_VIEW_BUFFER_SIZE=3, PRODUCT_VIEW_FLUSH_SECONDS=10 ** 9)
+class ProductViewTrackingTests(TestCase):
+    """products/tracking.py: buffered view ingestion, daily/total rollups and raw-row retention."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='viewed')
+        cls.first = Product.objects.create(name='first', description='d', category=cls.category, price=1)
+        cls.second = Product.objects.create(name='second', description='d', category=cls.category, price=1)
+
+    def setUp(self):
+        cache.clear()
+        isolate_view_buffer(self)
+
+    def views(self, product, count, days_ago=0):
+        at = timezone.now() - timedelta(days=days_ago)
+        ProductView.objects.bulk_create([ProductView(product=product, viewed_at=at) for _ in range(count)])
+
+    def test_views_are_buffered_and_written_in_one_batch(self):
+        url = f'/api/products/{self.first.pk}/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertFalse(ProductView.objects.exists())
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url, HTTP_USER_AGENT='phone')
+        inserts = [q for q in queries.captured_queries if q['sql'].startswith('INSERT INTO "products_productview"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(ProductView.objects.filter(product=self.first).count(), 3)
+        self.assertEqual(ProductView.objects.filter(user_agent='phone').count(), 1)
+
+    def test_rollup_counts_each_view_once(self):
+        self.views(self.first, 3)
+        self.views(self.first, 2, days_ago=1)
+        self.views(self.second, 4, days_ago=10)
+        self.assertEqual(tracking.rollup(batch_size=4), 9)
+        self.assertEqual(tracking.rollup(), 0)
+        self.views(self.first, 1)
+        self.assertEqual(tracking.rollup(), 1)
+
+        self.assertEqual(ProductViewDaily.objects.filter(product=self.first).count(), 2)
+        first, second = ProductViewStats.objects.get(product=self.first), ProductViewStats.objects.get(product=self.second)
+        self.assertEqual((first.total_views, first.recent_views), (6, 6))
+        # أقدم من RECENT_DAYS: في الإجمالي لا في "الأكثر مشاهدة"
+        self.assertEqual((second.total_views, second.recent_views), (4, 0))
+        self.assertEqual(tracking.view_count(self.second.pk), 4)
+
+    def test_recent_window_uses_local_days(self):
+        # 01:00 بالتوقيت المحلي (Asia/Riyadh) ما زال "أمس" في UTC
+        now = timezone.localtime().replace(hour=1, minute=0, second=0, microsecond=0)
+        ProductView.objects.bulk_create([
+            ProductView(product=self.first, viewed_at=now - timedelta(days=tracking.RECENT_DAYS - 1)),
+            ProductView(product=self.first, viewed_at=now - timedelta(days=tracking.RECENT_DAYS)),
+        ])
+        tracking.rollup(now=now.astimezone(dt_timezone.utc))
+        stats = ProductViewStats.objects.get(product=self.first)
+        self.assertEqual((stats.total_views, stats.recent_views), (2, 1))
+
+    def test_detail_and_most_viewed_read_the_rollup(self):
+        self.views(self.first, 2)
+        self.views(self.second, 5)
+        self.assertEqual(self.client.get('/api/products/most-viewed/').json()['results'], [])
+        tracking.rollup()
+        etag = self.client.get(f'/api/products/{self.second.pk}/')['ETag']
+        self.views(self.second, 1)
+        tracking.rollup()
+        self.assertEqual(self.client.get(f'/api/products/{self.second.pk}/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        response = self.client.get('/api/products/most-viewed/').json()
+        self.assertEqual([(p['name'], p['views']) for p in response['results']], [('second', 6), ('first', 2)])
+        self.assertEqual(self.client.get(f'/api/products/{self.second.pk}/').json()['views_count'], 6)
+
+        self.second.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.second.save()
+        names = [p['name'] for p in self.client.get('/api/products/most-viewed/').json()['results']]
+        self.assertEqual(names, ['first'])
+
+    def test_prune_keeps_recent_and_unrolled_views(self):
+        self.views(self.first, 2, days_ago=40)
+        tracking.rollup()
+        self.views(self.first, 1, days_ago=40)
+        self.views(self.first, 1)
+        tracking.rollup(now=timezone.now())
+        ProductView.objects.filter(viewed_at__gt=timezone.now() - timedelta(days=1)).update(rolled_up=False)
+        self.assertEqual(tracking.prune(batch_size=1), 3)
+        self.assertEqual(ProductView.objects.count(), 1)
+        self.assertEqual(ProductViewStats.objects.get().total_views, 4)
+
+
+    def test_rollup_command_needs_a_shared_cache(self):
+        self.views(self.first, 2)
+        with self.assertRaisesMessage(CommandError, 'shared'):
+            call_command('rollup_product_views', stdout=io.StringIO())
+        use_shared_cache(self)
+        out = io.StringIO()
+        call_command('rollup_product_views', stdout=out)
+        self.assertIn('Rolled up 2 product views', out.getvalue())
+
+@override_settings(SECURE_SSL_REDIRECT=False, CACHES=LOCMEM_CACHE)
+class TrendingTests(TestCase):
+    """products/trending.py: incremental time-decayed scores from rolled-up views and order items."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.parent = Category.objects.create(name='trend-parent')
+        cls.child = Category.objects.create(name='trend-child', parent=cls.parent)
+        cls.other = Category.objects.create(name='trend-other')
+        cls.viewed = Product.objects.create(name='viewed', description='d', category=cls.child, price=1)
+        cls.sold = Product.objects.create(name='sold', description='d', category=cls.parent, price=1)
+        cls.elsewhere = Product.objects.create(name='elsewhere', description='d', category=cls.other, price=1)
+
+    def setUp(self):
+        cache.clear()
+
+    def views(self, product, count):
+        ProductView.objects.bulk_create([ProductView(product=product) for _ in range(count)])
+        tracking.rollup()
+
+    def order(self, product, quantity, status='pending', hours_ago=0):
+        order = Order.objects.create(
+            customer_name='t', customer_phone='0770', customer_address='Baghdad', governorate='Baghdad',
+            payment_method='cash_on_delivery', subtotal=1, total=1, status=status,
+        )
+        Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - timedelta(hours=hours_ago))
+        OrderItem.objects.create(order=order, product=product, product_name=product.name, price=1,
+                                 quantity=quantity, total_price=quantity)
+
+    def scores(self):
+        now = timezone.now()
+        return {pk: round(trending.score(log_score, now), 1) for pk, log_score in trending.top(10)}
+
+    def test_refresh_adds_only_new_activity(self):
+        self.views(self.viewed, 5)
+        self.order(self.sold, 2)
+        self.order(self.elsewhere, 50, status='cancelled')
+        self.assertEqual(trending.refresh(), 2)
+        self.assertEqual(self.scores(), {self.sold.pk: 20.0, self.viewed.pk: 5.0})
+
+        # لا جديد: لا سطر يُلمس، وإعادة قراءة مهلة التداخل لا تعدّ المشاهدات مرتين
+        self.assertEqual(trending.refresh(), 0)
+        self.views(self.viewed, 20)
+        self.assertEqual(trending.refresh(), 1)
+        self.assertEqual(self.scores(), {self.viewed.pk: 25.0, self.sold.pk: 20.0})
+        trend = ProductTrend.objects.get(pk=self.viewed.pk)
+        self.assertEqual((trend.views_seen, trend.units_sold), (25, 0))
+        self.assertEqual(ProductTrend.objects.get(pk=self.sold.pk).units_sold, 2)
+
+    def test_older_activity_decays_by_half_life(self):
+        self.order(self.sold, 1, hours_ago=trending.HALF_LIFE.total_seconds() / 3600 * 2)
+        self.views(self.viewed, 3)
+        trending.refresh()
+        self.assertEqual(self.scores(), {self.viewed.pk: 3.0, self.sold.pk: 2.5})
+        later = timezone.now() + trending.HALF_LIFE
+        self.assertAlmostEqual(trending.score(ProductTrend.objects.get(pk=self.viewed.pk).log_score, later), 1.5, 1)
+
+    def test_endpoint_ranks_per_category_subtree_and_follows_refresh(self):
+        self.views(self.viewed, 5)
+        self.order(self.sold, 1)
+        self.views(self.elsewhere, 1)
+        trending.refresh()
+
+        response = self.client.get('/api/products/trending/')
+        self.assertEqual(response['X-Catalog-Cache'], 'MISS')
+        self.assertEqual([(p['name'], p['score']) for p in response.json()['results']],
+                         [('sold', 10.0), ('viewed', 5.0), ('elsewhere', 1.0)])
+        names = [p['name'] for p in self.client.get(f'/api/products/trending/?category={self.parent.pk}').json()['results']]
+        self.assertEqual(names, ['sold', 'viewed'])
+        self.assertEqual(self.client.get('/api/products/trending/?category=999999').status_code, 404)
+        self.assertEqual(self.client.get('/api/products/trending/?limit=x').status_code, 400)
+
+        self.assertEqual(self.client.get('/api/products/trending/')['X-Catalog-Cache'], 'HIT')
+        self.views(self.viewed, 10)
+        trending.refresh()
+        response = self.client.get('/api/products/trending/?limit=1')
+        self.assertEqual([p['name'] for p in response.json()['results']], ['viewed'])
+
+
+    def test_refresh_command_needs_a_shared_cache(self):
+        self.order(self.sold, 1)
+        with self.assertRaisesMessage(CommandError, 'shared'):
+            call_command('refresh_trending', stdout=io.StringIO())
+        use_shared_cache(self)
+        out = io.StringIO()
+        call_command('refresh_trending', stdout=out)
+        self.assertIn('Updated trending scores of 1 products', out.getvalue())
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, CACHES=DUMMY_CACHE)
+class ProductRatingTests(TestCase):
+    """products/ratings.py: rating aggregates kept on Product by review signals, rebuildable in chunks."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='rated')
+        cls.first = Product.objects.create(name='first', description='d', category=cls.category, price=1)
+        cls.second = Product.objects.create(name='second', description='d', category=cls.category, price=1)
+        cls.third = Product.objects.create(name='third', description='d', category=cls.category, price=1)
+        cls.users = [
+            User.objects.create_user(username=f'rater-{i}', phone=f'0710000000{i}', password='x') for i in range(3)
+        ]
+
+    def setUp(self):
+        isolate_view_buffer(self)
+
+    def review(self, product, user, rating, approved=True):
+        return ProductReview.objects.create(product=product, user=user, rating=rating, is_approved=approved)
+
+    def aggregates(self, product):
+        product = Product.objects.get(pk=product.pk)
+        return product.rating_count, product.rating_avg, product.rating_histogram
+
+    def test_create_update_approve_and_delete_adjust_the_product(self):
+        review = self.review(self.first, self.users[0], 5)
+        self.review(self.first, self.users[1], 2)
+        pending = self.review(self.first, self.users[2], 1, approved=False)
+        self.assertEqual(self.aggregates(self.first), (2, Decimal('3.50'), {1: 0, 2: 1, 3: 0, 4: 0, 5: 1}))
+
+        review = ProductReview.objects.get(pk=review.pk)
+        review.rating = 4
+        review.save()
+        self.assertEqual(self.aggregates(self.first), (2, Decimal('3.00'), {1: 0, 2: 1, 3: 0, 4: 1, 5: 0}))
+
+        pending.is_approved = True
+        pending.save(update_fields=['is_approved'])
+        self.assertEqual(self.aggregates(self.first), (3, Decimal('2.33'), {1: 1, 2: 1, 3: 0, 4: 1, 5: 0}))
+
+        # نقل التقييم إلى منتج آخر ثم حذفه
+        review.product = self.second
+        review.save()
+        self.assertEqual(self.aggregates(self.second)[:2], (1, Decimal('4.00')))
+        review.delete()
+        ProductReview.objects.filter(pk=pending.pk).delete()
+        self.assertEqual(self.aggregates(self.first), (1, Decimal('2.00'), {1: 0, 2: 1, 3: 0, 4: 0, 5: 0}))
+        self.assertEqual(self.aggregates(self.second)[:2], (0, Decimal('0.00')))
+
+    def test_saving_a_stale_product_keeps_the_aggregates(self):
+        stale = Product.objects.get(pk=self.first.pk)
+        self.review(self.first, self.users[0], 4)
+        stale.name = 'renamed'
+        stale.save()
+        self.assertEqual(self.aggregates(self.first)[:2], (1, Decimal('4.00')))
+        self.assertEqual(Product.objects.get(pk=self.first.pk).name, 'renamed')
+
+    def test_full_save_of_a_deferred_product_loads_nothing(self):
+        self.review(self.first, self.users[0], 4)
+        product = Product.objects.only('name', 'slug', 'price', 'discount_amount', 'discount_price',
+                                       'category', 'is_active').get(pk=self.first.pk)
+        product.name = 'renamed'
+        product.save()
+        self.assertIn('meta_description', product.get_deferred_fields())
+        self.assertIn('rating_count', product.get_deferred_fields())
+        self.assertEqual(self.aggregates(self.first)[:2], (1, Decimal('4.00')))
+
+    def test_full_save_reinserts_a_product_deleted_meanwhile(self):
+        product = Product.objects.get(pk=self.third.pk)
+        Product.objects.filter(pk=product.pk).delete()
+        product.save()
+        self.assertTrue(Product.objects.filter(pk=product.pk, name='third').exists())
+
+    def test_cards_show_and_sort_by_rating_without_joins(self):
+        self.review(self.first, self.users[0], 3)
+        self.review(self.second, self.users[0], 5)
+        self.review(self.second, self.users[1], 4)
+        self.review(self.third, self.users[2], 5)
+
+        with CaptureQueriesContext(connection) as queries:
+            page = self.client.get('/api/products/', {'sort': 'rating', 'page_size': 2}).json()
+        self.assertFalse([q for q in queries.captured_queries if 'productreview' in q['sql']])
+        self.assertEqual([(p['name'], p['rating_avg'], p['rating_count']) for p in page['results']],
+                         [('third', '5.00', 1), ('second', '4.50', 2)])
+        rest = self.client.get(page['next']).json()
+        self.assertEqual([p['name'] for p in rest['results']], ['first'])
+        detail = self.client.get(f'/api/products/{self.second.pk}/').json()
+        self.assertEqual(detail['rating_histogram'], {'1': 0, '2': 0, '3': 0, '4': 1, '5': 1})
+
+    def test_rating_cursor_rejects_non_finite_and_malformed_averages(self):
+        for rating_avg in ('NaN', 'Infinity', '-Infinity', 'sNaN', 'high'):
+            cursor = base64.urlsafe_b64encode(json.dumps([rating_avg, 1, 1]).encode()).decode()
+            response = self.client.get('/api/products/', {'sort': 'rating', 'cursor': cursor})
+            self.assertEqual(response.status_code, 404, rating_avg)
+
+    def test_rebuild_fixes_drift_in_chunks(self):
+        self.review(self.first, self.users[0], 5)
+        self.review(self.second, self.users[0], 1)
+        ProductReview.objects.filter(product=self.second).update(rating=3)
+        Product.objects.filter(pk=self.third.pk).update(rating_count=7, rating_5_count=7, rating_avg=5)
+
+        out = io.StringIO()
+        call_command('rebuild_product_ratings', '--chunk-size', '1', stdout=out)
+        self.assertIn('Fixed rating aggregates of 2 products', out.getvalue())
+        self.assertEqual(self.aggregates(self.second), (1, Decimal('3.00'), {1: 0, 2: 0, 3: 1, 4: 0, 5: 0}))
+        self.assertEqual(self.aggregates(self.third)[:2], (0, Decimal('0.00')))
+        self.assertEqual(ratings.rebuild_product_ratings(), 0)
@@ -81,6 +81,9 @@ api.interceptors.response.use(
 export const endpoints = {
   // Products
   products: '/products/',
+  home: '/products/home/',
+  suggest: '/products/search/suggest/',
+  filterProducts: '/products/filter/',
   categories: '/products/categories/',
   productsByCategory: '/products/categories/',
   banners: '/products/banners/',
@@ -96,4 +99,21 @@ export const endpoints = {
   notifications: '/notifications/',
 };
 
+// قوائم المنتجات مرقّمة بالمؤشر ({next, results}): صفحة واحدة في كل طلب، والصفحة التالية
+// عند الطلب فقط (زر "عرض المزيد"). next رابط كامل يحمل المؤشر والمعاملات نفسها، فيُمرَّر كما هو.
+export const PAGE_SIZE = 24;
+
+const toPage = (data) => (
+  Array.isArray(data)
+    ? { items: data, next: null }
+    : { items: data?.results || [], next: data?.next || null }
+);
+
+export const fetchPage = async (url, params = {}) => {
+  const response = await api.get(url, { params: { page_size: PAGE_SIZE, ...params } });
+  return toPage(response.data);
+};
+
+export const fetchNextPage = async (next) => toPage((await api.get(next)).data);
+
 export default api;
@@ -25,8 +25,10 @@ const resolveBannerImage = (banner) => {
  *   'offers' → بنرات صفحة العروض
  * `fallback` عنصر يُعرَض بدل السلايدر عند عدم وجود بنرات لهذا المكان
  * (تُستخدمه صفحة العروض لإبقاء رأسها النصّي حتى تُرفَع صورة).
+ * `preloaded` بنرات جاءت مع رد آخر (الرئيسية من home/) — حين تُمرَّر لا يُرسل طلب؛
+ * null = الرد في الطريق فننتظره، وundefined (الافتراضي) = نجلبها بأنفسنا.
  */
-const BannerSlider = ({ placement = 'home', fallback = null }) => {
+const BannerSlider = ({ placement = 'home', fallback = null, preloaded }) => {
   const [banners, setBanners] = useState([]);
   const [currentIndex, setCurrentIndex] = useState(0);
   const [loading, setLoading] = useState(true);
@@ -36,6 +38,13 @@ const BannerSlider = ({ placement = 'home', fallback = null }) => {
   const scrollKey = getScrollKey(location.pathname, location.search, location.hash);
 
   useEffect(() => {
+    if (preloaded !== undefined) {
+      if (preloaded) {
+        setBanners(preloaded.filter((b) => resolveBannerImage(b)));
+        setLoading(false);
+      }
+      return;
+    }
     const fetchBanners = async () => {
       try {
         setLoading(true);
@@ -53,7 +62,7 @@ const BannerSlider = ({ placement = 'home', fallback = null }) => {
       }
     };
     fetchBanners();
-  }, [placement]);
+  }, [placement, preloaded]);
 
   useEffect(() => {
     if (banners.length <= 1) return;
@@ -0,0 +1,24 @@
+import React from 'react';
+
+/**
+ * زر "عرض المزيد" لقوائم المنتجات المرقّمة بالمؤشر (api.js: fetchPage / fetchNextPage).
+ * لا يظهر حين لا توجد صفحة تالية (next = null).
+ */
+const LoadMoreButton = ({ next, loading, onClick }) => {
+  if (!next) return null;
+
+  return (
+    <div className="flex justify-center mt-10">
+      <button
+        type="button"
+        onClick={onClick}
+        disabled={loading}
+        className="btn-secondary min-w-[160px] disabled:opacity-60"
+      >
+        {loading ? 'جارٍ التحميل…' : 'عرض المزيد'}
+      </button>
+    </div>
+  );
+};
+
+export default LoadMoreButton;
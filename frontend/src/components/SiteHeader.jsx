@@ -2,7 +2,6 @@ import { useEffect, useRef, useState } from 'react';
 import { Link, useLocation, useNavigate } from 'react-router-dom';
 import { Search, ShoppingCart, ChevronDown, ChevronLeft, X, User, LogOut, LayoutDashboard } from 'lucide-react';
 import { api, endpoints } from '../api';
-import { formatCurrency } from '../utils/currency';
 import { getScrollKey, navigateWithScrollSave } from '../utils/scrollRestore';
 import { getCachedHomeData, setCachedHomeData } from '../utils/homeCache';
 import { PRODUCT_IMAGE_FALLBACK } from '../utils/imageFallback';
@@ -20,14 +19,14 @@ const readCartCount = () => {
 /**
  * هيدر موحّد يظهر بنفس الشكل والسلوك في كل صفحات المتجر:
  * لوجو + نافيگيشن (ديسكتوب) + بحث دائم + سلة. يدير بياناته وحالته داخلياً
- * (فئات/منتجات/عدّاد السلة) فلا تحتاج أي صفحة تمرير شيء له سوى user/setUser.
+ * (فئات/اقتراحات البحث/عدّاد السلة) فلا تحتاج أي صفحة تمرير شيء له سوى user/setUser.
  */
 const SiteHeader = ({ user, setUser, onSelectCategory }) => {
   const [categories, setCategories] = useState(() => getCachedHomeData()?.categories || []);
-  const [products, setProducts] = useState(() => getCachedHomeData()?.products || []);
   const [isMenuOpen, setIsMenuOpen] = useState(false);
   const [isAccountOpen, setIsAccountOpen] = useState(false);
   const [searchTerm, setSearchTerm] = useState('');
+  const [suggestions, setSuggestions] = useState([]);
   // البحث على الموبايل: أيقونة داخل صف الهيدر تتمدّد لحقل، بدل شريط يأكل صفاً كاملاً
   const [isSearchOpen, setIsSearchOpen] = useState(false);
   const mobileSearchRef = useRef(null);
@@ -38,45 +37,48 @@ const SiteHeader = ({ user, setUser, onSelectCategory }) => {
   const location = useLocation();
   const scrollKey = getScrollKey(location.pathname, location.search, location.hash);
 
-  // تحميل الأقسام والمنتجات (من الذاكرة المؤقّتة المشتركة، أو من الشبكة إن كانت فارغة)
-  // — تلزم لقائمة "الفئات" والبحث بكل صفحة، حتى لو المستخدم دخل مباشرة بغير الرئيسية
+  // تحميل الأقسام (من الذاكرة المؤقّتة المشتركة، أو من الشبكة إن كانت فارغة)
+  // — تلزم لقائمة "الفئات" بكل صفحة، حتى لو المستخدم دخل مباشرة بغير الرئيسية
   useEffect(() => {
     const cached = getCachedHomeData();
-    if (cached?.categories?.length && cached?.products?.length) return;
+    if (cached?.categories?.length) return;
 
     (async () => {
       try {
-        const needCats = !cached?.categories?.length;
-        const needProds = !cached?.products?.length;
-        const [catsRes, prodsRes] = await Promise.all([
-          needCats ? api.get(endpoints.categories) : Promise.resolve(null),
-          needProds ? api.get(endpoints.products) : Promise.resolve(null),
-        ]);
-
-        const newCats = catsRes
-          ? (Array.isArray(catsRes.data) ? catsRes.data : catsRes.data?.results || [])
-          : cached?.categories || [];
-
-        const newProds = prodsRes
-          ? (Array.isArray(prodsRes.data) ? prodsRes.data : prodsRes.data?.results || []).map((p) => ({
-              ...p,
-              image: p.image || p.main_image_url || p.main_image || null,
-              price: Number(p.price || 0),
-              discounted_price: p.discounted_price
-                ? Number(p.discounted_price)
-                : (p.discount_price ? Number(p.discount_price) : Number(p.price || 0)),
-            }))
-          : cached?.products || [];
-
+        const response = await api.get(endpoints.categories);
+        const data = response.data;
+        const newCats = Array.isArray(data) ? data : data?.results || [];
         if (newCats.length) setCategories(newCats);
-        if (newProds.length) setProducts(newProds);
-        setCachedHomeData(newProds.length ? newProds : cached?.products, newCats.length ? newCats : cached?.categories);
+        setCachedHomeData(cached?.products, newCats);
       } catch (error) {
-        console.error('SiteHeader: failed to load categories/products', error);
+        console.error('SiteHeader: failed to load categories', error);
       }
     })();
   }, []);
 
+  // اقتراحات البحث أثناء الكتابة من search/suggest/ (فهرس بادئات في الخادم) — لا نحمّل
+  // الكتالوج إلى المتصفح لنبحث فيه. مهلة قصيرة حتى لا يُرسل طلب لكل حرف.
+  useEffect(() => {
+    const query = searchTerm.trim();
+    if (!query) {
+      setSuggestions([]);
+      return undefined;
+    }
+    let cancelled = false;
+    const timer = setTimeout(async () => {
+      try {
+        const response = await api.get(endpoints.suggest, { params: { q: query, limit: 10 } });
+        if (!cancelled) setSuggestions(response.data?.results || []);
+      } catch (error) {
+        if (!cancelled) setSuggestions([]);
+      }
+    }, 200);
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [searchTerm]);
+
   // عدّاد السلة — يقرأ من التخزين المحلي ويتحدّث فوراً مع أي تغيير بالسلة بأي صفحة.
   // عند تغيّر العدد تُطلَق نبضة لطيفة على الشارة (توقيع الهيدر البصري).
   useEffect(() => {
@@ -197,12 +199,15 @@ const SiteHeader = ({ user, setUser, onSelectCategory }) => {
     navigate('/login');
   };
 
-  const filteredProducts = searchTerm
-    ? products.filter((product) =>
-        (product.name && product.name.toLowerCase().includes(searchTerm.toLowerCase())) ||
-        (product.description && product.description.toLowerCase().includes(searchTerm.toLowerCase()))
-      )
-    : [];
+  // الاقتراح إما منتج (صفحته) أو قسم (منتجاته)
+  const openSuggestion = (suggestion) => {
+    if (suggestion.type === 'category') {
+      setSearchTerm('');
+      handleCategoryClick(suggestion.id);
+    } else {
+      goToProduct(suggestion.id);
+    }
+  };
 
   // الرابط النشط — يُبقي الخط السفلي ظاهراً للصفحة الحالية
   const isActive = (path) =>
@@ -266,22 +271,22 @@ const SiteHeader = ({ user, setUser, onSelectCategory }) => {
                       </div>
                       {searchTerm && (
                         <div className="voro-fade-in absolute top-full right-0 mt-2.5 w-80 bg-white rounded-2xl shadow-[0_12px_40px_-12px_rgba(0,0,0,0.18)] border border-gray-100 z-50 overflow-hidden max-h-96 overflow-y-auto">
-                          {filteredProducts.slice(0, 6).map((product) => (
+                          {suggestions.slice(0, 6).map((suggestion) => (
                             <button
-                              key={product.id}
-                              onClick={() => goToProduct(product.id)}
+                              key={`${suggestion.type}-${suggestion.id}`}
+                              onClick={() => openSuggestion(suggestion)}
                               className="w-full text-right p-3 hover:bg-gray-50 flex items-center gap-3 border-b border-gray-50 last:border-0 transition-colors"
                             >
                               <div className="w-12 h-12 shrink-0 bg-gray-50 rounded-lg overflow-hidden">
-                                <img src={product.image} alt="" className="w-full h-full object-contain" />
+                                <img src={suggestion.thumbnail || PRODUCT_IMAGE_FALLBACK} alt="" className="w-full h-full object-contain" />
                               </div>
                               <div className="flex-1 min-w-0">
-                                <div className="font-semibold text-[13px] text-gray-800 truncate">{product.name}</div>
-                                <div className="text-black font-bold text-sm mt-0.5">{formatCurrency(product.discounted_price || product.price)}</div>
+                                <div className="font-semibold text-[13px] text-gray-800 truncate">{suggestion.name}</div>
+                                <div className="text-gray-400 text-xs mt-0.5">{suggestion.type === 'category' ? 'قسم' : 'منتج'}</div>
                               </div>
                             </button>
                           ))}
-                          {filteredProducts.length === 0 && (
+                          {suggestions.length === 0 && (
                             <div className="p-5 text-center text-gray-400 text-sm">لا توجد نتائج</div>
                           )}
                         </div>
@@ -489,28 +494,28 @@ const SiteHeader = ({ user, setUser, onSelectCategory }) => {
           {/* نتائج البحث على الموبايل — تتدلّى أسفل الهيدر ولا تدفع محتوى الصفحة */}
           {isSearchOpen && searchTerm && (
             <div className="lg:hidden voro-fade-in absolute inset-x-4 sm:inset-x-6 top-full z-30 mt-2 bg-white rounded-2xl shadow-[0_16px_44px_-16px_rgba(0,0,0,0.22)] border border-gray-100 overflow-hidden max-h-[65vh] overflow-y-auto">
-              {filteredProducts.slice(0, 10).map((product) => (
+              {suggestions.map((suggestion) => (
                 <button
-                  key={product.id}
-                  onClick={() => { goToProduct(product.id); closeSearch(); }}
+                  key={`${suggestion.type}-${suggestion.id}`}
+                  onClick={() => { openSuggestion(suggestion); closeSearch(); }}
                   className="w-full text-right p-3 flex items-center gap-3 border-b border-gray-50 last:border-0 active:bg-gray-50 transition-colors"
                 >
                   <div className="w-12 h-12 shrink-0 bg-gray-50 rounded-lg overflow-hidden">
                     <img
-                      src={product.image || PRODUCT_IMAGE_FALLBACK}
+                      src={suggestion.thumbnail || PRODUCT_IMAGE_FALLBACK}
                       alt=""
                       onError={(e) => { e.currentTarget.onerror = null; e.currentTarget.src = PRODUCT_IMAGE_FALLBACK; }}
                       className="w-full h-full object-contain"
                     />
                   </div>
                   <div className="flex-1 min-w-0">
-                    <div className="font-semibold text-[13px] text-gray-800 truncate">{product.name}</div>
-                    <div className="text-black font-bold text-sm mt-0.5">{formatCurrency(product.discounted_price || product.price)}</div>
+                    <div className="font-semibold text-[13px] text-gray-800 truncate">{suggestion.name}</div>
+                    <div className="text-gray-400 text-xs mt-0.5">{suggestion.type === 'category' ? 'قسم' : 'منتج'}</div>
                   </div>
                   <ChevronLeft className="h-4 w-4 shrink-0 text-gray-300" strokeWidth={2} />
                 </button>
               ))}
-              {filteredProducts.length === 0 && (
+              {suggestions.length === 0 && (
                 <div className="p-6 text-center text-gray-400 text-sm">لا توجد نتائج</div>
               )}
             </div>
@@ -1,7 +1,8 @@
 import { useEffect, useState } from 'react';
 import { Link, useParams, useNavigate, useSearchParams } from 'react-router-dom';
-import { api, endpoints } from '../api';
+import { api, endpoints, fetchPage, fetchNextPage } from '../api';
 import Footer from '../components/Footer';
+import LoadMoreButton from '../components/LoadMoreButton';
 import { ProductCard } from '../components/CategoryProductsSection';
 import { ArrowRight, Archive, Box, ChevronLeft, Package, LayoutGrid } from 'lucide-react';
 import BottomTabBar from '../components/BottomTabBar';
@@ -27,6 +28,9 @@ const normalizeProduct = (p) => {
 const Categories = ({ user, setUser }) => {
   const [categories, setCategories] = useState([]);
   const [products, setProducts] = useState([]);
+  // رابط الصفحة التالية من الخادم (ترقيم بالمؤشر)؛ null = لا مزيد
+  const [nextPage, setNextPage] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [loading, setLoading] = useState(true);
   const [cart, setCart] = useState([]);
   const { id: categoryIdParam } = useParams();
@@ -73,6 +77,7 @@ const Categories = ({ user, setUser }) => {
       fetchAllProducts();
     } else {
       setProducts([]);
+      setNextPage(null);
     }
   }, [selectedCategory, showAllProducts]);
 
@@ -97,15 +102,15 @@ const Categories = ({ user, setUser }) => {
     try {
       setLoading(true);
       setProducts([]); // Clear old products to avoid flicker
+      setNextPage(null);
       console.log(`Fetching products for category ID: ${categoryId}`);
       
-      const response = await api.get(`${endpoints.productsByCategory}${categoryId}/products/`);
-      const data = response.data;
-      const list = Array.isArray(data) ? data : (data?.results || []);
+      const { items, next } = await fetchPage(`${endpoints.productsByCategory}${categoryId}/products/`);
       
-      console.log(`Found ${list.length} products for category ${categoryId}`);
+      console.log(`Found ${items.length} products for category ${categoryId}`);
 
-      setProducts(list.map(normalizeProduct));
+      setProducts(items.map(normalizeProduct));
+      setNextPage(next);
     } catch (error) {
       console.error('Error fetching products:', error);
       setProducts([]);
@@ -119,10 +124,10 @@ const Categories = ({ user, setUser }) => {
     try {
       setLoading(true);
       setProducts([]);
-      const response = await api.get(endpoints.products);
-      const data = response.data;
-      const list = Array.isArray(data) ? data : (data?.results || []);
-      setProducts(list.map(normalizeProduct));
+      setNextPage(null);
+      const { items, next } = await fetchPage(endpoints.products);
+      setProducts(items.map(normalizeProduct));
+      setNextPage(next);
     } catch (error) {
       console.error('Error fetching all products:', error);
       setProducts([]);
@@ -131,6 +136,21 @@ const Categories = ({ user, setUser }) => {
     }
   };
 
+  // الصفحة التالية من القائمة الحالية (قسم أو كل المنتجات) تُلحق بما عُرض
+  const fetchMoreProducts = async () => {
+    if (!nextPage || loadingMore) return;
+    try {
+      setLoadingMore(true);
+      const { items, next } = await fetchNextPage(nextPage);
+      setProducts((current) => [...current, ...items.map(normalizeProduct)]);
+      setNextPage(next);
+    } catch (error) {
+      console.error('Error fetching more products:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const loadCart = () => {
     const savedCart = localStorage.getItem('cart');
     if (savedCart) {
@@ -288,7 +308,7 @@ const Categories = ({ user, setUser }) => {
               </button>
               <h2 className="text-2xl font-bold text-gray-800">
                 {showAllProducts
-                  ? `كل المنتجات${products.length ? ` (${products.length})` : ''}`
+                  ? 'كل المنتجات'
                   : (categories.find(c => c.id === selectedCategory)?.name || 'المنتجات')}
               </h2>
               <div></div> {/* Empty div for spacing */}
@@ -332,6 +352,9 @@ const Categories = ({ user, setUser }) => {
                 ))}
               </div>
             )}
+            {!loading && (
+              <LoadMoreButton next={nextPage} loading={loadingMore} onClick={fetchMoreProducts} />
+            )}
           </div>
         </section>
       )}
@@ -1,6 +1,7 @@
 import { useEffect, useState } from 'react';
-import { api, endpoints } from '../api';
+import { api, endpoints, fetchPage, fetchNextPage } from '../api';
 import Footer from '../components/Footer';
+import LoadMoreButton from '../components/LoadMoreButton';
 import Cart from '../components/CartNew';
 import Checkout from '../components/CheckoutNew';
 import BannerSlider from '../components/BannerSlider';
@@ -12,7 +13,16 @@ import BottomTabBar from '../components/BottomTabBar';
 const Home = ({ user, setUser }) => {
   const [products, setProducts] = useState(() => getCachedHomeData()?.products || []);
   const [categories, setCategories] = useState(() => getCachedHomeData()?.categories || []);
+  // أقسام الرئيسية المميّزة وبنراتها — من رد home/ نفسه
+  const [sections, setSections] = useState(() => getCachedHomeData()?.sections || []);
+  // null = رد home/ لم يصل بعد (BannerSlider ينتظره بدل أن يطلب البنرات وحده)
+  const [homeBanners, setHomeBanners] = useState(() => getCachedHomeData()?.banners ?? null);
   const [selectedCategory, setSelectedCategory] = useState('');
+  // منتجات القسم المختار من الهيدر: صفحة أولى ثم "عرض المزيد"
+  const [categoryProducts, setCategoryProducts] = useState([]);
+  const [nextPage, setNextPage] = useState(null);
+  const [categoryLoading, setCategoryLoading] = useState(false);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [cart, setCart] = useState([]);
   const [isCartOpen, setIsCartOpen] = useState(false);
   const [isCheckoutOpen, setIsCheckoutOpen] = useState(false);
@@ -20,7 +30,7 @@ const Home = ({ user, setUser }) => {
 
   useEffect(() => {
     const hasCache = Boolean(getCachedHomeData()?.products?.length);
-    fetchProducts(hasCache);
+    fetchHome(hasCache);
     fetchCategories(hasCache);
     loadCart();
     // Show welcome message if exists
@@ -42,46 +52,89 @@ const Home = ({ user, setUser }) => {
     return () => window.removeEventListener('voro:open-cart', openCart);
   }, []);
 
-  const fetchProducts = async (silent = false) => {
+  // توحيد شكل المنتج القادم من الـAPI ليطابق ما تتوقّعه الواجهة
+  const normalizeProduct = (p) => {
+    const finalImage = p.image || p.main_image_url || p.main_image || null;
+    const priceNum = Number(p.price || 0);
+    const discountPriceNum = p.discount_price ? Number(p.discount_price) : null;
+
+    return {
+      ...p,
+      image: finalImage,
+      price: priceNum,
+      discount_price: discountPriceNum,
+      discounted_price: p.discounted_price ? Number(p.discounted_price) : (discountPriceNum || priceNum),
+      stock: typeof p.stock_quantity === 'number' ? p.stock_quantity : (p.is_in_stock ? 1 : 0),
+      discount: typeof p.discount_percentage === 'number' ? p.discount_percentage : 0,
+      time_left: p.time_left || 0,
+      is_on_sale: p.is_on_sale || false
+    };
+  };
+
+  // الرئيسية كلها بطلب واحد (‎/products/home/‎ — مخزَّن مضغوطاً في الخادم): البنرات، الأقسام
+  // المميّزة، والمنتجات المميّزة ومنتجات الرئيسية. لا نجلب الكتالوج كاملاً.
+  const fetchHome = async (silent = false) => {
     if (!silent) setLoading(true);
     try {
-      const response = await api.get(endpoints.products);
-      console.log('📡 API Response:', response);
-      const data = response.data;
-      const list = Array.isArray(data) ? data : (data?.results || []);
-      console.log(`📦 Products list (${list.length} منتجات):`, list);
-      
-      // Normalize to match UI expectations
-      const normalized = list.map((p) => {
-        const finalImage = p.image || p.main_image_url || p.main_image || null;
-        const priceNum = Number(p.price || 0);
-        const discountPriceNum = p.discount_price ? Number(p.discount_price) : null;
-        
-        return {
-          ...p,
-          image: finalImage,
-          price: priceNum,
-          discount_price: discountPriceNum,
-          discounted_price: p.discounted_price ? Number(p.discounted_price) : (discountPriceNum || priceNum),
-          stock: typeof p.stock_quantity === 'number' ? p.stock_quantity : (p.is_in_stock ? 1 : 0),
-          discount: typeof p.discount_percentage === 'number' ? p.discount_percentage : 0,
-          time_left: p.time_left || 0,
-          is_on_sale: p.is_on_sale || false
-        };
-      });
-      
-      console.log('✅ منتجات معالجة:', normalized);
+      const { data } = await api.get(endpoints.home);
+      const seen = new Set();
+      const list = [...(data?.featured_products || []), ...(data?.products || [])]
+        .filter((p) => !seen.has(p.id) && seen.add(p.id));
+      console.log(`📦 Home products (${list.length} منتجات)`);
+
+      const normalized = list.map(normalizeProduct);
+      const homeSections = data?.categories || [];
+      const banners = data?.banners || [];
       setProducts(normalized);
-      const cachedCategories = getCachedHomeData()?.categories || categories;
-      setCachedHomeData(normalized, cachedCategories.length ? cachedCategories : categories);
+      setSections(homeSections);
+      setHomeBanners(banners);
+      setCachedHomeData(normalized, null, homeSections, banners);
     } catch (error) {
-      console.error('❌ خطأ في جلب المنتجات:', error);
+      console.error('❌ خطأ في جلب الرئيسية:', error);
       if (!silent) setProducts([]);
+      // BannerSlider يعود لجلب البنرات بنفسه
+      setHomeBanners((current) => current ?? undefined);
     } finally {
       setLoading(false);
     }
   };
 
+  // منتجات القسم المختار من الهيدر (مع فروعه) — صفحة واحدة، والبقية عند الطلب
+  useEffect(() => {
+    setCategoryProducts([]);
+    setNextPage(null);
+    if (!selectedCategory) return undefined;
+    let cancelled = false;
+    (async () => {
+      try {
+        setCategoryLoading(true);
+        const { items, next } = await fetchPage(`${endpoints.productsByCategory}${selectedCategory}/products/`);
+        if (cancelled) return;
+        setCategoryProducts(items.map(normalizeProduct));
+        setNextPage(next);
+      } catch (error) {
+        console.error('Error fetching category products:', error);
+      } finally {
+        if (!cancelled) setCategoryLoading(false);
+      }
+    })();
+    return () => { cancelled = true; };
+  }, [selectedCategory]);
+
+  const fetchMoreCategoryProducts = async () => {
+    if (!nextPage || loadingMore) return;
+    try {
+      setLoadingMore(true);
+      const { items, next } = await fetchNextPage(nextPage);
+      setCategoryProducts((current) => [...current, ...items.map(normalizeProduct)]);
+      setNextPage(next);
+    } catch (error) {
+      console.error('Error fetching more products:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const fetchCategories = async (silent = false) => {
     try {
       const response = await api.get(endpoints.categories);
@@ -90,8 +143,7 @@ const Home = ({ user, setUser }) => {
       const list = Array.isArray(data) ? data : (data?.results || []);
       console.log('Categories list:', list);
       setCategories(list);
-      const cachedProducts = getCachedHomeData()?.products || [];
-      setCachedHomeData(cachedProducts.length ? cachedProducts : products, list);
+      setCachedHomeData(null, list);
     } catch (error) {
       console.error('Error fetching categories:', error);
       if (!silent) setCategories([]);
@@ -186,17 +238,6 @@ const Home = ({ user, setUser }) => {
     window.location.reload();
   };
 
-  // منتجات القسم المختار (لعرض الشبكة عند اختيار قسم من الهيدر)
-  const filteredProducts = products.filter(product => {
-    const isDirectMatch = !selectedCategory || product.category === selectedCategory;
-
-    const selectedCatObj = categories.find(c => c.id === selectedCategory);
-    const childIds = selectedCatObj?.children?.map(child => child.id) || [];
-    const isChildMatch = childIds.includes(product.category);
-
-    return isDirectMatch || isChildMatch;
-  });
-
   // دالة جلب منتجات القسم مع كافة أبنائه (للعرض في الصفحة الرئيسية)
   const getProductsForCategoryTree = (category) => {
     const childIds = category.children?.map(child => child.id) || [];
@@ -231,7 +272,7 @@ const Home = ({ user, setUser }) => {
         onSelectCategory={(id) => { setSelectedCategory(id); window.scrollTo({ top: 0, behavior: 'smooth' }); }}
       />
       {/* Banner Slider — full-bleed (يغطّي كامل العرض بلا حواف) */}
-      <BannerSlider />
+      <BannerSlider preloaded={homeBanners} />
 
       {/* Products by Category Sections */}
       <div className="bg-gradient-to-b from-white to-gray-50">
@@ -244,26 +285,37 @@ const Home = ({ user, setUser }) => {
                   <h2 className="text-3xl font-extrabold text-gray-900 tracking-tight">
                     {categories.find(c => c.id === selectedCategory)?.name || 'المنتجات'}
                   </h2>
-                  <p className="mt-2 text-sm text-gray-500">
-                    تم العثور على {filteredProducts.length} منتج
-                  </p>
+                  {categories.find(c => c.id === selectedCategory)?.total_products_count != null && (
+                    <p className="mt-2 text-sm text-gray-500">
+                      تم العثور على {categories.find(c => c.id === selectedCategory).total_products_count} منتج
+                    </p>
+                  )}
                 </div>
               </div>
               
-              <div className="grid grid-cols-2 md:grid-cols-3 lg:grid-cols-4 xl:grid-cols-5 2xl:grid-cols-6 gap-4 md:gap-6 px-2">
-                {filteredProducts.map(product => (
-                  <ProductCard 
-                    key={product.id} 
-                    product={product} 
-                    onAddToCart={addToCart} 
-                  />
-                ))}
-              </div>
+              {categoryLoading ? (
+                <div className="flex justify-center items-center h-64">
+                  <div className="animate-spin rounded-full h-16 w-16 border-b-2 border-primary-500"></div>
+                </div>
+              ) : (
+                <div className="grid grid-cols-2 md:grid-cols-3 lg:grid-cols-4 xl:grid-cols-5 2xl:grid-cols-6 gap-4 md:gap-6 px-2">
+                  {categoryProducts.map(product => (
+                    <ProductCard 
+                      key={product.id} 
+                      product={product} 
+                      onAddToCart={addToCart} 
+                    />
+                  ))}
+                </div>
+              )}
+              {!categoryLoading && (
+                <LoadMoreButton next={nextPage} loading={loadingMore} onClick={fetchMoreCategoryProducts} />
+              )}
             </div>
           </section>
         ) : (
-          // Homepage: Show sections for each parent category
-          categories.filter(c => !c.parent).map(category => {
+          // Homepage: one section per featured category from home/
+          sections.map(category => {
             const categoryProducts = getProductsForCategoryTree(category);
             if (categoryProducts.length === 0) return null;
             
@@ -1,7 +1,8 @@
 import { useEffect, useState } from 'react';
 import { Link } from 'react-router-dom';
-import { api, endpoints } from '../api';
+import { endpoints, fetchPage, fetchNextPage } from '../api';
 import Footer from '../components/Footer';
+import LoadMoreButton from '../components/LoadMoreButton';
 import { ProductCard } from '../components/CategoryProductsSection';
 import { Package } from 'lucide-react';
 import BottomTabBar from '../components/BottomTabBar';
@@ -22,6 +23,8 @@ const offersHeaderFallback = (
 
 const SpecialOffers = ({ user, setUser }) => {
   const [products, setProducts] = useState([]);
+  const [nextPage, setNextPage] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [loading, setLoading] = useState(true);
   const [cart, setCart] = useState([]);
 
@@ -30,27 +33,25 @@ const SpecialOffers = ({ user, setUser }) => {
     loadCart();
   }, []);
 
+  // Filter products with discount > 0, normalized to match UI expectations
+  const normalizeOffers = (list) => list
+    .filter(p =>
+      (p.discount_percentage && p.discount_percentage > 0) ||
+      (p.discount && p.discount > 0)
+    )
+    .map((p) => ({
+      ...p,
+      image: p.image || p.main_image_url || p.main_image || null,
+      stock: typeof p.stock_quantity === 'number' ? p.stock_quantity : (p.is_in_stock ? 1 : 0),
+      discount: typeof p.discount_percentage === 'number' ? p.discount_percentage : (p.discount || 0),
+    }));
+
   const fetchProducts = async () => {
     try {
-      const response = await api.get(endpoints.products);
-      const data = response.data;
-      const list = Array.isArray(data) ? data : (data?.results || []);
-
-      // Filter products with discount > 0
-      const discountedProducts = list.filter(p => 
-        (p.discount_percentage && p.discount_percentage > 0) || 
-        (p.discount && p.discount > 0)
-      );
-
-      // Normalize to match UI expectations
-      const normalized = discountedProducts.map((p) => ({
-        ...p,
-        image: p.main_image_url || p.main_image || null,
-        stock: typeof p.stock_quantity === 'number' ? p.stock_quantity : (p.is_in_stock ? 1 : 0),
-        discount: typeof p.discount_percentage === 'number' ? p.discount_percentage : (p.discount || 0),
-      }));
-
-      setProducts(normalized);
+      // التخفيضات النشطة يفلترها الخادم (on_sale=true) على كل الكتالوج؛ الصفحات التالية بزر "عرض المزيد"
+      const { items, next } = await fetchPage(endpoints.filterProducts, { on_sale: 'true' });
+      setProducts(normalizeOffers(items));
+      setNextPage(next);
     } catch (error) {
       console.error('Error fetching products:', error);
       setProducts([]);
@@ -59,6 +60,20 @@ const SpecialOffers = ({ user, setUser }) => {
     }
   };
 
+  const fetchMoreProducts = async () => {
+    if (!nextPage || loadingMore) return;
+    try {
+      setLoadingMore(true);
+      const { items, next } = await fetchNextPage(nextPage);
+      setProducts((current) => [...current, ...normalizeOffers(items)]);
+      setNextPage(next);
+    } catch (error) {
+      console.error('Error fetching more products:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const loadCart = () => {
     const savedCart = localStorage.getItem('cart');
     if (savedCart) {
@@ -142,6 +157,7 @@ const SpecialOffers = ({ user, setUser }) => {
               ))}
             </div>
           )}
+          <LoadMoreButton next={nextPage} loading={loadingMore} onClick={fetchMoreProducts} />
         </div>
       </section>
       <Footer />
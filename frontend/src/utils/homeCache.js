@@ -5,11 +5,17 @@ export function getCachedHomeData() {
   return homeDataCache;
 }
 
-export function setCachedHomeData(products, categories) {
+/**
+ * products/sections/banners: رد ‎/products/home/‎ (منتجات الرئيسية وأقسامها المميّزة وبنراتها).
+ * categories: شجرة الأقسام كاملة (قائمة الهيدر).
+ */
+export function setCachedHomeData(products, categories, sections, banners) {
   const prev = homeDataCache;
   homeDataCache = {
     products: products?.length ? products : (prev?.products || []),
     categories: categories?.length ? categories : (prev?.categories || []),
+    sections: sections || prev?.sections || [],
+    banners: banners || prev?.banners,
     cachedAt: Date.now(),
   };
 }